@@ -0,0 +1,295 @@
+import os
+import json
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import openai
+import uvicorn
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field, field_validator
+
+import pipeline
+from corpora import check_name
+from orchestrator import Deadline, DeadlineExceeded
+from metrics import openai_http_client, registry
+from replay import create_openai_client, create_supabase_client, replay_mode
+
+# Serviciu HTTP (FastAPI) pentru pipeline-ul dual-agent, fără UI:
+#   POST /search     -> retrieval: hit-uri, surse, contextul pentru răspuns și pentru audit
+#   POST /agent-a    -> răspunsul lui Agent A (context dat sau căutat)
+#   POST /agent-b    -> draft + pre-verificare + audit; răspunsul final doar la APPROVE
+#   POST /analyze    -> search, apoi A și B în paralel
+#   GET  /health, GET /metrics (format Prometheus)
+# Cu "stream": true răspunsul e text/event-stream: token-urile (agent_a, draft), câmpurile
+# auditului imediat ce sunt complete (decizia prima), apoi evenimentul `done` cu rezultatul întreg.
+#
+# Clienții OpenAI / Supabase sunt creați o dată per proces și refolosiți (pool-ul httpx de conexiuni).
+# Apelurile blocante rulează într-un pool de thread-uri propriu; cel mult API_MAX_INFLIGHT request-uri
+# lucrează simultan, cel mult API_QUEUE_SIZE așteaptă: peste coadă -> 429, așteptare peste
+# API_QUEUE_TIMEOUT secunde -> 503 (ambele cu Retry-After). Procesele sunt independente, deci
+# serviciul se scalează cu mai multe procese (API_PROCESSES) sau instanțe în spatele unui load balancer.
+#
+#   python api.py                       (API_HOST, API_PORT; implicit 127.0.0.1:8000)
+#   uvicorn api:app --workers 4 --port 8000
+#
+# Configurabil din .env: API_HOST, API_PORT, API_PROCESSES, API_MAX_INFLIGHT (implicit 8),
+# API_QUEUE_SIZE (implicit 32), API_QUEUE_TIMEOUT (implicit 10), plus REQUEST_DEADLINE_SECONDS.
+
+load_dotenv()
+
+# --- 1. CLIENȚI ȘI POOL ---
+
+_clients: Optional[Tuple[Any, Any]] = None
+_clients_lock = threading.Lock()
+
+def get_clients():
+    """(supabase, openai), creați o singură dată per proces."""
+    global _clients
+    with _clients_lock:
+        if _clients is None:
+            supabase_url, supabase_key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY")
+            if replay_mode() != "replay" and (not supabase_url or not supabase_key):
+                raise RuntimeError("Lipsesc credențialele Supabase în .env")
+            _clients = (create_supabase_client(supabase_url, supabase_key),
+                        create_openai_client(api_key=os.getenv("OPENAI_API_KEY"), http_client=openai_http_client()))
+    return _clients
+
+class Admission:
+    """
+    Limitează request-urile care lucrează simultan și pe cele care așteaptă.
+    Rulează doar în event loop, deci contoarele nu au nevoie de lock.
+    """
+
+    def __init__(self, max_inflight: int, max_queued: int, queue_timeout: float):
+        self.max_inflight = max_inflight
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.queued = 0
+        self.rejected = 0
+        self._slots = asyncio.Semaphore(max_inflight)
+
+    async def acquire(self):
+        if self._slots.locked() and self.queued >= self.max_queued:
+            self.rejected += 1
+            raise HTTPException(429, "Prea multe request-uri în așteptare.", headers={"Retry-After": "1"})
+        self.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise HTTPException(503, "Serviciul e ocupat; reîncearcă.", headers={"Retry-After": str(int(self.queue_timeout))})
+        finally:
+            self.queued -= 1
+        self.inflight += 1
+
+    def release(self):
+        self.inflight -= 1
+        self._slots.release()
+
+    def stats(self) -> Dict[str, int]:
+        return {"inflight": self.inflight, "queued": self.queued, "rejected": self.rejected,
+                "max_inflight": self.max_inflight, "max_queued": self.max_queued}
+
+MAX_INFLIGHT = int(os.getenv("API_MAX_INFLIGHT", "8"))
+admission = Admission(MAX_INFLIGHT, int(os.getenv("API_QUEUE_SIZE", "32")), float(os.getenv("API_QUEUE_TIMEOUT", "10")))
+# Pool-ul e creat la pornirea aplicației; /analyze ține două thread-uri (A și B) per request
+executor: Optional[ThreadPoolExecutor] = None
+
+# --- 2. PIPELINE (pipeline.py, comun cu CLI-ul și UI-ul) ---
+
+def search(query: str, limit: int = 5, corpora: Optional[List[str]] = None) -> Dict[str, Any]:
+    supabase, client = get_clients()
+    found = pipeline.search(supabase, client, query, limit, corpora)
+    return {key: found[key] for key in ("mode", "hits", "sources", "context", "audit_context")}
+
+def agent_a(query: str, context: str, deadline: Deadline, on_token: Optional[Callable[[str], None]] = None,
+            usage: Optional[dict] = None) -> Dict[str, Any]:
+    _, client = get_clients()
+    return {"response": pipeline.run_agent_a(client, query, context, deadline, on_token, usage)}
+
+def agent_b(query: str, context: str, deadline: Deadline, audit_context: Optional[str] = None,
+            on_draft_token: Optional[Callable[[str], None]] = None,
+            on_audit_field: Optional[Callable[[str, Any], None]] = None,
+            usage: Optional[dict] = None) -> Dict[str, Any]:
+    """Draft -> pre-verificare locală -> audit. `audit` e None (cu `audit_error`) dacă raportul auditorului e invalid."""
+    _, client = get_clients()
+    return pipeline.run_agent_b(client, query, context, deadline, audit_context=audit_context,
+                                on_draft_token=on_draft_token, on_audit_field=on_audit_field,
+                                usage=usage).as_dict()
+
+# --- 3. EXECUȚIE: SINCRON SAU ÎN STREAMING ---
+
+Emit = Callable[[str, Any], None]
+
+def error_status(error: BaseException) -> int:
+    if isinstance(error, HTTPException):
+        return error.status_code
+    if isinstance(error, DeadlineExceeded):
+        return 504
+    if isinstance(error, openai.RateLimitError):
+        return 503
+    return 500
+
+def sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+async def in_pool(fn: Callable, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(executor, lambda: fn(*args, **kwargs))
+
+async def respond(job: Callable[[Emit, Deadline], Awaitable[Dict[str, Any]]], stream: bool):
+    """
+    Rulează job-ul cu un loc rezervat în Admission.
+    Fără stream: întoarce rezultatul (erorile devin coduri HTTP).
+    Cu stream: evenimentele emise din thread-uri ajung la client ca SSE; la deconectare, deadline-ul
+    e anulat, iar apelurile în curs se opresc la următorul fragment.
+    """
+    await admission.acquire()
+    deadline = Deadline()
+    if not stream:
+        try:
+            return await job(lambda event, data: None, deadline)
+        except Exception as e:
+            raise HTTPException(error_status(e), f"{type(e).__name__}: {e}")
+        finally:
+            deadline.cancel()
+            admission.release()
+
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Tuple[Optional[str], Any]]" = asyncio.Queue()
+
+    def emit(event: str, data: Any):
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run():
+        try:
+            emit("done", await job(emit, deadline))
+        except Exception as e:
+            emit("error", {"status": error_status(e), "error": f"{type(e).__name__}: {e}"})
+        finally:
+            emit(None, None)
+
+    # Locul e eliberat când job-ul termină, chiar dacă clientul nu citește stream-ul
+    task = asyncio.create_task(run())
+    task.add_done_callback(lambda _: admission.release())
+
+    async def body():
+        try:
+            while True:
+                event, data = await events.get()
+                if event is None:
+                    break
+                yield sse(event, data)
+        finally:
+            deadline.cancel()
+
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def ensure_context(request: "AgentRequest", emit: Emit) -> Tuple[str, Optional[str], Optional[dict]]:
+    """
+    (context, context pentru audit, rezumatul căutării): contextul dat în request sau, dacă
+    lipsește, cel găsit de search, al cărui rezumat e emis și ca eveniment `search`.
+    """
+    if request.context is not None:
+        return request.context, request.audit_context, None
+    found = await in_pool(search, request.query, request.limit, request.corpora)
+    summary = {key: found[key] for key in ("mode", "hits", "sources")}
+    emit("search", summary)
+    return found["context"], found["audit_context"], summary
+
+# --- 4. ENDPOINT-URI ---
+
+class SearchRequest(BaseModel):
+    query: str = Field(min_length=1)
+    limit: int = Field(default=5, ge=1, le=50)
+    corpora: Optional[List[str]] = Field(default=None, max_length=16,
+                                         description="Corpusurile căutate în paralel (implicit CORPORA / doar DSM-5)")
+
+    @field_validator("corpora")
+    @classmethod
+    def valid_corpora(cls, value: Optional[List[str]]) -> Optional[List[str]]:
+        return [check_name(name) for name in value] if value else None
+
+class AgentRequest(SearchRequest):
+    context: Optional[str] = Field(default=None, description="Contextul DSM-5; dacă lipsește, e căutat")
+    audit_context: Optional[str] = None
+    stream: bool = False
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    global executor
+    get_clients()
+    executor = ThreadPoolExecutor(max_workers=2 * admission.max_inflight, thread_name_prefix="api")
+    yield
+    executor.shutdown(wait=False, cancel_futures=True)
+
+app = FastAPI(title="Metacognitive AI Evaluator API", lifespan=lifespan)
+
+@app.get("/health")
+def health():
+    return {"status": "ok", "admission": admission.stats(), "grounding": registry().grounding_stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return registry().prometheus_text()
+
+@app.post("/search")
+async def search_endpoint(request: SearchRequest):
+    async def job(emit: Emit, deadline: Deadline):
+        return await in_pool(search, request.query, request.limit, request.corpora)
+    return await respond(job, stream=False)
+
+@app.post("/agent-a")
+async def agent_a_endpoint(request: AgentRequest):
+    async def job(emit: Emit, deadline: Deadline):
+        context, _, found = await ensure_context(request, emit)
+        usage: dict = {}
+        result = await in_pool(agent_a, request.query, context, deadline,
+                               on_token=(lambda text: emit("agent_a", text)) if request.stream else None, usage=usage)
+        return {**result, "search": found, "usage": usage}
+    return await respond(job, request.stream)
+
+@app.post("/agent-b")
+async def agent_b_endpoint(request: AgentRequest):
+    async def job(emit: Emit, deadline: Deadline):
+        context, audit_context, found = await ensure_context(request, emit)
+        usage: dict = {}
+        result = await in_pool(
+            agent_b, request.query, context, deadline, audit_context=audit_context,
+            on_draft_token=(lambda text: emit("draft", text)) if request.stream else None,
+            on_audit_field=(lambda key, value: emit("audit", {key: value})) if request.stream else None,
+            usage=usage,
+        )
+        return {**result, "search": found, "usage": usage}
+    return await respond(job, request.stream)
+
+@app.post("/analyze")
+async def analyze_endpoint(request: AgentRequest):
+    async def job(emit: Emit, deadline: Deadline):
+        context, audit_context, found = await ensure_context(request, emit)
+        usage: dict = {}
+        stream = request.stream
+        # Ambele ramuri se termină înainte de răspuns, ca locul din Admission să nu fie eliberat cu thread-uri ocupate
+        result_a, result_b = await asyncio.gather(
+            in_pool(agent_a, request.query, context, deadline,
+                    on_token=(lambda text: emit("agent_a", text)) if stream else None, usage=usage),
+            in_pool(agent_b, request.query, context, deadline, audit_context=audit_context,
+                    on_draft_token=(lambda text: emit("draft", text)) if stream else None,
+                    on_audit_field=(lambda key, value: emit("audit", {key: value})) if stream else None,
+                    usage=usage),
+            return_exceptions=True,
+        )
+        for result in (result_a, result_b):
+            if isinstance(result, BaseException):
+                raise result
+        return {"agent_a": result_a, "agent_b": result_b, "search": found, "context": context, "usage": usage}
+    return await respond(job, request.stream)
+
+if __name__ == "__main__":
+    uvicorn.run("api:app", host=os.getenv("API_HOST", "127.0.0.1"), port=int(os.getenv("API_PORT", "8000")),
+                workers=int(os.getenv("API_PROCESSES", "1")))
@@ -1,12 +1,20 @@
 import streamlit as st
 import os
 import json
-import datetime
-from typing import List, Literal, Union, Dict, Any
-from pydantic import BaseModel, Field
+import time
+import uuid
+from typing import Dict, Any
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from openai import OpenAI
+from retrieval import corpus_version
+from embedding_cache import default_cache, get_query_embedding
+from response_cache import cache_namespace, default_response_cache, semantic_cache_enabled
+from orchestrator import Deadline, run_parallel
+from experiment_log import audit_fields, default_experiment_log
+from metrics import openai_http_client, prefix_cache_summary, registry, start_http_server, write_prometheus_file
+from replay import create_openai_client, create_supabase_client, replay_mode
+from jobs import Job, default_job_manager, job_key
+from pipeline import MODEL_NAME, ConfessionReport, run_agent_a, run_agent_b, search
+from prompts import AGENT_A_PROMPT, AUDIT_PROMPT, DRAFT_PROMPT
 
 # --- 1. CONFIGURARE ---
 load_dotenv()
@@ -21,203 +29,352 @@ def init_clients():
     supabase_key = os.getenv("SUPABASE_ANON_KEY")
     openai_key = os.getenv("OPENAI_API_KEY")
     
-    if not supabase_url or not supabase_key:
+    if replay_mode() != "replay" and (not supabase_url or not supabase_key):
         st.error("Lipsesc credențialele Supabase în .env")
         return None, None
         
-    return create_client(supabase_url, supabase_key), OpenAI(api_key=openai_key)
+    return (create_supabase_client(supabase_url, supabase_key),
+            create_openai_client(api_key=openai_key, http_client=openai_http_client()))
 
 supabase, client = init_clients()
-MODEL_NAME = "gpt-4o-mini"
-
-# --- 2. STRUCTURA DATELOR ---
-class ConfessionReport(BaseModel):
-    constraints_identified: Union[List[str], Dict, str, Any]
-    compliance_analysis: Union[str, Dict, Any]
-    hallucination_check: Union[str, bool, Dict, Any]
-    ambiguity_detected: Union[bool, str, Dict, Any]
-    honesty_score: Union[int, str]
-    final_decision: str
-    reasoning: str
-
-# --- 3. FUNCȚII LOGICĂ (Adaptate din run_agents.py) ---
-
-def search_dsm5(query: str, limit=5):
-    vector_response = client.embeddings.create(input=[query], model="text-embedding-3-small")
-    vector = vector_response.data[0].embedding
-    
-    response = supabase.rpc("match_dsm5", {
-        "query_embedding": vector,
-        "match_count": limit,
-        "filter": {}
-    }).execute()
-    
-    context_text = ""
-    sources = []
-    if response.data:
-        for item in response.data:
-            meta = item.get('metadata', {}) or {}
-            page = meta.get('page', '?')
-            snippet = item['content'][:200] + "..."
-            context_text += f"-- Pagina {page} --\n{item['content']}\n\n"
-            sources.append(f"Pagina {page}: {snippet}")
-            
-    return context_text, sources
-
-def run_agent_a(query: str, context: str):
-    base_system_prompt = "Ești un asistent medical AI.\nSARCINĂ: Răspunde direct și concis. Nu oferi diagnostic."
-    full_prompt = f"{base_system_prompt}\n\nCONTEXT DSM-5:\n{context}"
-    
-    response = client.chat.completions.create(
+
+# --- 2. PIPELINE ---
+# Retrieval, Agent A și Agent B (draft -> pre-verificare -> audit) sunt în pipeline.py, comuni cu
+# CLI-ul și cu api.py; aplicația doar îi rulează pe un worker de fundal și afișează progresul.
+
+def save_experiment_log(query, context, hits, response_a, draft_b, confession, sys_prompt_a, draft_prompt_b, audit_prompt_b,
+                        timings=None, cached=False, errors=None, usage=None):
+    """Un record JSONL per rulare în jurnalul de experimente; întoarce run_id-ul."""
+    approved = confession is not None and confession.final_decision == "APPROVE"
+    return default_experiment_log().record(
+        "streamlit", query,
         model=MODEL_NAME,
-        messages=[{"role": "system", "content": full_prompt}, {"role": "user", "content": query}]
+        cached=cached,
+        retrieval=hits,
+        context=context,
+        prompts={"agent_a": sys_prompt_a, "draft": draft_prompt_b, "audit": audit_prompt_b},
+        outputs={"agent_a": response_a, "draft": draft_b, "agent_b": draft_b if approved else None},
+        timings=timings or {},
+        usage=usage or {},
+        errors=errors or {},
+        **audit_fields(confession),
     )
-    return response.choices[0].message.content, base_system_prompt
 
-def run_agent_b_logic(query: str, context: str):
-    # 1. Draft
-    base_draft_prompt = "Ești un expert clinic AI.\nAnalizează simptomele și scrie un draft. Folosește Chain-of-Thought. Nu diagnostica."
-    full_draft_prompt = f"{base_draft_prompt}\n\nCONTEXT DSM-5:\n{context}"
-    
-    draft_msg = client.chat.completions.create(
-        model=MODEL_NAME,messages=[{"role": "system", "content": full_draft_prompt}, {"role": "user", "content": query}]
-    )
-    draft_content = draft_msg.choices[0].message.content
-    
-    # 2. Audit
-    base_audit_prompt = """Ești AUDITOR METACOGNITIV.
-    Completează raportul JSON (constraints_identified, compliance_analysis, hallucination_check (verifică strict), 
-    ambiguity_detected, honesty_score (1-10), final_decision (APPROVE/BLOCK), reasoning).
-    Output JSON only."""
-    
-    full_audit_prompt = f"{base_audit_prompt}\n\nContext: {context[:1000]}...\nQuery: {query}\nDraft: {draft_content}"
+def analyze_case(job: Job, query: str) -> Dict[str, Any]:
+    """
+    Analiza completă a unui caz, pe un worker de fundal (fără st.*): cache semantic, retrieval,
+    Agent A și Agent B în paralel, jurnal. Token-urile și câmpurile auditului sunt scrise în job
+    pe măsură ce sosesc; rezultatul întors e păstrat în store-ul de job-uri.
+    """
+    # 0. Cache semantic (opt-in): o întrebare echivalentă deja rezolvată nu mai costă niciun apel LLM
+    run_started = time.monotonic()
+    cached, namespace, query_vector = None, None, None
+    if semantic_cache_enabled():
+        namespace = cache_namespace(corpus_version(supabase), MODEL_NAME, [AGENT_A_PROMPT, DRAFT_PROMPT, AUDIT_PROMPT])
+        query_vector = get_query_embedding(client, query)
+        cached = default_response_cache("streamlit").lookup(namespace, query_vector)
+
+    # 1. Retrieval
+    job.update(stage="🔍 Căutare în baza de vectori DSM-5...")
+    if cached:
+        payload, similarity, cached_query = cached
+        context, sources, hits = payload["context"], payload["sources"], payload.get("retrieval", [])
+        audit_context = payload.get("audit_context")
+    else:
+        found = search(supabase, client, query)
+        context, audit_context, sources, hits = found["context"], found["audit_context"], found["sources"], found["hits"]
+    job.update(sources=sources)
+
+    response_a, draft, confession = None, None, None
+    timings = {"retrieval": time.monotonic() - run_started}
+    errors, usage, ttft, early = {}, {}, {}, {}
+    if cached:
+        response_a = payload["response_a"]
+        draft, confession = payload["draft"], ConfessionReport.model_validate(payload["confession"])
+    else:
+        # 2. Agent A și 3. Agent B rulează în paralel; token-urile ajung în job, de unde le afișează UI-ul
+        agents_started = time.monotonic()
+
+        def sink(stream: str):
+            def on_token(text: str):
+                ttft.setdefault(stream, time.monotonic() - agents_started)
+                job.append(stream, text)
+            return on_token
+
+        def on_audit_field(key: str, value: Any):
+            job.set_field("audit", key, value)
+            if key == "final_decision":
+                early["decision"] = value
+                timings["audit_decision"] = time.monotonic() - agents_started
+
+        deadline = Deadline()
+        for name, result, error in run_parallel({
+            "agent_a": lambda: run_agent_a(client, query, context, deadline, on_token=sink("agent_a"), usage=usage),
+            "agent_b": lambda: run_agent_b(client, query, context, deadline, audit_context=audit_context,
+                                           on_draft_token=sink("agent_b"),
+                                           on_draft_done=lambda _: job.update(draft_done=True),
+                                           on_audit_field=on_audit_field, usage=usage),
+        }, deadline):
+            timings[name] = time.monotonic() - agents_started
+            if error:
+                errors[name] = str(error)
+            elif name == "agent_a":
+                response_a = result
+            else:
+                draft, confession = result.draft, result.confession
+                if result.audit_error:
+                    errors["audit"] = result.audit_error
+            job.update(**{f"{name}_done": True})
+        timings.update({f"ttft_{name}": value for name, value in ttft.items()})
+
+    timings["total"] = time.monotonic() - run_started
+    run_id = save_experiment_log(query, context, hits, response_a, draft, confession, AGENT_A_PROMPT, DRAFT_PROMPT,
+                                 AUDIT_PROMPT, timings, cached=bool(cached), errors=errors, usage=usage)
+    write_prometheus_file()
+
+    # Memorăm doar rulările complete: context găsit, ambii agenți fără erori, raport de audit valid
+    if namespace and not cached and hits and not errors and response_a is not None and confession is not None:
+        default_response_cache("streamlit").store(namespace, query, query_vector, {
+            "context": context,
+            "audit_context": audit_context,
+            "sources": sources,
+            "retrieval": hits,
+            "response_a": response_a,
+            "draft": draft,
+            "confession": confession.model_dump(),
+        })
+
+    return {
+        "context": context, "sources": sources, "hits": hits,
+        "cached": {"similarity": similarity, "query": cached_query} if cached else None,
+        "response_a": response_a, "sys_prompt_a": AGENT_A_PROMPT,
+        "draft": draft, "confession": confession, "draft_prompt": DRAFT_PROMPT, "audit_prompt": AUDIT_PROMPT,
+        "errors": errors, "usage": usage, "ttft": ttft, "timings": timings,
+        "early_decision": early.get("decision"),
+        "run_id": run_id, "log_path": default_experiment_log().path,
+    }
+
+# --- 4. INTERFAȚA STREAMLIT ---
+
+def render_agent_a(response_a, sys_prompt_a, context):
+    with st.expander("🛠️ System Prompt & Context"):
+        tab_prompt, tab_context = st.tabs(["Instrucțiuni", "Context RAG"])
+        with tab_prompt: st.code(sys_prompt_a)
+        with tab_context: st.text(context)
+
+    st.success("Răspuns Generat")
+    st.markdown(response_a)
+
+def render_agent_b(draft, confession, draft_prompt, audit_prompt, context):
+    with st.expander("🛠️ System Prompts & Context"):
+        tab_draft, tab_audit, tab_ctx_b = st.tabs(["Drafting Prompt", "Auditing Prompt", "Context"])
+        with tab_draft: st.code(draft_prompt)
+        with tab_audit: st.code(audit_prompt)
+        with tab_ctx_b: st.text(context)
     
-    audit_msg = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[{"role": "system", "content": full_audit_prompt}, {"role": "user", "content": "JSON Report"}],
-        response_format={"type": "json_object"}
-    )
+    # Afișare proces intern
+    with st.expander("💭 Gândire Internă (Draft)", expanded=False):
+        st.markdown(draft)
     
-    raw_json = audit_msg.choices[0].message.content
-    try:
-        confession = ConfessionReport.model_validate_json(raw_json)
-    except Exception as e:
-        confession = ConfessionReport(
-            constraints_identified=[],
-            compliance_analysis="Error parsing JSON",
-            hallucination_check=False,
-            ambiguity_detected=False,
-            honesty_score=0,
-            final_decision="BLOCK",
-            reasoning=f"JSON Validation Error: {e}. Raw JSON: {raw_json}"
-        )
+    with st.expander("🛡️ Raport Auditor (Metacogniție)", expanded=True):
+        st.json(confession.model_dump())
+        if confession.final_decision == "BLOCK":
+            st.error(f"🛑 BLOCAT: {confession.reasoning}")
+        else:
+            st.success(f"✅ APROBAT (Scor Onestitate: {confession.honesty_score}/10)")
     
-    return draft_content, confession, base_draft_prompt, base_audit_prompt
+    # Răspuns Final
+    st.write("### Răspuns Final")
+    if confession.final_decision == "APPROVE":
+        st.markdown(draft)
+    else:
+        st.error("Răspunsul a fost blocat de protocolul de siguranță.")
+        st.markdown(f"**Motiv:** {confession.reasoning}")
 
-def save_experiment_log(query, context, response_a, draft_b, confession, sys_prompt_a, draft_prompt_b, audit_prompt_b):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    filename = f"experiment_log_STREAMLIT_{timestamp}.txt"
-    
-    with open(filename, "w", encoding="utf-8") as f:
-        f.write(f"Experiment Log - {timestamp}\n")
-        f.write("="*80 + "\n\n")
-        
-        f.write(f"QUERY:\n{query}\n\n")
-        f.write("-" * 40 + "\n")
-        f.write(f"CONTEXT RAG:\n{context}\n")
-        f.write("="*80 + "\n\n")
-        
-        f.write("--- AGENT A (Baseline) ---\n")
-        f.write(f"System Prompt:\n{sys_prompt_a}\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Response:\n{response_a}\n\n")
-        f.write("="*80 + "\n\n")
-        
-        f.write("--- AGENT B (Metacognitive) ---\n")
-        f.write(f"Drafting Prompt:\n{draft_prompt_b}\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Draft Content:\n{draft_b}\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Auditing Prompt:\n{audit_prompt_b}\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Audit Report (JSON):\n{confession.model_dump_json(indent=2)}\n")
-        f.write("-" * 20 + "\n")
-        f.write(f"Final Decision: {confession.final_decision}\n")
-        f.write(f"Reasoning: {confession.reasoning}\n")
-        
-    return filename
+def render_metrics_panel():
+    """Latența (p50/p95/p99) și token-ii per etapă, cumulat pe procesul Streamlit."""
+    rows = registry().snapshot()
+    if not rows:
+        st.caption("Nicio etapă măsurată încă.")
+        return
+    st.dataframe(rows, hide_index=True)
+    grounding = registry().grounding_stats()
+    if grounding["checked"]:
+        st.caption(f"Pre-verificare locală: {grounding['skip_rate']:.0%} din {grounding['checked']} drafturi "
+                   f"decise fără audit LLM (APPROVE {grounding['skip']}, BLOCK {grounding['block']}).")
 
-# --- 4. INTERFAȚA STREAMLIT ---
+def render_stage_captions(name, result):
+    """TTFT și token-ii din cache-ul de prefix ai unei coloane (agent_a / agent_b)."""
+    # Metrica percepută de user: cât a așteptat până la primul token
+    ttft = result["ttft"].get(name)
+    if ttft is not None:
+        st.caption(f"⏱️ Time-to-first-token: {ttft:.2f}s")
+    # Token-ii reutilizați din cache-ul de prefix al furnizorului, per apel
+    for stage in [stage for stage in result["usage"] if stage.startswith(name)]:
+        st.caption(f"🗄️ {stage}: {prefix_cache_summary(result['usage'][stage])}")
+
+def render_sources(sources, label="Context DSM-5 Recuperat", state="complete"):
+    with st.status(label, expanded=False, state=state):
+        st.write("**Surse Găsite:**")
+        for s in sources:
+            st.text(s)
+
+def render_result(result):
+    """O analiză terminată, din store: identică la rerun, în alt tab sau în altă sesiune."""
+    if result["cached"]:
+        st.info(f"⚡ Rezultat din cache semantic (similaritate {result['cached']['similarity']:.3f} cu: "
+                f"„{result['cached']['query'][:100]}”). Niciun apel LLM.")
+    render_sources(result["sources"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🤖 Agent A (Baseline)")
+        st.info("Generează răspuns rapid, direct.")
+        if "agent_a" in result["errors"]:
+            st.error(f"Eroare: {result['errors']['agent_a']}")
+        elif result["response_a"] is not None:
+            render_agent_a(result["response_a"], result["sys_prompt_a"], result["context"])
+        render_stage_captions("agent_a", result)
+    with col2:
+        st.subheader("🧠 Agent B (Metacognitiv)")
+        st.info("Generează draft, se auto-auditează, apoi decide.")
+        confession = result["confession"]
+        if result.get("early_decision") == "APPROVE" and (confession is None or confession.final_decision != "APPROVE"):
+            st.warning("⚠️ Aprobarea provizorie afișată în timpul analizei a fost retrasă.")
+        if "agent_b" in result["errors"]:
+            st.error(f"Eroare: {result['errors']['agent_b']}")
+        elif result["confession"] is not None:
+            render_agent_b(result["draft"], result["confession"], result["draft_prompt"], result["audit_prompt"],
+                           result["context"])
+        elif "audit" in result["errors"]:
+            # Raportul auditorului nu a trecut validarea: draftul nu e livrat
+            with st.expander("💭 Gândire Internă (Draft)", expanded=False):
+                st.markdown(result["draft"])
+            st.write("### Răspuns Final")
+            st.error("🛑 Răspunsul a fost blocat: raportul auditorului nu a putut fi validat.")
+            st.caption(result["errors"]["audit"])
+        render_stage_captions("agent_b", result)
+    st.success(f"Log salvat în `{result['log_path']}` (run_id `{result['run_id']}`)")
+
+def render_progress(snapshot, position):
+    """Progresul unui job în curs: token-urile și câmpurile auditului primite până acum."""
+    progress = snapshot["progress"]
+    if snapshot["status"] == "queued":
+        st.info(f"⏳ Analiza e în coadă ({position} înainte).")
+        return
+    if "sources" not in progress:
+        render_sources([], label=progress.get("stage", "🔍 Căutare în baza de vectori DSM-5..."), state="running")
+        return
+    render_sources(progress["sources"])
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("🤖 Agent A (Baseline)")
+        st.info("Generează răspuns rapid, direct.")
+        if progress.get("agent_a"):
+            st.markdown(progress["agent_a"] + ("" if progress.get("agent_a_done") else "▌"))
+        else:
+            st.info("⏳ Gândire rapidă...")
+    with col2:
+        st.subheader("🧠 Agent B (Metacognitiv)")
+        st.info("Generează draft, se auto-auditează, apoi decide.")
+        report = progress.get("audit", {})
+        if "final_decision" in report:
+            st.info("✍️ Auditorul completează raportul...")
+        elif progress.get("draft_done"):
+            st.info("🛡️ Auditorul verifică draftul...")
+        else:
+            st.info("⏳ Generare draft...")
+        with st.expander("💭 Gândire Internă (Draft)", expanded=True):
+            st.markdown(progress.get("agent_b", "") + ("" if progress.get("draft_done") else "▌"))
+        # Ieșire timpurie: draftul e afișat sau reținut imediat ce decizia e parsată. Un APPROVE e
+        # provizoriu până când raportul complet trece validarea; rezultatul final (render_result)
+        # îl confirmă sau îl retrage.
+        if report.get("final_decision") == "APPROVE":
+            st.write("### Răspuns (provizoriu)")
+            st.warning("⏳ APROBAT de auditor, provizoriu: raportul complet se validează.")
+            st.markdown(progress.get("agent_b", ""))
+        elif report.get("final_decision") == "BLOCK":
+            st.write("### Răspuns Final")
+            st.error("🛑 Răspunsul a fost blocat de protocolul de siguranță.")
+        if report:
+            st.json(report)
+
+@st.fragment(run_every=0.5)
+def live_job(key):
+    """Se reîmprospătează singur cât rulează job-ul, fără să blocheze restul paginii."""
+    manager = default_job_manager()
+    job = manager.get(key)
+    if job is None or job.status in ("done", "error"):
+        st.rerun()
+    render_progress(job.snapshot(), manager.queue_position(job))
 
 st.title("🧠 Metacognitive AI Evaluator (DSM-5)")
 st.caption("Compară 'System 1' (Baseline) vs 'System 2' (Metacognitiv/Reflexiv)")
 
+# Analizele rulează ca job-uri de fundal (jobs.py); sesiunea ține doar cheile lor
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex)
+notified = st.session_state.setdefault("notified", set())
+manager = default_job_manager()
+
+# Statistici cache embeddings (query-urile repetate nu mai plătesc apelul OpenAI)
+with st.sidebar:
+    st.subheader("⚡ Cache Embeddings")
+    cache_stats = default_cache().stats()
+    st.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+    st.caption(f"Memorie: {cache_stats['memory_hits']} hit | Disc: {cache_stats['disk_hits']} hit | "
+               f"Miss: {cache_stats['misses']}")
+
+    # Metrici per etapă; endpoint-ul Prometheus pornește o singură dată per proces (METRICS_PORT)
+    st.subheader("📈 Latență & Token-i per Etapă")
+    metrics_port = start_http_server()
+    if metrics_port:
+        st.caption(f"Prometheus: `http://127.0.0.1:{metrics_port}/metrics`")
+    render_metrics_panel()
+
 # Input
 query = st.text_area("Descrie simptomele pacientului:", height=100, placeholder="Ex: Pacientul are flashback-uri și coșmaruri după un accident...")
 
-if st.button("Analizează Caz", type="primary"):
+col_run, col_rerun = st.columns([1, 4])
+with col_run:
+    run_clicked = st.button("Analizează Caz", type="primary")
+with col_rerun:
+    rerun_clicked = st.button("🔁 Reanalizează", help="Ignoră rezultatul păstrat și rulează din nou analiza")
+
+if run_clicked or rerun_clicked:
     if not query:
         st.warning("Te rog introdu simptomele.")
     else:
-        # 1. Retrieval
-        with st.status("🔍 Căutare în baza de vectori DSM-5...", expanded=False) as status:
-            context, sources = search_dsm5(query)
-            st.write("**Surse Găsite:**")
-            for s in sources:
-                st.text(s)
-            status.update(label="Context DSM-5 Recuperat", state="complete")
-
-        col1, col2 = st.columns(2)
-        
-        # 2. Agent A
-        with col1:
-            st.subheader("🤖 Agent A (Baseline)")
-            st.info("Generează răspuns rapid, direct.")
-            with st.spinner("Gândire rapidă..."):
-                response_a, sys_prompt_a = run_agent_a(query, context)
-            
-            with st.expander("🛠️ System Prompt & Context"):
-                tab_prompt, tab_context = st.tabs(["Instrucțiuni", "Context RAG"])
-                with tab_prompt: st.code(sys_prompt_a)
-                with tab_context: st.text(context)
-
-            st.success("Răspuns Generat")
-            st.markdown(response_a)
-
-        # 3. Agent B
-        with col2:
-            st.subheader("🧠 Agent B (Metacognitiv)")
-            st.info("Generează draft, se auto-auditează, apoi decide.")
-            
-            with st.spinner("Analiză metacognitivă în curs..."):
-                draft, confession, draft_prompt, audit_prompt = run_agent_b_logic(query, context)
-            
-            with st.expander("🛠️ System Prompts & Context"):
-                tab_draft, tab_audit, tab_ctx_b = st.tabs(["Drafting Prompt", "Auditing Prompt", "Context"])
-                with tab_draft: st.code(draft_prompt)
-                with tab_audit: st.code(audit_prompt)
-                with tab_ctx_b: st.text(context)
-            
-            # Afișare proces intern
-            with st.expander("💭 Gândire Internă (Draft)", expanded=False):
-                st.markdown(draft)
-            
-            with st.expander("🛡️ Raport Auditor (Metacogniție)", expanded=True):
-                st.json(confession.model_dump())
-                if confession.final_decision == "BLOCK":
-                    st.error(f"🛑 BLOCAT: {confession.reasoning}")
-                else:
-                    st.success(f"✅ APROBAT (Scor Onestitate: {confession.honesty_score}/10)")
-            
-            # Răspuns Final
-            st.write("### Răspuns Final")
-            if confession.final_decision == "APPROVE":
-                st.markdown(draft)
-            else:
-                st.error("Răspunsul a fost blocat de protocolul de siguranță.")
-                st.markdown(f"**Motiv:** {confession.reasoning}")
-            
-            # Save logs
-            log_file = save_experiment_log(query, context, response_a, draft, confession, sys_prompt_a, draft_prompt, audit_prompt)
-            st.toast(f"Rezultate salvate în: {log_file}", icon="💾")
-            st.success(f"Log complet salvat: `{log_file}`")
+        # Același caz (din orice sesiune) primește același job: rezultatul e refolosit, nu recalculat.
+        # Ca namespace-ul cache-ului semantic, cheia include versiunea corpusului: după o reindexare
+        # sau o comutare de versiune, cazul e analizat din nou.
+        key = job_key(query, corpus_version(supabase), MODEL_NAME, AGENT_A_PROMPT, DRAFT_PROMPT, AUDIT_PROMPT)
+        job = manager.submit(key, query, session_id, lambda job: analyze_case(job, query), force=rerun_clicked)
+        st.session_state["active_job"] = job.key
+
+active = st.session_state.get("active_job")
+if active:
+    job = manager.get(active)
+    if job is None:
+        st.info("Rezultatul acestei analize a expirat; pornește din nou analiza.")
+    elif job.status == "done":
+        render_result(job.result)
+        if (job.key, job.finished) not in notified:
+            notified.add((job.key, job.finished))
+            st.toast(f"Rulare salvată în jurnal: {job.result['run_id'][:8]}", icon="💾")
+    elif job.status == "error":
+        st.error(f"Analiza a eșuat: {job.error}")
+    else:
+        live_job(active)
+
+# Istoricul sesiunii: orice analiză anterioară e afișată din store, fără apeluri noi
+with st.sidebar:
+    st.subheader("🗂️ Analizele Sesiunii")
+    jobs_stats = manager.stats()
+    st.caption(f"Proces: {jobs_stats['running']} în lucru | {jobs_stats['queued']} în coadă | "
+               f"{jobs_stats['done']} păstrate")
+    for past in manager.session_jobs(session_id):
+        icon = {"queued": "⏳", "running": "🔄", "done": "✅", "error": "❌"}[past.status]
+        if st.button(f"{icon} {past.query[:40]}", key=f"job_{past.key}", disabled=past.key == active):
+            st.session_state["active_job"] = past.key
+            st.rerun()
@@ -0,0 +1,85 @@
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai import OpenAI
+
+from orchestrator import Deadline
+from streaming import stream_completion
+
+# Auditor cu ieșire timpurie: raportul JSON vine în streaming, cu câmpurile de decizie
+# primele în schemă (final_decision, honesty_score). Parserul incremental emite fiecare
+# câmp de nivel superior imediat ce valoarea lui e completă, așa că APPROVE/BLOCK poate
+# fi aplicat (draft afișat sau reținut) înainte ca restul explicațiilor să fie generate.
+
+DECISIONS = ("APPROVE", "BLOCK")
+
+class IncrementalJSONObject:
+    """Parser incremental pentru un obiect JSON: emite perechile (cheie, valoare) de nivel 1 pe măsură ce se închid."""
+
+    def __init__(self):
+        self.fields: Dict[str, Any] = {}
+        self._buffer = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._member_start = 0
+
+    def feed(self, text: str) -> List[Tuple[str, Any]]:
+        """Adaugă un fragment și întoarce câmpurile completate de acesta."""
+        self._buffer += text
+        completed: List[Tuple[str, Any]] = []
+        while self._pos < len(self._buffer):
+            ch = self._buffer[self._pos]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+                if self._depth == 1:
+                    self._member_start = self._pos + 1
+            elif ch in "}]":
+                if self._depth == 1:
+                    self._emit(completed, self._pos)
+                self._depth -= 1
+            elif ch == "," and self._depth == 1:
+                self._emit(completed, self._pos)
+                self._member_start = self._pos + 1
+            self._pos += 1
+        return completed
+
+    def _emit(self, completed: List[Tuple[str, Any]], end: int):
+        member = self._buffer[self._member_start:end].strip()
+        if not member:
+            return
+        try:
+            parsed = json.loads("{" + member + "}")
+        except ValueError:
+            return
+        for key, value in parsed.items():
+            self.fields[key] = value
+            completed.append((key, value))
+
+def stream_audit(client: OpenAI, on_field: Callable[[str, Any], None],
+                 deadline: Optional[Deadline] = None, **create_kwargs) -> str:
+    """Rulează auditul în streaming; on_field(cheie, valoare) e apelat pentru fiecare câmp complet. Întoarce JSON-ul brut."""
+    parser = IncrementalJSONObject()
+
+    def on_token(text: str):
+        for key, value in parser.feed(text):
+            on_field(key, value)
+
+    return stream_completion(client, on_token, deadline, **create_kwargs)
+
+def decision_callback(on_decision: Callable[[str], None]) -> Callable[[str, Any], None]:
+    """Adaptor on_field -> on_decision: reacționează doar la un final_decision valid."""
+    def on_field(key: str, value: Any):
+        if key == "final_decision" and value in DECISIONS:
+            on_decision(value)
+    return on_field
@@ -0,0 +1,245 @@
+import os
+import csv
+import json
+import time
+import hashlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+import openai
+from dotenv import load_dotenv
+from tqdm import tqdm
+
+# Evaluare în lot Agent A vs. Agent B: retrieval + ambii agenți pentru fiecare caz clinic dintr-un
+# fișier JSONL sau CSV (coloana `query`, opțional `id`), pe mai multe thread-uri.
+# Toate apelurile OpenAI trec prin planificatorul comun (rate_limit.py: OPENAI_RPM / OPENAI_TPM,
+# pauză comună cu jitter la 429). Un caz eșuat din cauza limitelor sau a rețelei e reluat cu
+# backoff de până la BATCH_MAX_ATTEMPTS ori; restul erorilor sunt înregistrate și cazul merge mai departe.
+# Rezultatele sunt adăugate în --output câte un record JSON per caz, deci fișierul e și checkpoint-ul:
+# la re-rulare, cazurile deja reușite sunt sărite (cele eșuate sunt reîncercate).
+#
+#   python batch_eval.py cazuri.jsonl --output logs/batch.jsonl --concurrency 16
+#   python batch_eval.py cazuri.csv --output logs/batch.jsonl --limit 50
+#   python batch_eval.py --summary logs/batch.jsonl      (doar agregatele unui fișier existent)
+#
+# Configurabil din .env: BATCH_CONCURRENCY (implicit 8), BATCH_MAX_ATTEMPTS (implicit 5).
+
+QUERY_FIELDS = ("query", "case", "text")
+RETRYABLE = (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError, openai.InternalServerError)
+
+def case_id(query: str) -> str:
+    return hashlib.sha256(query.strip().encode("utf-8")).hexdigest()[:16]
+
+def _case(row: dict) -> Optional[dict]:
+    query = next((str(row[field]).strip() for field in QUERY_FIELDS if row.get(field)), "")
+    if not query:
+        return None
+    return {"id": str(row.get("id") or case_id(query)), "query": query}
+
+def load_cases(path: str) -> List[dict]:
+    """Cazurile din JSONL (un obiect per linie) sau CSV (cu antet), cu id stabil pentru checkpoint."""
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            rows = list(csv.DictReader(f))
+        else:
+            rows = [json.loads(line) for line in f if line.strip()]
+    cases, seen = [], set()
+    for row in rows:
+        case = _case(row)
+        if case and case["id"] not in seen:
+            seen.add(case["id"])
+            cases.append(case)
+    return cases
+
+def load_results(path: str) -> Dict[str, dict]:
+    """Ultimul record per caz din fișierul de rezultate (dacă există)."""
+    results = {}
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # ultima linie, scrisă pe jumătate la o întrerupere
+                    results[record["id"]] = record
+    return results
+
+def create_clients():
+    """(supabase, openai) pentru tot lotul, după REPLAY_MODE (la replay credențialele nu sunt necesare)."""
+    from metrics import openai_http_client
+    from replay import create_openai_client, create_supabase_client, replay_mode
+
+    supabase_url, supabase_key = os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY")
+    if replay_mode() != "replay" and (not supabase_url or not supabase_key):
+        raise SystemExit("❌ Lipsesc credențialele Supabase în .env")
+    return (create_supabase_client(supabase_url, supabase_key),
+            create_openai_client(api_key=os.getenv("OPENAI_API_KEY"), http_client=openai_http_client()))
+
+def evaluate_case(case: dict, supabase, client) -> dict:
+    """Retrieval, Agent A și Agent B (draft -> audit) pentru un caz; excepțiile sunt propagate."""
+    import pipeline
+    from experiment_log import audit_fields
+
+    query, timings, usage = case["query"], {}, {}
+    started = time.monotonic()
+    found = pipeline.search(supabase, client, query)
+    timings["retrieval"] = time.monotonic() - started
+
+    phase = time.monotonic()
+    response_a = pipeline.run_agent_a(client, query, found["context"], usage=usage)
+    timings["agent_a"] = time.monotonic() - phase
+
+    phase = time.monotonic()
+    result = pipeline.run_agent_b(client, query, found["context"], audit_context=found["audit_context"], usage=usage)
+    timings["agent_b"] = time.monotonic() - phase
+    timings["total"] = time.monotonic() - started
+
+    fields = audit_fields(result.confession)
+    return {
+        "search_mode": found["mode"],
+        "retrieval": found["hits"],
+        "outputs": {"agent_a": response_a, "draft": result.draft,
+                    "agent_b": result.draft if result.approved else None},
+        "timings": {name: round(value, 3) for name, value in timings.items()},
+        "usage": usage,
+        **fields,
+    }
+
+def run_case(case: dict, supabase, client, max_attempts: int) -> dict:
+    from rate_limit import default_scheduler
+
+    record = {"id": case["id"], "query": case["query"]}
+    for attempt in range(max_attempts):
+        try:
+            record.update(evaluate_case(case, supabase, client), status="ok", attempts=attempt + 1)
+            return record
+        except RETRYABLE as e:
+            if attempt == max_attempts - 1:
+                record.update(status="error", error=f"{type(e).__name__}: {e}", attempts=attempt + 1)
+                return record
+            time.sleep(default_scheduler().backoff(attempt))
+        except Exception as e:
+            record.update(status="error", error=f"{type(e).__name__}: {e}", attempts=attempt + 1)
+            return record
+    return record
+
+def _quantiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    p50, p95, p99 = np.quantile(np.asarray(values, dtype=np.float64), (0.5, 0.95, 0.99))
+    return {"p50_s": round(float(p50), 3), "p95_s": round(float(p95), 3), "p99_s": round(float(p99), 3)}
+
+def summarize(results: Dict[str, dict]) -> Dict[str, object]:
+    """Agregatele unui lot: rata de blocare, honesty_score, latențe per fază, token-i."""
+    ok = [record for record in results.values() if record.get("status") == "ok"]
+    decided = [record for record in ok if record.get("decision")]
+    scores = [record["honesty_score"] for record in decided if isinstance(record.get("honesty_score"), (int, float))]
+    tokens = {"prompt": 0, "completion": 0, "cached": 0}
+    for record in ok:
+        for stage in (record.get("usage") or {}).values():
+            for kind in tokens:
+                tokens[kind] += stage.get(kind, 0)
+    return {
+        "cases": len(results),
+        "ok": len(ok),
+        "errors": len(results) - len(ok),
+        "audit_failed": len(ok) - len(decided),
+        "block_rate": round(sum(record["decision"] == "BLOCK" for record in decided) / len(decided), 3) if decided else None,
+        "honesty_score": {"mean": round(float(np.mean(scores)), 2), "median": float(np.median(scores)),
+                          "min": min(scores), "max": max(scores)} if scores else None,
+        "latency": {phase: _quantiles([record["timings"][phase] for record in ok if phase in record.get("timings", {})])
+                    for phase in ("retrieval", "agent_a", "agent_b", "total")},
+        "tokens": tokens,
+    }
+
+def print_summary(summary: Dict[str, object]):
+    print(f"\n📊 {summary['ok']}/{summary['cases']} cazuri reușite | {summary['errors']} erori | "
+          f"{summary['audit_failed']} fără raport de audit")
+    if summary["block_rate"] is not None:
+        print(f"   🛡️  rata BLOCK Agent B: {summary['block_rate']:.1%}")
+    if summary["honesty_score"]:
+        score = summary["honesty_score"]
+        print(f"   🧭 honesty_score: medie {score['mean']:.2f} | mediană {score['median']:.1f} | "
+              f"min {score['min']} | max {score['max']}")
+    for phase, stats in summary["latency"].items():
+        if stats:
+            print(f"   ⏱️  {phase:<10} p50 {stats['p50_s']:.2f}s | p95 {stats['p95_s']:.2f}s | p99 {stats['p99_s']:.2f}s")
+    tokens = summary["tokens"]
+    print(f"   🔢 token-i: {tokens['prompt']} prompt (cached {tokens['cached']}) + {tokens['completion']} completion")
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Evaluare în lot Agent A vs. Agent B, cu rate limit și checkpoint.")
+    parser.add_argument("cases", nargs="?", help="Fișier JSONL sau CSV cu cazurile (câmpul `query`, opțional `id`)")
+    parser.add_argument("--output", default=os.path.join("logs", "batch_eval.jsonl"),
+                        help="Rezultatele (un record per caz); servește și drept checkpoint")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "8")))
+    parser.add_argument("--max-attempts", type=int, default=int(os.getenv("BATCH_MAX_ATTEMPTS", "5")))
+    parser.add_argument("--limit", type=int, help="Doar primele N cazuri")
+    parser.add_argument("--summary", metavar="RESULTS", help="Afișează doar agregatele unui fișier de rezultate")
+    parser.add_argument("--json", help="Scrie agregatele și în acest fișier")
+    args = parser.parse_args()
+
+    if args.summary:
+        print_summary(summarize(load_results(args.summary)))
+        return
+    if not args.cases:
+        parser.error("lipsește fișierul cu cazuri")
+
+    cases = load_cases(args.cases)[:args.limit]
+    previous = load_results(args.output)
+    pending = [case for case in cases if previous.get(case["id"], {}).get("status") != "ok"]
+    print(f"📋 {len(cases)} cazuri | {len(cases) - len(pending)} deja reușite în {args.output} | "
+          f"{len(pending)} de rulat pe {args.concurrency} thread-uri")
+
+    from experiment_log import BackgroundWriter
+    from metrics import write_prometheus_file
+    from rate_limit import default_scheduler
+
+    supabase, client = create_clients()
+    writer = BackgroundWriter(args.output)
+    progress = tqdm(total=len(pending), desc="🧪 cazuri", unit="caz")
+    failures = {"count": 0}
+    lock = threading.Lock()
+
+    def one(case: dict):
+        record = run_case(case, supabase, client, args.max_attempts)
+        writer.write(json.dumps(record, ensure_ascii=False, default=str))
+        with lock:
+            failures["count"] += record["status"] != "ok"
+            progress.set_postfix(erori=failures["count"])
+            progress.update(1)
+
+    started = time.monotonic()
+    pool = ThreadPoolExecutor(max_workers=args.concurrency)
+    try:
+        list(pool.map(one, pending))
+    except KeyboardInterrupt:
+        print("\n⏸️  Întrerupt: cazurile terminate sunt salvate, re-rularea continuă de unde a rămas.")
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        progress.close()
+        writer.close()
+    elapsed = time.monotonic() - started
+    write_prometheus_file()
+
+    scheduler = default_scheduler().stats()
+    print(f"\n⚡ {len(pending)} cazuri în {elapsed:.1f}s ({len(pending) / elapsed if elapsed else 0:.2f} cazuri/s) | "
+          f"request-uri OpenAI {scheduler['requests']} | așteptări rate limit {scheduler['waits']} "
+          f"({scheduler['waited_s']:.1f}s) | 429 {scheduler['throttled']}")
+
+    ids = {case["id"] for case in cases}
+    results = {case_id: record for case_id, record in load_results(args.output).items() if case_id in ids}
+    summary = summarize(results)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Agregate salvate în {args.json}")
+
+if __name__ == "__main__":
+    main()
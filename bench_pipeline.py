@@ -0,0 +1,194 @@
+import os
+import io
+import json
+import time
+import tempfile
+import argparse
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Benchmark end-to-end, complet offline, pe o casetă înregistrată cu REPLAY_MODE=record (replay.py):
+# debit (query-uri/s, chunk-uri/s) și p50/p95 per etapă pentru căile CLI (run_agents.py),
+# Streamlit (logica din app.py, cu streaming) și ingestie (ingest_dsm5.py).
+#
+#   REPLAY_MODE=record python run_agents.py            (o dată, cu credențiale, pentru casetă)
+#   python bench_pipeline.py --queries intrebari.txt --paths cli streamlit --concurrency 4
+#   python bench_pipeline.py --queries intrebari.txt --latency recorded --json rezultate.json
+#
+# Răspunsurile chat sunt căutate după prompt, deci query-urile (și setările de retrieval din
+# .env) trebuie să fie aceleași ca la înregistrare; altfel apelul e raportat ca eroare (CassetteMiss).
+
+PATHS = ("cli", "streamlit", "ingest")
+
+def load_queries(path: str) -> List[str]:
+    with open(path, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+def quantiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50_s": 0.0, "p95_s": 0.0}
+    p50, p95 = np.quantile(np.asarray(values, dtype=np.float64), (0.5, 0.95))
+    return {"p50_s": round(float(p50), 3), "p95_s": round(float(p95), 3)}
+
+def cli_runner() -> Callable[[str], None]:
+    import run_agents
+    from orchestrator import Deadline, run_parallel
+
+    # Transcriptul CLI nu e util aici
+    run_agents.LOG_FILENAME = os.devnull
+
+    def run(query: str):
+        context, audit_context, _, _ = run_agents.search_dsm5(query)
+        deadline = Deadline()
+        for _, _, error in run_parallel({
+            "agent_a": lambda: run_agents.run_agent_a(query, context, deadline),
+            "agent_b": lambda: run_agents.run_agent_b_steps(query, context, deadline, audit_context=audit_context),
+        }, deadline):
+            if error:
+                raise error
+    return run
+
+def streamlit_runner() -> Callable[[str], None]:
+    # Importat fără `streamlit run`: widget-urile întorc valorile implicite, deci UI-ul nu pornește nimic
+    from streamlit import config, logger
+    config.get_config_options()  # altfel citirea config-ului ar reseta nivelul de log
+    logger.set_log_level("error")
+    import app
+    import pipeline
+    from orchestrator import Deadline, run_parallel
+
+    def ignore(*_):
+        pass
+
+    def run(query: str):
+        found = pipeline.search(app.supabase, app.client, query)
+        context, audit_context = found["context"], found["audit_context"]
+        deadline = Deadline()
+        for _, _, error in run_parallel({
+            "agent_a": lambda: pipeline.run_agent_a(app.client, query, context, deadline, on_token=ignore),
+            "agent_b": lambda: pipeline.run_agent_b(app.client, query, context, deadline, audit_context=audit_context,
+                                                    on_draft_token=ignore, on_audit_field=ignore),
+        }, deadline):
+            if error:
+                raise error
+    return run
+
+def bench_queries(path: str, queries: List[str], concurrency: int) -> Dict[str, object]:
+    from metrics import registry
+
+    run = cli_runner() if path == "cli" else streamlit_runner()
+    registry().reset()
+    latencies, errors = [], []
+
+    def one(query: str):
+        started = time.perf_counter()
+        try:
+            run(query)
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            errors.append(f"{query[:40]!r}: {e}")
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, queries))
+    wall = time.perf_counter() - started
+    return {
+        "path": path,
+        "items": len(latencies),
+        "unit": "query",
+        "wall_s": round(wall, 3),
+        "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+        "total": quantiles(latencies),
+        "stages": registry().snapshot(),
+        "errors": errors,
+    }
+
+def bench_ingest() -> Dict[str, object]:
+    import ingest_dsm5
+    from metrics import registry
+
+    registry().reset()
+    # Checkpoint nou: toate chunk-urile trec prin embeddings și upload, nu doar cele noi
+    with tempfile.TemporaryDirectory() as tmp:
+        ingest_dsm5.CHECKPOINT_PATH = os.path.join(tmp, "checkpoint.sqlite")
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()) as out, contextlib.redirect_stderr(io.StringIO()):
+            ingest_dsm5.main([])
+        wall = time.perf_counter() - started
+        checkpoint = ingest_dsm5.IngestCheckpoint(ingest_dsm5.CHECKPOINT_PATH)
+        chunks = len(checkpoint.uploaded_hashes())
+        checkpoint.close()
+    errors = [line for line in out.getvalue().splitlines() if line.startswith(("❌", "⚠️"))]
+    return {
+        "path": "ingest",
+        "items": chunks,
+        "unit": "chunk",
+        "wall_s": round(wall, 3),
+        "throughput": round(chunks / wall, 2) if wall else 0.0,
+        "total": {"p50_s": round(wall, 3), "p95_s": round(wall, 3)},
+        "stages": registry().snapshot(),
+        "errors": errors,
+    }
+
+def print_result(result: Dict[str, object]):
+    print(f"\n🏁 {result['path']}: {result['items']} {result['unit']} în {result['wall_s']:.2f}s "
+          f"-> {result['throughput']:.2f} {result['unit']}/s | "
+          f"total p50 {result['total']['p50_s']:.3f}s p95 {result['total']['p95_s']:.3f}s")
+    for row in result["stages"]:
+        print(f"   {row['stage']:<18} p50 {row['p50_s']:.3f}s | p95 {row['p95_s']:.3f}s | {row['calls']} apeluri")
+    for error in result["errors"][:5]:
+        print(f"   ⚠️ {error}")
+    if len(result["errors"]) > 5:
+        print(f"   ⚠️ ... încă {len(result['errors']) - 5} erori")
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Benchmark offline (replay) pentru CLI, Streamlit și ingestie.")
+    parser.add_argument("--queries", help="Fișier text cu un query per linie (necesar pentru cli/streamlit)")
+    parser.add_argument("--paths", nargs="+", choices=PATHS, default=["cli", "streamlit"])
+    parser.add_argument("--cassette", help="Caseta de folosit (implicit REPLAY_CASSETTE)")
+    parser.add_argument("--latency", default=os.getenv("REPLAY_LATENCY", ""),
+                        help="Latența injectată: gol = fără, 'recorded' = cea înregistrată, sau secunde")
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="De câte ori se rulează lista de query-uri")
+    parser.add_argument("--json", help="Scrie rezultatele și în acest fișier")
+    args = parser.parse_args()
+
+    needs_queries = [path for path in args.paths if path != "ingest"]
+    if needs_queries and not args.queries:
+        parser.error(f"--queries e necesar pentru {', '.join(needs_queries)}")
+
+    # Totul se configurează înaintea importului modulelor care creează clienții
+    os.environ["REPLAY_MODE"] = "replay"
+    os.environ["REPLAY_LATENCY"] = args.latency
+    if args.cassette:
+        os.environ["REPLAY_CASSETTE"] = args.cassette
+    os.environ["SEMANTIC_CACHE"] = "0"
+    # Cache de embeddings gol: fiecare query trece prin stand-in-ul OpenAI
+    scratch = tempfile.mkdtemp(prefix="bench_pipeline_")
+    os.environ["EMBEDDING_CACHE_PATH"] = os.path.join(scratch, "query_embeddings.sqlite")
+    os.environ["EXPERIMENT_LOG_PATH"] = os.path.join(scratch, "experiments.jsonl")
+
+    from replay import default_cassette
+    cassette = default_cassette()
+    queries = load_queries(args.queries) * args.repeat if args.queries else []
+    print(f"📼 Casetă: {cassette.path} ({len(cassette.exchanges)} schimburi, {len(cassette.vectors)} embeddings) | "
+          f"latență: {args.latency or 'fără'} | {len(queries)} query-uri, concurență {args.concurrency}")
+
+    results = []
+    for path in args.paths:
+        result = bench_ingest() if path == "ingest" else bench_queries(path, queries, args.concurrency)
+        print_result(result)
+        results.append(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Rezultate salvate în {args.json}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import os
+import json
+import argparse
+from typing import List
+
+import numpy as np
+from dotenv import load_dotenv
+
+from embedding_config import STORAGES, EmbeddingConfig
+from local_index import LocalIndex
+
+# Recall vs. bytes per vector pentru embeddings scurtate și cuantizate, pe indexul local
+# exportat (`python local_index.py`, vectori de 1536 dimensiuni), fără apeluri de rețea.
+# text-embedding-3-* sunt antrenate Matryoshka: primele D componente, renormalizate, sunt
+# exact ce întoarce API-ul cu `dimensions=D`, deci scurtarea se poate simula pe vectorii existenți.
+# Pentru fiecare (D, stocare): prima etapă pe vectorii cuantizați (float32 / float16 / semn pe
+# 1 bit, distanță Hamming) alege --candidates candidați, reordonați apoi cu vectorii float32 de D
+# dimensiuni (ca match_dsm5_rescored). Referința: căutarea exactă pe 1536 dimensiuni.
+#
+#   python bench_quantization.py --k 5 --dims 1536 1024 768 512 256 --candidates 40 --samples 200
+
+def sample_queries(index: LocalIndex, samples: int, seed: int) -> np.ndarray:
+    """Interogări = vectori ai unor chunk-uri alese aleator (fiecare se găsește pe sine în top)."""
+    rng = np.random.default_rng(seed)
+    chosen = rng.choice(len(index), size=min(samples, len(index)), replace=False)
+    return np.asarray(index.embeddings[chosen], dtype=np.float32)
+
+def shorten(vectors: np.ndarray, dims: int) -> np.ndarray:
+    short = np.ascontiguousarray(vectors[:, :dims], dtype=np.float32)
+    norms = np.linalg.norm(short, axis=1, keepdims=True)
+    return short / np.where(norms == 0, 1.0, norms)
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indicii celor mai mari k scoruri per rând, în ordine descrescătoare."""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+def first_stage_scores(corpus: np.ndarray, queries: np.ndarray, storage: str) -> np.ndarray:
+    """Scorurile primei etape pe reprezentarea stocată (mai mare = mai aproape)."""
+    if storage == "vector":
+        return queries @ corpus.T
+    if storage == "halfvec":
+        return queries.astype(np.float16).astype(np.float32) @ corpus.astype(np.float16).astype(np.float32).T
+    # bit: binary_quantize (x > 0), apoi -distanța Hamming = potrivirile de semn
+    corpus_bits = np.packbits(corpus > 0, axis=1)
+    query_bits = np.packbits(queries > 0, axis=1)
+    distances = np.zeros((len(queries), len(corpus)), dtype=np.int32)
+    for i, bits in enumerate(query_bits):
+        distances[i] = np.unpackbits(np.bitwise_xor(corpus_bits, bits), axis=1).sum(axis=1)
+    return -distances.astype(np.float32)
+
+def rescore(corpus: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+    """Reordonează candidații fiecărei interogări cu produsul scalar float32 și păstrează top-k."""
+    scores = np.einsum("qd,qcd->qc", queries, corpus[candidates])
+    order = np.argsort(-scores, axis=1)[:, :k]
+    return np.take_along_axis(candidates, order, axis=1)
+
+def recall(truth: np.ndarray, found: np.ndarray) -> float:
+    hits = [len(set(expected) & set(got)) / len(expected) for expected, got in zip(truth, found)]
+    return float(np.mean(hits))
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Recall@k vs. bytes/vector pentru embeddings scurtate și cuantizate.")
+    parser.add_argument("--index", default=os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "dsm5_index")))
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dims", type=int, nargs="+", default=[1536, 1024, 768, 512, 256])
+    parser.add_argument("--storages", nargs="+", choices=STORAGES, default=list(STORAGES))
+    parser.add_argument("--candidates", type=int, default=int(os.getenv("RESCORE_CANDIDATES", "40")))
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", help="Scrie rezultatele și într-un fișier JSON")
+    args = parser.parse_args()
+
+    index = LocalIndex(args.index)
+    full = np.asarray(index.embeddings, dtype=np.float32)
+    native = full.shape[1]
+    queries = sample_queries(index, args.samples, args.seed)
+    truth = top_k(queries @ full.T, args.k)
+    print(f"📏 {len(index)} vectori x {native} dim, {len(queries)} interogări, k={args.k}, "
+          f"{args.candidates} candidați pentru rescoring")
+    print(f"{'dim':>5} | {'stocare':>8} | {'bytes/vec':>9} | {'index MB':>8} | "
+          f"{'recall prima etapă':>18} | {'recall cu rescoring':>19}")
+
+    results: List[dict] = []
+    for dims in args.dims:
+        if dims > native:
+            print(f"⚠️ Sar peste {dims}: indexul are doar {native} dimensiuni")
+            continue
+        corpus = shorten(full, dims)
+        short_queries = shorten(queries, dims)
+        config = EmbeddingConfig(dimensions=dims)
+        for storage in args.storages:
+            scores = first_stage_scores(corpus, short_queries, storage)
+            first = recall(truth, top_k(scores, args.k))
+            rescored = recall(truth, rescore(corpus, short_queries, top_k(scores, max(args.candidates, args.k)), args.k))
+            size = config.bytes_per_vector(storage)
+            results.append({
+                "dimensions": dims, "storage": storage, "bytes_per_vector": size,
+                "index_mb": size * len(index) / 2 ** 20,
+                "recall_first_stage": first, "recall_rescored": rescored,
+            })
+            print(f"{dims:>5} | {storage:>8} | {size:>9g} | {size * len(index) / 2 ** 20:>8.2f} | "
+                  f"{first:>18.3f} | {rescored:>19.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"k": args.k, "candidates": args.candidates, "queries": len(queries), "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
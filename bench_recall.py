@@ -0,0 +1,87 @@
+import os
+import json
+import time
+import random
+import argparse
+from typing import List
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+from openai import OpenAI
+
+from embedding_config import active_embedding_config
+
+# Măsoară recall@k al indexului HNSW (match_dsm5_tuned) față de scanarea exactă
+# (match_dsm5_exact) pentru mai multe valori ef_search, ca punctul de operare
+# (recall vs. latență) să fie ales pe date, nu după ureche.
+#
+#   python bench_recall.py --k 5 --ef 10 20 40 80 160 --samples 50
+#   python bench_recall.py --queries intrebari.txt   (un query text per linie)
+
+def sample_query_vectors(supabase: Client, samples: int, seed: int) -> List[List[float]]:
+    """Folosește ca interogări embeddings ale unor chunk-uri alese aleator din tabelă."""
+    ids, start = [], 0
+    while True:
+        page = supabase.table("dsm5").select("id").order("id").range(start, start + 999).execute().data or []
+        ids += [row["id"] for row in page]
+        if len(page) < 1000:
+            break
+        start += 1000
+    chosen = random.Random(seed).sample(ids, min(samples, len(ids)))
+    rows = supabase.table("dsm5").select("embedding").in_("id", chosen).execute().data or []
+    return [json.loads(r["embedding"]) if isinstance(r["embedding"], str) else r["embedding"] for r in rows]
+
+def embed_queries(path: str) -> List[List[float]]:
+    with open(path, encoding="utf-8") as f:
+        queries = [line.strip() for line in f if line.strip()]
+    response = OpenAI(api_key=os.getenv("OPENAI_API_KEY")).embeddings.create(
+        input=queries, **active_embedding_config().embed_kwargs()
+    )
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+def timed_rpc(supabase: Client, name: str, params: dict):
+    started = time.perf_counter()
+    rows = supabase.rpc(name, params).execute().data or []
+    return [row["id"] for row in rows], (time.perf_counter() - started) * 1000
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Recall@k HNSW vs. scanare exactă pentru match_dsm5.")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--ef", type=int, nargs="+", default=[10, 20, 40, 80, 160])
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--queries", help="Fișier text cu un query per linie (în loc de vectori din tabelă)")
+    parser.add_argument("--filter", default="{}", help="Filtru JSON pe metadata, ex. '{\"page\": 195}'")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    filter = json.loads(args.filter)
+    vectors = embed_queries(args.queries) if args.queries else sample_query_vectors(supabase, args.samples, args.seed)
+    print(f"📏 {len(vectors)} interogări, k={args.k}, filtru={filter}")
+
+    truth, exact_ms = [], []
+    for vector in vectors:
+        ids, ms = timed_rpc(supabase, "match_dsm5_exact",
+                            {"query_embedding": vector, "match_count": args.k, "filter": filter})
+        truth.append(set(ids))
+        exact_ms.append(ms)
+    print(f"{'exact':>10} | recall@{args.k} 1.000 | p50 {percentile(exact_ms, 0.5):7.1f} ms | p95 {percentile(exact_ms, 0.95):7.1f} ms")
+
+    for ef in args.ef:
+        recalls, latencies = [], []
+        for vector, expected in zip(vectors, truth):
+            ids, ms = timed_rpc(supabase, "match_dsm5_tuned", {
+                "query_embedding": vector, "match_count": args.k, "filter": filter, "ef_search": ef
+            })
+            recalls.append(len(expected & set(ids)) / max(len(expected), 1))
+            latencies.append(ms)
+        print(f"{'ef=' + str(ef):>10} | recall@{args.k} {sum(recalls) / len(recalls):.3f} | "
+              f"p50 {percentile(latencies, 0.5):7.1f} ms | p95 {percentile(latencies, 0.95):7.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+import os
+import re
+from typing import Dict, List, Optional
+
+from tokens import estimate_tokens
+
+# Asamblarea contextului RAG înainte de prompt-uri.
+# Chunk-urile vin din splitter-ul ingestiei (chunk_overlap=100, per pagină), așa că
+# rezultatele de pe aceeași pagină se suprapun adesea: fără asamblare, același text
+# e plătit de două ori în prompt-urile lui Agent A, ale draftului și ale auditului.
+# Pași: chunk-urile aceleiași pagini sunt ordonate după poziția lor în pagină (metadata
+# chunk_index) și lipite peste suprapunere (sau alăturate, dacă sunt consecutive),
+# duplicatele sunt eliminate, iar pasajele
+# rezultate sunt împachetate în ordinea relevanței, întregi, într-un buget de tokeni
+# per consumator (cel care răspunde vs auditor).
+#
+# Configurabil din .env: CONTEXT_BUDGET_ANSWER, CONTEXT_BUDGET_AUDIT (tokeni estimați).
+# Bugetul implicit pentru răspuns (1800) cuprinde cele 5 chunk-uri de 1000 de caractere cu antetele
+# de pagină (~1710 tokeni estimați), deci fără suprapuneri contextul lui Agent A și al draftului
+# rămâne cel de dinainte; auditorul primește intenționat mai puțin (700).
+
+MIN_OVERLAP = 20
+MAX_OVERLAP = 300
+PAGE_HEADER_RE = re.compile(r"^-- Pagina .* --$", re.M)
+
+def context_budget(consumer: str) -> int:
+    """Bugetul de tokeni al contextului pentru 'answer' (Agent A, draft) sau 'audit'."""
+    if consumer == "audit":
+        return int(os.getenv("CONTEXT_BUDGET_AUDIT", "700"))
+    return int(os.getenv("CONTEXT_BUDGET_ANSWER", "1800"))
+
+def overlap_length(left: str, right: str) -> int:
+    """Lungimea celui mai lung sufix al lui `left` care e prefix al lui `right` (0 dacă e sub MIN_OVERLAP)."""
+    for k in range(min(len(left), len(right), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+def chunk_index(item: dict) -> Optional[int]:
+    """Poziția chunk-ului în pagina lui (metadata 'chunk_index'; None pentru rândurile ingerate fără ea)."""
+    return (item.get("metadata") or {}).get("chunk_index")
+
+def _absorb(passage: dict, content: str, item: dict, rank: int, text: str):
+    """Adaugă un chunk la pasaj: `text` e partea nouă (goală dacă chunk-ul era deja inclus)."""
+    passage["content"] += text
+    passage["ids"].append(item.get("id"))
+    passage["positions"].append(chunk_index(item))
+    passage["similarity"] = max(passage["similarity"], item.get("similarity") or 0)
+    # Rangul din retrieval decide cel mai relevant chunk (merge și pentru RRF / căutarea lexicală)
+    if rank < passage["rank"]:
+        passage["rank"] = rank
+        passage["best_chunk"] = content
+
+def merge_chunks(results: List[dict]) -> List[dict]:
+    """
+    Pasajele (page, content, similarity, ids, best_chunk) obținute din rezultatele match_dsm5,
+    ordonate după cel mai bun rang al chunk-urilor din care provin.
+    """
+    groups: Dict[tuple, List[tuple]] = {}
+    for rank, item in enumerate(results):
+        meta = item.get("metadata", {}) or {}
+        groups.setdefault((meta.get("source"), meta.get("page", "?")), []).append((rank, item))
+
+    passages = []
+    seen = set()
+    for (_, page), items in groups.items():
+        # Ordinea din pagină: poziția chunk-ului, salvată la ingestie (id-urile nu o urmează,
+        # upload-urile concurente inserează loturile în orice ordine)
+        items.sort(key=lambda pair: (chunk_index(pair[1]) is None, chunk_index(pair[1]) or 0, pair[0]))
+        current = None
+        for rank, item in items:
+            content = item["content"].strip()
+            if content in seen:
+                continue
+            seen.add(content)
+            position = chunk_index(item)
+            if current is not None:
+                last_position = current["positions"][-1]
+                if content in current["content"]:
+                    _absorb(current, content, item, rank, "")
+                    continue
+                overlap = overlap_length(current["content"], content)
+                if overlap:
+                    _absorb(current, content, item, rank, content[overlap:])
+                    continue
+                if position is not None and last_position is not None and position == last_position + 1:
+                    _absorb(current, content, item, rank, "\n" + content)
+                    continue
+            current = {
+                "page": page,
+                "content": content,
+                "similarity": item.get("similarity") or 0,
+                "ids": [item.get("id")],
+                "positions": [position],
+                "rank": rank,
+                "best_chunk": content,
+            }
+            passages.append(current)
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+def format_passage(page, content: str) -> str:
+    return f"-- Pagina {page} --\n{content}\n\n"
+
+def pack_context(passages: List[dict], budget_tokens: int) -> str:
+    """
+    Pasajele întregi, în ordinea relevanței, cât încap în buget. Un pasaj prea mare
+    e înlocuit cu cel mai relevant chunk al lui; primul pasaj intră mereu.
+    """
+    parts, used = [], 0
+    for passage in passages:
+        for content in (passage["content"], passage["best_chunk"]):
+            text = format_passage(passage["page"], content)
+            tokens = estimate_tokens(text)
+            if used + tokens <= budget_tokens or (not parts and content is passage["best_chunk"]):
+                parts.append(text)
+                used += tokens
+                break
+    return "".join(parts)
+
+def fit_context(context: str, budget_tokens: int) -> str:
+    """Scurtează un context deja asamblat la buget, tăind doar între pasaje (niciodată în mijlocul unui criteriu)."""
+    if estimate_tokens(context) <= budget_tokens:
+        return context
+    starts = [match.start() for match in PAGE_HEADER_RE.finditer(context)]
+    if not starts:
+        return context
+    passages = [context[start:end] for start, end in zip(starts, starts[1:] + [len(context)])]
+    parts, used = [], 0
+    for passage in passages:
+        tokens = estimate_tokens(passage)
+        if used + tokens > budget_tokens and parts:
+            continue
+        parts.append(passage)
+        used += tokens
+    return "".join(parts)
+
+def build_contexts(results: List[dict]) -> Dict[str, str]:
+    """Contextele pentru prompt-uri din rezultatele match_dsm5, câte unul per consumator ('answer', 'audit')."""
+    passages = merge_chunks(results)
+    return {consumer: pack_context(passages, context_budget(consumer)) for consumer in ("answer", "audit")}
@@ -0,0 +1,129 @@
+import os
+import re
+import time
+import argparse
+import threading
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# Corpusuri multiple (DSM-5, ICD-11, ghiduri de tratament, articolele din surse_metodologii/)
+# în tabela dsm5, cu coloanele `corpus` și `corpus_version` (vector.sql, secțiunile 2c și 10).
+# Registrul `corpora` ține versiunea activă a fiecărui corpus: ingestia construiește o versiune
+# nouă alături de cea activă și o activează la final, atomic, cu activate_corpus_version;
+# căutările (retrieval.match_corpora) citesc doar versiunea activă, prin indexul HNSW parțial
+# al corpusului, deci re-indexarea nu încetinește query-urile live.
+#
+#   python corpora.py list                     (corpusurile și versiunile active)
+#   python corpora.py sql icd11                (indexul HNSW parțial pentru un corpus nou)
+#   python corpora.py activate icd11 <versiune>
+#   python corpora.py rollback icd11           (revine la versiunea anterioară, dacă rândurile ei există)
+#
+# Configurabil din .env:
+#   CORPORA         -> corpusurile căutate implicit, separate prin virgulă (ex. "dsm5,icd11");
+#                      gol = doar DSM-5, prin funcțiile match_dsm5* (comportamentul de până acum)
+#   CORPUS_WORKERS  -> câte RPC-uri match_corpus rulează simultan (implicit 4)
+
+DEFAULT_CORPUS = "dsm5"
+# Numele ajunge în numele indexului și (literal) în SQL-ul dinamic din match_corpus
+NAME_RE = re.compile(r"^[a-z][a-z0-9_]{0,39}$")
+ACTIVE_VERSIONS_TTL = 30
+
+_active_versions = (0.0, {})
+_active_lock = threading.Lock()
+
+def check_name(name: str) -> str:
+    """Numele corpusului, validat (litere mici, cifre, _); ValueError altfel."""
+    if not NAME_RE.match(name or ""):
+        raise ValueError(f"Nume de corpus invalid: {name!r} (litere mici, cifre și _, începând cu o literă)")
+    return name
+
+def routed_corpora() -> Optional[List[str]]:
+    """Corpusurile din CORPORA, sau None dacă nu e setat (căutarea rămâne doar pe DSM-5)."""
+    value = os.getenv("CORPORA", "")
+    names = [check_name(name.strip()) for name in value.split(",") if name.strip()]
+    return names or None
+
+def fetch_registry(supabase: Client) -> List[dict]:
+    """Rândurile registrului `corpora`; listă goală dacă schema nu are încă tabela."""
+    try:
+        return supabase.table("corpora").select("*").order("name").execute().data or []
+    except Exception:
+        return []
+
+def active_versions(supabase: Client) -> Dict[str, str]:
+    """corpus -> versiunea activă, recitite cel mult o dată la ACTIVE_VERSIONS_TTL secunde."""
+    global _active_versions
+    with _active_lock:
+        checked_at, versions = _active_versions
+        if checked_at and time.time() - checked_at < ACTIVE_VERSIONS_TTL:
+            return versions
+    versions = {row["name"]: row["active_version"] for row in fetch_registry(supabase)}
+    with _active_lock:
+        _active_versions = (time.time(), versions)
+    return versions
+
+def activate_version(supabase: Client, corpus: str, version: str) -> Optional[str]:
+    """Comută atomic corpusul pe `version`; întoarce versiunea înlocuită (None pentru un corpus nou)."""
+    global _active_versions
+    replaced = supabase.rpc("activate_corpus_version", {"corpus_name": check_name(corpus),
+                                                        "new_version": version}).execute().data
+    with _active_lock:
+        _active_versions = (0.0, {})
+    return replaced or None
+
+def version_rows(supabase: Client, corpus: str, version: str) -> int:
+    """Numărul de rânduri ale unei versiuni (0: versiunea nu a fost construită sau a fost ștearsă)."""
+    rows = (supabase.table("dsm5").select("id", count="exact").eq("corpus", corpus)
+            .eq("corpus_version", version).limit(1).execute())
+    return rows.count or 0
+
+def index_sql(corpus: str) -> str:
+    """DDL-ul indexului HNSW parțial al unui corpus (construit fără să blocheze scrierile)."""
+    corpus = check_name(corpus)
+    return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS dsm5_corpus_{corpus}_hnsw_idx\n"
+            f"  ON public.dsm5 USING hnsw (embedding vector_cosine_ops)\n"
+            f"  WITH (m = 16, ef_construction = 64)\n"
+            f"  WHERE corpus = '{corpus}';")
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Registrul corpusurilor: versiuni active, indexuri, comutare.")
+    parser.add_argument("command", choices=["list", "sql", "activate", "rollback"])
+    parser.add_argument("corpus", nargs="?")
+    parser.add_argument("version", nargs="?")
+    args = parser.parse_args()
+
+    if args.command != "list" and not args.corpus:
+        parser.error(f"`{args.command}` cere numele corpusului")
+    if args.command == "sql":
+        print(index_sql(args.corpus))
+        return
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    registry = {row["name"]: row for row in fetch_registry(supabase)}
+    if args.command == "list":
+        if not registry:
+            print("⚠️ Registrul `corpora` lipsește sau e gol: rulează vector.sql (secțiunile 2c și 10).")
+        for name, row in registry.items():
+            print(f"📚 {name:<20} activă: {row['active_version']:<20} anterioară: {row.get('previous_version') or '-'} "
+                  f"(din {row.get('activated_at')})")
+        return
+
+    if args.command == "rollback":
+        row = registry.get(args.corpus)
+        if not row or not row.get("previous_version"):
+            print(f"❌ Corpusul {args.corpus} nu are o versiune anterioară.")
+            return
+        args.version = row["previous_version"]
+    if not args.version:
+        parser.error("`activate` cere versiunea")
+    if not version_rows(supabase, args.corpus, args.version):
+        print(f"❌ Nu există rânduri pentru {args.corpus} / {args.version}; nu comut pe o versiune goală.")
+        return
+    replaced = activate_version(supabase, args.corpus, args.version)
+    print(f"✅ {args.corpus}: {replaced or '-'} -> {args.version}")
+
+if __name__ == "__main__":
+    main()
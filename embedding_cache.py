@@ -0,0 +1,115 @@
+import os
+import re
+import hashlib
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from openai import OpenAI
+
+from embedding_config import EmbeddingConfig, active_embedding_config
+from metrics import timed
+
+# Cache pe două niveluri pentru embedding-urile query-urilor:
+#   1. LRU în memorie (mărime limitată) - repetările din aceeași sesiune
+#   2. SQLite pe disc - supraviețuiește restartului Streamlit / CLI
+# Cheia = textul normalizat + versiunea configurației de embeddings (model + dimensiune),
+# deci variațiile banale (majuscule, spații, diacritice, punctuația de final) nu mai plătesc
+# un apel OpenAI, iar vectorii de altă dimensiune nu se amestecă.
+
+def normalize_query(text: str) -> str:
+    """Forma canonică a unui query: fără diacritice, lowercase, spații comprimate."""
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"\s+", " ", text.lower()).strip()
+    return text.rstrip(" ?!.;,")
+
+def cache_key(text: str, model: str) -> str:
+    return hashlib.sha256(f"{model}|{normalize_query(text)}".encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    def __init__(self, path: str, max_items: int = 1024):
+        self.max_items = max_items
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS query_embeddings (key TEXT PRIMARY KEY, vector BLOB)")
+        self._conn.commit()
+
+    def _remember(self, key: str, vector: List[float]):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        key = cache_key(text, model)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return self._memory[key]
+            row = self._conn.execute("SELECT vector FROM query_embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            vector = array("f")
+            vector.frombytes(row[0])
+            self._remember(key, vector.tolist())
+            self._stats["disk_hits"] += 1
+            return self._memory[key]
+
+    def put(self, text: str, model: str, vector: List[float]):
+        key = cache_key(text, model)
+        with self._lock:
+            self._remember(key, list(vector))
+            self._conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings VALUES (?, ?)", (key, array("f", vector).tobytes())
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, float]:
+        """Contoare hit/miss (pe niveluri) și rata de hit."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_items"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_lock = threading.Lock()
+
+def default_cache() -> EmbeddingCache:
+    """Cache-ul partajat de proces (CLI, Streamlit), configurabil din .env."""
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(
+                os.getenv("EMBEDDING_CACHE_PATH", os.path.join("data", "query_embeddings.sqlite")),
+                int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+            )
+    return _default_cache
+
+def get_query_embedding(client: OpenAI, text: str, config: Optional[EmbeddingConfig] = None,
+                        cache: Optional[EmbeddingCache] = None) -> List[float]:
+    """Embedding-ul query-ului, din cache dacă există; altfel un apel OpenAI (apoi memorat)."""
+    config = config or active_embedding_config()
+    cache = cache or default_cache()
+    vector = cache.get(text, config.version)
+    if vector is not None:
+        return vector
+    with timed("embedding") as span:
+        response = client.embeddings.create(input=[text], **config.embed_kwargs())
+        span.usage(getattr(response, "usage", None))
+    vector = response.data[0].embedding
+    cache.put(text, config.version, vector)
+    return vector
@@ -0,0 +1,199 @@
+import os
+import argparse
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+# Configurația embedding-urilor, comună ingestiei, schemei și căutării.
+#   EMBEDDING_MODEL       - modelul OpenAI (implicit text-embedding-3-small)
+#   EMBEDDING_DIMENSIONS  - dimensiune redusă (parametrul `dimensions`; implicit cea nativă, 1536)
+#   EMBEDDING_STORAGE     - indexul primei etape: vector (float32), halfvec (float16) sau bit (1 bit/dim).
+#                           Cu halfvec/bit, top-ul e recalculat cu vectorii float32 (match_dsm5_rescored).
+#
+# `version` identifică datele stocate (model + dimensiune) și intră în semnătura ingestiei,
+# în cheile cache-ului de embeddings și în versiunea corpusului. Pentru configurația
+# implicită e chiar numele modelului, deci datele existente rămân valide.
+# Schema pentru configurația activă: `python embedding_config.py sql` (vezi vector.sql, secțiunea 9);
+# scriptul înregistrează configurația în tabela dsm5_embedding_config, verificată de ingestie și de căutare.
+
+NATIVE_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+STORAGES = ("vector", "halfvec", "bit")
+BYTES_PER_DIMENSION = {"vector": 4.0, "halfvec": 2.0, "bit": 0.125}
+
+class EmbeddingConfig:
+    def __init__(self, model: str = "text-embedding-3-small", dimensions: Optional[int] = None,
+                 storage: str = "vector"):
+        if storage not in STORAGES:
+            raise ValueError(f"EMBEDDING_STORAGE necunoscut: {storage} (opțiuni: {', '.join(STORAGES)})")
+        self.model = model
+        self.native_dimensions = NATIVE_DIMENSIONS.get(model, 1536)
+        self.dimensions = dimensions or self.native_dimensions
+        self.storage = storage
+
+    @property
+    def version(self) -> str:
+        if self.dimensions == self.native_dimensions:
+            return self.model
+        return f"{self.model}@{self.dimensions}"
+
+    @property
+    def rescored(self) -> bool:
+        """Prima etapă pe un index cuantizat, urmată de rescoring float32."""
+        return self.storage != "vector"
+
+    def embed_kwargs(self) -> Dict[str, object]:
+        """Argumentele pentru client.embeddings.create (model + dimensions, dacă e redusă)."""
+        kwargs: Dict[str, object] = {"model": self.model}
+        if self.dimensions != self.native_dimensions:
+            kwargs["dimensions"] = self.dimensions
+        return kwargs
+
+    def bytes_per_vector(self, storage: Optional[str] = None) -> float:
+        return self.dimensions * BYTES_PER_DIMENSION[storage or self.storage]
+
+    def __repr__(self) -> str:
+        return f"EmbeddingConfig({self.version}, storage={self.storage})"
+
+def active_embedding_config() -> EmbeddingConfig:
+    """Configurația din .env (citită la apel, după load_dotenv)."""
+    dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+    return EmbeddingConfig(
+        os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        int(dimensions) if dimensions else None,
+        os.getenv("EMBEDDING_STORAGE", "vector").lower(),
+    )
+
+def remote_config(supabase: Client) -> Optional[dict]:
+    """Configurația înregistrată în baza de date, sau None dacă schema nu are încă tabela."""
+    try:
+        rows = supabase.table("dsm5_embedding_config").select("*").limit(1).execute().data or []
+    except Exception:
+        return None
+    return rows[0] if rows else None
+
+def check_config(supabase: Client, config: EmbeddingConfig):
+    """Ridică RuntimeError dacă schema din Supabase a fost generată pentru altă configurație."""
+    remote = remote_config(supabase)
+    if remote is None:
+        # Schemă veche: coloana embedding e vector(1536), index HNSW float32
+        if config.dimensions != 1536 or config.rescored:
+            raise RuntimeError(f"Schema nu are configurația de embeddings înregistrată, dar .env cere {config!r}. "
+                               "Rulează SQL-ul din `python embedding_config.py sql`.")
+        return
+    if remote.get("version") != config.version or remote.get("storage") != config.storage:
+        raise RuntimeError(f"Schema e pentru {remote.get('version')} / {remote.get('storage')}, "
+                           f"dar .env cere {config.version} / {config.storage}. "
+                           "Rulează SQL-ul din `python embedding_config.py sql` și re-ingestia.")
+
+def schema_sql(config: EmbeddingConfig) -> str:
+    """DDL-ul pentru configurația dată: tipul coloanei, indexul primei etape și RPC-ul cu rescoring."""
+    d = config.dimensions
+    if config.storage == "vector":
+        index = ("CREATE INDEX dsm5_embedding_hnsw_idx ON public.dsm5\n"
+                 "  USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64);")
+        first_stage = "d.embedding <=> query_embedding"
+    elif config.storage == "halfvec":
+        index = (f"CREATE INDEX dsm5_embedding_halfvec_idx ON public.dsm5\n"
+                 f"  USING hnsw ((embedding::halfvec({d})) halfvec_cosine_ops) WITH (m = 16, ef_construction = 64);")
+        first_stage = f"d.embedding::halfvec({d}) <=> query_embedding::halfvec({d})"
+    else:
+        index = (f"CREATE INDEX dsm5_embedding_bit_idx ON public.dsm5\n"
+                 f"  USING hnsw ((binary_quantize(embedding)::bit({d})) bit_hamming_ops) WITH (m = 16, ef_construction = 64);")
+        first_stage = f"binary_quantize(d.embedding)::bit({d}) <~> binary_quantize(query_embedding)::bit({d})"
+
+    return f"""-- Configurație embeddings: {config.version} | index {config.storage} | {config.bytes_per_vector():g} bytes/vector
+-- Generat cu `python embedding_config.py sql`. Rândurile cu altă dimensiune primesc embedding NULL
+-- și sunt înlocuite la următoarea ingestie (semnătura ingestiei include versiunea configurației).
+
+CREATE TABLE IF NOT EXISTS public.dsm5_embedding_config (
+  id int PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  version text NOT NULL,
+  model text NOT NULL,
+  dimensions int NOT NULL,
+  storage text NOT NULL
+);
+
+DROP INDEX IF EXISTS dsm5_embedding_hnsw_idx;
+DROP INDEX IF EXISTS dsm5_embedding_halfvec_idx;
+DROP INDEX IF EXISTS dsm5_embedding_bit_idx;
+
+ALTER TABLE public.dsm5 ALTER COLUMN embedding TYPE vector({d})
+  USING (CASE WHEN vector_dims(embedding) = {d} THEN embedding::vector({d}) END);
+
+{index}
+
+-- Prima etapă pe indexul de mai sus (candidate_count candidați), apoi ordinea finală
+-- după distanța cosinus pe vectorii float32 stocați.
+DROP FUNCTION IF EXISTS match_dsm5_rescored(vector, int, jsonb, int);
+
+CREATE OR REPLACE FUNCTION match_dsm5_rescored (
+  query_embedding vector,
+  match_count int DEFAULT 5,
+  filter jsonb DEFAULT '{{}}'::jsonb,
+  candidate_count int DEFAULT 40
+)
+RETURNS TABLE (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM set_config('hnsw.ef_search', greatest(candidate_count, 40)::text, true);
+  BEGIN
+    -- pgvector >= 0.8: scanarea continuă când filtrul pe versiunea activă elimină candidați
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+  RETURN QUERY
+  WITH candidates AS (
+    SELECT d.id
+    FROM dsm5 AS d
+    WHERE d.metadata @> filter AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+    ORDER BY {first_stage}
+    LIMIT candidate_count
+  )
+  SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+  FROM candidates AS c
+  JOIN dsm5 AS d ON d.id = c.id
+  ORDER BY d.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+INSERT INTO public.dsm5_embedding_config (id, version, model, dimensions, storage)
+VALUES (1, '{config.version}', '{config.model}', {d}, '{config.storage}')
+ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, model = EXCLUDED.model,
+  dimensions = EXCLUDED.dimensions, storage = EXCLUDED.storage;
+"""
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Configurația embedding-urilor (model, dimensiune, index).")
+    parser.add_argument("command", choices=["show", "sql", "check"])
+    args = parser.parse_args()
+
+    config = active_embedding_config()
+    if args.command == "sql":
+        print(schema_sql(config))
+        return
+    if args.command == "show":
+        print(f"🧬 {config.version} | index {config.storage} | {config.dimensions} dimensiuni")
+        for storage in STORAGES:
+            print(f"   {storage:>8}: {config.bytes_per_vector(storage):g} bytes/vector")
+        return
+
+    supabase = create_client(os.getenv("SUPABASE_URL"), os.getenv("SUPABASE_ANON_KEY"))
+    try:
+        check_config(supabase, config)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return
+    print(f"✅ Schema și .env folosesc aceeași configurație: {config.version} / {config.storage}")
+
+if __name__ == "__main__":
+    main()
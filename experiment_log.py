@@ -0,0 +1,144 @@
+import os
+import json
+import uuid
+import queue
+import atexit
+import datetime
+import threading
+from typing import Any, Dict, List, Optional
+
+# Logging structurat pentru experimente: un record JSONL per rulare (query, rezultate
+# retrieval, prompt-uri, răspunsuri, raport audit, timpi), comun pentru CLI și Streamlit.
+# Scrierea e făcută de un thread de fundal cu fișierul ținut deschis: apelantul doar pune
+# linia într-o coadă, fără open/close per mesaj. Fișierul e rotit după mărime
+# (experiments.jsonl -> .1 -> .2 ...). Istoricul se încarcă în SQLite cu experiment_store.py.
+#
+# Configurabil din .env: EXPERIMENT_LOG_PATH, EXPERIMENT_LOG_MAX_BYTES, EXPERIMENT_LOG_BACKUPS
+
+SCHEMA_VERSION = 1
+
+class BackgroundWriter:
+    """Scrie linii de text într-un fișier dintr-un thread de fundal, cu buffer și rotație după mărime."""
+
+    def __init__(self, path: str, max_bytes: int = 0, backups: int = 5, flush_interval: float = 1.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._file = None
+        self._closed = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="experiment-log", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, line: str):
+        """Pune o linie în coada de scriere (nu blochează)."""
+        if not self._closed:
+            self._queue.put(line if line.endswith("\n") else line + "\n")
+
+    def close(self):
+        """Golește coada și închide fișierul."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout=10)
+
+    def _open(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backups - 1, 0, -1):
+            older = f"{self.path}.{i}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.path}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._open()
+
+    def _run(self):
+        self._open()
+        while True:
+            try:
+                line = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._file.flush()
+                continue
+            # Scriem tot ce s-a adunat între timp, apoi un singur flush
+            lines = [line]
+            while True:
+                try:
+                    lines.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in lines
+            for item in lines:
+                if item is None:
+                    continue
+                if self.max_bytes and self._file.tell() > 0 and self._file.tell() + len(item.encode("utf-8")) > self.max_bytes:
+                    self._rotate()
+                self._file.write(item)
+            self._file.flush()
+            if stop:
+                self._file.close()
+                return
+
+class ExperimentLog(BackgroundWriter):
+    """Jurnalul JSONL al rulărilor."""
+
+    def record(self, source: str, query: str, **fields: Any) -> str:
+        """Adaugă un record pentru o rulare și întoarce run_id-ul lui."""
+        run_id = uuid.uuid4().hex
+        record = {
+            "schema": SCHEMA_VERSION,
+            "run_id": run_id,
+            "ts": datetime.datetime.now().isoformat(timespec="seconds"),
+            "source": source,
+            "query": query,
+        }
+        record.update(fields)
+        self.write(json.dumps(record, ensure_ascii=False, default=str))
+        return run_id
+
+def retrieval_hits(results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Rezumatul rezultatelor match_dsm5 pentru log: id, pagină, sursă, corpus, similaritate."""
+    hits = []
+    for item in results or []:
+        meta = item.get("metadata", {}) or {}
+        hits.append({
+            "id": item.get("id"),
+            "page": meta.get("page"),
+            "source": meta.get("source"),
+            "corpus": item.get("corpus") or meta.get("corpus"),
+            "similarity": item.get("similarity"),
+        })
+    return hits
+
+def audit_fields(confession: Any) -> Dict[str, Any]:
+    """Raportul auditorului (model pydantic sau None) plus câmpurile agregabile."""
+    if confession is None:
+        return {"audit": None, "decision": None, "honesty_score": None}
+    report = confession.model_dump()
+    return {"audit": report, "decision": report.get("final_decision"), "honesty_score": report.get("honesty_score")}
+
+_default_log: Optional[ExperimentLog] = None
+_default_lock = threading.Lock()
+
+def default_experiment_log() -> ExperimentLog:
+    """Jurnalul partajat de proces, configurat din .env."""
+    global _default_log
+    with _default_lock:
+        if _default_log is None:
+            _default_log = ExperimentLog(
+                os.getenv("EXPERIMENT_LOG_PATH", os.path.join("logs", "experiments.jsonl")),
+                max_bytes=int(os.getenv("EXPERIMENT_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+                backups=int(os.getenv("EXPERIMENT_LOG_BACKUPS", "5")),
+            )
+    return _default_log
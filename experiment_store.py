@@ -0,0 +1,262 @@
+import os
+import re
+import json
+import glob
+import sqlite3
+import hashlib
+import argparse
+from typing import Any, Dict, Iterator, Optional
+
+from dotenv import load_dotenv
+
+# Încarcă istoricul experimentelor într-o bază SQLite pentru interogări agregate
+# (rata de blocare, distribuția honesty_score, timpi) pe toate rulările.
+# Surse: log-urile JSONL (experiment_log.py, inclusiv fișierele rotite) și log-urile
+# text vechi experiment_log_*.txt (CLI și STREAMLIT), parsate în același format de record.
+# Încărcarea e idempotentă: fiecare rulare are un run_id stabil, reîncărcarea o înlocuiește.
+#
+# Utilizare:
+#   python experiment_store.py load     # importă logs/experiments.jsonl* și experiment_log_*.txt
+#   python experiment_store.py stats    # agregate peste tot istoricul
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    ts TEXT, source TEXT, origin TEXT, model TEXT, query TEXT, cached INTEGER,
+    decision TEXT, honesty_score INTEGER, n_retrieved INTEGER, top_similarity REAL,
+    record TEXT
+);
+CREATE TABLE IF NOT EXISTS retrieval (run_id TEXT, rank INTEGER, chunk_id INTEGER, page TEXT, similarity REAL);
+CREATE TABLE IF NOT EXISTS timings (run_id TEXT, name TEXT, seconds REAL);
+CREATE INDEX IF NOT EXISTS runs_decision_idx ON runs (decision);
+CREATE INDEX IF NOT EXISTS runs_source_ts_idx ON runs (source, ts);
+CREATE INDEX IF NOT EXISTS retrieval_run_idx ON retrieval (run_id);
+CREATE INDEX IF NOT EXISTS timings_run_idx ON timings (run_id);
+"""
+
+def legacy_run_id(path: str, index: int) -> str:
+    return hashlib.sha1(f"{os.path.basename(path)}#{index}".encode("utf-8")).hexdigest()[:32]
+
+def parse_audit(raw: str) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads(raw)
+    except ValueError:
+        return None
+
+def with_audit(record: Dict[str, Any], audit: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    record["audit"] = audit
+    record.setdefault("decision", (audit or {}).get("final_decision"))
+    record.setdefault("honesty_score", (audit or {}).get("honesty_score"))
+    return record
+
+# --- 1. LOG-URI TEXT VECHI ---
+
+_STREAMLIT_RE = re.compile(
+    r"Experiment Log - (?P<ts>\S+)\n=+\n\n"
+    r"QUERY:\n(?P<query>.*?)\n\n-{40}\nCONTEXT RAG:\n(?P<context>.*?)\n={80}\n\n"
+    r"--- AGENT A \(Baseline\) ---\nSystem Prompt:\n(?P<prompt_a>.*?)\n-{20}\nResponse:\n(?P<response_a>.*?)\n\n={80}\n\n"
+    r"--- AGENT B \(Metacognitive\) ---\nDrafting Prompt:\n(?P<prompt_draft>.*?)\n-{20}\n"
+    r"Draft Content:\n(?P<draft>.*?)\n-{20}\nAuditing Prompt:\n(?P<prompt_audit>.*?)\n-{20}\n"
+    r"Audit Report \(JSON\):\n(?P<audit>.*?)\n-{20}\nFinal Decision: (?P<decision>\w+)",
+    re.S,
+)
+_PAGE_RE = re.compile(r"^-- Pagina (\S+) --$", re.M)
+_TIMING_RE = re.compile(r"^(\w+): ([\d.]+)s$", re.M)
+
+def parse_streamlit_txt(path: str) -> Iterator[Dict[str, Any]]:
+    """Un fișier experiment_log_STREAMLIT_*.txt conține o singură rulare."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    match = _STREAMLIT_RE.search(text)
+    if not match:
+        return
+    date, _, clock = match["ts"].partition("_")
+    timings = {}
+    if "--- TIMINGS ---" in text:
+        timings = {name: float(seconds) for name, seconds in _TIMING_RE.findall(text.split("--- TIMINGS ---", 1)[1])}
+    yield with_audit({
+        "run_id": legacy_run_id(path, 0),
+        "ts": f"{date}T{clock.replace('-', ':')}",
+        "source": "streamlit",
+        "query": match["query"],
+        "retrieval": [{"page": page} for page in _PAGE_RE.findall(match["context"])],
+        "context": match["context"],
+        "prompts": {"agent_a": match["prompt_a"], "draft": match["prompt_draft"], "audit": match["prompt_audit"]},
+        "outputs": {"agent_a": match["response_a"], "draft": match["draft"]},
+        "decision": match["decision"],
+        "timings": timings,
+    }, parse_audit(match["audit"]))
+
+_ENTRY_RE = re.compile(r"^\[(\d\d:\d\d:\d\d)\] ", re.M)
+_RESULT_RE = re.compile(r"Rezultat #\d+: Pagina (\S+) \| Similaritate: ([\d.]+)")
+_CLI_DATE_RE = re.compile(r"experiment_log_(\d{4}-\d\d-\d\d)_")
+# Sesiunile CLI care au scris și în jurnalul JSONL au acest marcaj în antet: transcriptul lor
+# e doar pentru citit, rulările sunt deja încărcate din JSONL
+JSONL_MARKER = "Jurnal rulări (JSONL):"
+
+def parse_cli_txt(path: str) -> Iterator[Dict[str, Any]]:
+    """Un fișier experiment_log_*.txt al CLI-ului conține o sesiune: mai multe query-uri, linii cu [HH:MM:SS]."""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if JSONL_MARKER in text:
+        return
+    date_match = _CLI_DATE_RE.search(os.path.basename(path))
+    date = date_match.group(1) if date_match else ""
+    parts = _ENTRY_RE.split(text)
+    entries = [(parts[i], parts[i + 1].rstrip("\n")) for i in range(1, len(parts) - 1, 2)]
+
+    record: Optional[Dict[str, Any]] = None
+    expect = None
+    index = 0
+    for clock, message in entries:
+        stripped = message.strip()
+        if stripped.startswith("USER QUERY: "):
+            if record is not None:
+                yield record
+            record = {
+                "run_id": legacy_run_id(path, index),
+                "ts": f"{date}T{clock}",
+                "source": "cli",
+                "query": stripped[len("USER QUERY: "):],
+                "retrieval": [],
+                "outputs": {},
+            }
+            index += 1
+            expect = None
+            continue
+        if record is None:
+            continue
+        if expect:
+            record["outputs"][expect] = message
+            expect = None
+            continue
+        result = _RESULT_RE.search(stripped)
+        if result:
+            record["retrieval"].append({"page": result.group(1), "similarity": float(result.group(2))})
+        elif stripped.startswith("🤖 Agent A") and stripped.endswith(":"):
+            expect = "agent_a"
+        elif stripped.startswith("📝 RĂSPUNS FINAL AGENT B:"):
+            expect = "agent_b"
+        elif stripped.startswith("[Agent B - Internal Draft Preview]:"):
+            record["outputs"]["draft_preview"] = stripped.split(":", 1)[1].strip()
+        elif stripped.startswith("[Agent B - Metacognitive Audit]:"):
+            with_audit(record, parse_audit(stripped.split(":", 1)[1]))
+    if record is not None:
+        yield record
+
+# --- 2. LOG-URI JSONL ---
+
+def parse_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                # Ultima linie poate fi incompletă dacă procesul a fost oprit în timpul scrierii
+                continue
+
+def iter_records(jsonl_path: str, txt_dir: str) -> Iterator[Dict[str, Any]]:
+    """Toate recordurile: JSONL (curent + rotite) și log-urile text vechi."""
+    for path in sorted(glob.glob(jsonl_path + "*")):
+        for record in parse_jsonl(path):
+            record.setdefault("origin", os.path.basename(path))
+            yield record
+    for path in sorted(glob.glob(os.path.join(txt_dir, "experiment_log_*.txt"))):
+        parser = parse_streamlit_txt if "STREAMLIT" in os.path.basename(path) else parse_cli_txt
+        for record in parser(path):
+            record["origin"] = os.path.basename(path)
+            yield record
+
+# --- 3. STORE SQLITE ---
+
+def as_int(value: Any) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def connect(db_path: str) -> sqlite3.Connection:
+    directory = os.path.dirname(db_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA)
+    return conn
+
+def load_records(conn: sqlite3.Connection, records: Iterator[Dict[str, Any]]) -> int:
+    count = 0
+    for record in records:
+        run_id = record["run_id"]
+        hits = record.get("retrieval") or []
+        similarities = [hit["similarity"] for hit in hits if hit.get("similarity") is not None]
+        conn.execute("DELETE FROM retrieval WHERE run_id = ?", (run_id,))
+        conn.execute("DELETE FROM timings WHERE run_id = ?", (run_id,))
+        conn.execute(
+            "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (run_id, record.get("ts"), record.get("source"), record.get("origin"), record.get("model"),
+             record.get("query"), int(bool(record.get("cached"))), record.get("decision"),
+             as_int(record.get("honesty_score")), len(hits), max(similarities) if similarities else None,
+             json.dumps(record, ensure_ascii=False)),
+        )
+        conn.executemany(
+            "INSERT INTO retrieval VALUES (?, ?, ?, ?, ?)",
+            [(run_id, rank, hit.get("id"), None if hit.get("page") is None else str(hit["page"]), hit.get("similarity"))
+             for rank, hit in enumerate(hits, start=1)],
+        )
+        conn.executemany(
+            "INSERT INTO timings VALUES (?, ?, ?)",
+            [(run_id, name, seconds) for name, seconds in (record.get("timings") or {}).items() if seconds is not None],
+        )
+        count += 1
+    conn.commit()
+    return count
+
+def summary(conn: sqlite3.Connection) -> Dict[str, Any]:
+    """Agregatele de bază: rulări și rata de blocare per sursă, distribuția honesty_score, timpi medii."""
+    by_source = conn.execute(
+        "SELECT source, COUNT(*), AVG(decision = 'BLOCK'), AVG(honesty_score), AVG(top_similarity) "
+        "FROM runs GROUP BY source ORDER BY source"
+    ).fetchall()
+    honesty = conn.execute(
+        "SELECT honesty_score, COUNT(*) FROM runs WHERE honesty_score IS NOT NULL GROUP BY honesty_score ORDER BY honesty_score"
+    ).fetchall()
+    timings = conn.execute(
+        "SELECT name, COUNT(*), AVG(seconds), MAX(seconds) FROM timings GROUP BY name ORDER BY name"
+    ).fetchall()
+    return {"by_source": by_source, "honesty": honesty, "timings": timings}
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Istoricul experimentelor în SQLite.")
+    parser.add_argument("command", choices=["load", "stats"])
+    parser.add_argument("--db", default=os.getenv("EXPERIMENT_DB_PATH", os.path.join("data", "experiments.sqlite")))
+    parser.add_argument("--jsonl", default=os.getenv("EXPERIMENT_LOG_PATH", os.path.join("logs", "experiments.jsonl")))
+    parser.add_argument("--txt-dir", default=".", help="Directorul cu log-urile vechi experiment_log_*.txt")
+    args = parser.parse_args()
+
+    conn = connect(args.db)
+    if args.command == "load":
+        count = load_records(conn, iter_records(args.jsonl, args.txt_dir))
+        total = conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        print(f"✅ Încărcate {count} rulări în {args.db} ({total} în total)")
+        return
+
+    stats = summary(conn)
+    print("📊 Rulări per sursă:")
+    for source, runs, block_rate, honesty, similarity in stats["by_source"]:
+        similarity = "-" if similarity is None else f"{similarity:.3f}"
+        print(f"   {source}: {runs} rulări | BLOCK {block_rate or 0:.0%} | "
+              f"honesty medie {honesty or 0:.1f} | top similaritate medie {similarity}")
+    print("📊 Distribuția honesty_score:")
+    for score, runs in stats["honesty"]:
+        print(f"   {score:>2}: {'█' * runs} {runs}")
+    if stats["timings"]:
+        print("⏱️ Timpi:")
+        for name, runs, mean, worst in stats["timings"]:
+            print(f"   {name}: medie {mean:.3f}s | max {worst:.3f}s ({runs} rulări)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional, Set, Tuple
+
+from metrics import registry, timed
+from retrieval import CODE_RE
+
+# Pre-verificare locală (deterministă, milisecunde) a draftului lui Agent B față de contextul
+# DSM-5 din care a fost scris, înaintea auditorului LLM. Semnale:
+#   - acoperire: shingle-uri de 3 cuvinte și termeni de conținut ai draftului regăsiți în context
+#     (draftul e de obicei în română, contextul în engleză, așa că acoperirea singură rămâne mică);
+#   - ancore verificabile, independente de limbă: literele criteriilor ("Criteriul A"), duratele
+#     ("1 lună" = "1 month"), cantitățile cu unitate ("500 mg", "2,5 ml", "20%"), codurile ("F43.10")
+#     și paginile citate ("Pagina 271"), care trebuie să apară în context. O singură ancoră negăsită
+#     ține scorul sub pragul de skip.
+# Ancorele găsite nu ajung singure pentru un APPROVE local: textul draftului trebuie să fie și el
+# acoperit de context (GROUNDING_MIN_COVERAGE), altfel un draft cu criterii și pagini corecte, dar
+# cu afirmații clinice inventate printre ele, ar sări auditul LLM.
+# Rezultatul e un raport parțial cu câmpurile ConfessionReport.
+#
+# Configurabil din .env:
+#   GROUNDING_MODE=off        -> auditul LLM rulează mereu (implicit)
+#   GROUNDING_MODE=skip       -> fără audit LLM dacă scorul >= GROUNDING_SKIP_THRESHOLD și acoperirea
+#                                textului >= GROUNDING_MIN_COVERAGE (APPROVE local)
+#   GROUNDING_MODE=escalate   -> în plus, un draft cu ancore negăsite și scor sub GROUNDING_BLOCK_THRESHOLD
+#                                e blocat local; la LLM ajung doar cazurile de la mijloc
+# Rata de skip apare în metrics.py (dsm5_grounding_total, dsm5_grounding_skip_rate).
+
+GROUNDING_MODES = ("off", "skip", "escalate")
+SHINGLE_SIZE = 3
+MIN_TERM_LENGTH = 5
+# Ponderea ancorelor în scor (restul: acoperirea); o ancoră negăsită plafonează scorul la
+# UNSUPPORTED_CAP, iar skip-ul cere cel puțin MIN_SKIP_ANCHORS ancore găsite
+ANCHOR_WEIGHT = 0.7
+UNSUPPORTED_CAP = 0.5
+MIN_SKIP_ANCHORS = 2
+
+WORD_RE = re.compile(r"\w+(?:\.\w+)*")
+UNITS = {
+    "zi": "day", "zile": "day", "day": "day", "days": "day",
+    "saptamana": "week", "saptamani": "week", "week": "week", "weeks": "week",
+    "luna": "month", "luni": "month", "month": "month", "months": "month",
+    "an": "year", "ani": "year", "year": "year", "years": "year",
+    "ora": "hour", "ore": "hour", "hour": "hour", "hours": "hour",
+}
+NUMBER_WORDS = {
+    "o": 1, "un": 1, "una": 1, "unu": 1, "one": 1, "doi": 2, "doua": 2, "two": 2, "trei": 3, "three": 3,
+    "patru": 4, "four": 4, "cinci": 5, "five": 5, "sase": 6, "six": 6, "sapte": 7, "seven": 7,
+    "opt": 8, "eight": 8, "noua": 9, "nine": 9, "zece": 10, "ten": 10, "douasprezece": 12, "twelve": 12,
+}
+QUANTITY_UNITS = {
+    "mg": "mg", "miligrame": "mg", "milligrams": "mg", "mcg": "mcg", "ug": "mcg", "g": "g", "grame": "g",
+    "grams": "g", "kg": "kg", "ml": "ml", "mililitri": "ml", "l": "l", "ui": "iu", "iu": "iu",
+    "%": "%", "procent": "%", "procente": "%", "percent": "%",
+}
+# Doze, concentrații și procente: numărul (cu virgulă sau punct zecimal) urmat de unitate
+QUANTITY_RE = re.compile(
+    r"(?<![\w.,])(\d+(?:[.,]\d+)?)\s*(" + "|".join(sorted(map(re.escape, QUANTITY_UNITS), key=len, reverse=True)) + r")(?!\w)"
+)
+DURATION_RE = re.compile(
+    r"\b(\d+|" + "|".join(NUMBER_WORDS) + r")[\s-]+(?:\(\d+\)[\s-]*)?(" + "|".join(UNITS) + r")\b"
+)
+# Literele sunt majuscule: în „criteriul a fost îndeplinit”, „a” e verb
+DRAFT_CRITERION_RE = re.compile(
+    r"\b[Cc]riter\w*\s+([A-H])\b(?:\s*(?:-|–|pana la|si|,|and|to|through)\s*([A-H])\b)?"
+)
+CONTEXT_CRITERION_RE = re.compile(r"(?:^\s*([A-H])\.\s|\bCriteri(?:on|a)\s+([A-H])\b)", re.M)
+PAGE_CITATION_RE = re.compile(r"\b(?:pagina|pag\.|page|p\.)\s*(\d+)\b")
+CONTEXT_PAGE_RE = re.compile(r"^-- Pagina (\S+) --$", re.M)
+
+def fold(text: str) -> str:
+    """Textul fără diacritice (cazul literelor e păstrat)."""
+    text = unicodedata.normalize("NFKD", text)
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def _words(text: str) -> List[str]:
+    return WORD_RE.findall(text)
+
+def shingles(words: List[str], size: int = SHINGLE_SIZE) -> Set[Tuple[str, ...]]:
+    content = [word for word in words if len(word) > 2]
+    return {tuple(content[i:i + size]) for i in range(len(content) - size + 1)}
+
+def durations(text: str) -> Set[Tuple[int, str]]:
+    """Duratele (număr, unitate canonică) dintr-un text deja normalizat (lowercase, fără diacritice)."""
+    found = set()
+    for number, unit in DURATION_RE.findall(text):
+        found.add((int(number) if number.isdigit() else NUMBER_WORDS[number], UNITS[unit]))
+    return found
+
+def quantities(text: str) -> Set[Tuple[str, str]]:
+    """Cantitățile (număr normalizat, unitate canonică) dintr-un text normalizat (lowercase, fără diacritice)."""
+    return {(number.replace(",", "."), QUANTITY_UNITS[unit]) for number, unit in QUANTITY_RE.findall(text)}
+
+def draft_criteria(text: str) -> Set[str]:
+    letters = set()
+    for start, end in DRAFT_CRITERION_RE.findall(text):
+        if end and end > start:
+            letters.update(chr(c) for c in range(ord(start), ord(end) + 1))
+        else:
+            letters.add(start)
+    return letters
+
+class GroundingResult:
+    """Scorul de ancorare (0-1) al unui draft și ancorele verificate / negăsite."""
+
+    def __init__(self, score: float, shingle_coverage: float, term_coverage: float,
+                 supported: List[str], unsupported: List[str]):
+        self.score = score
+        self.shingle_coverage = shingle_coverage
+        self.term_coverage = term_coverage
+        self.supported = supported
+        self.unsupported = unsupported
+
+    @property
+    def coverage(self) -> float:
+        """Acoperirea textului (shingle-uri și termeni), independentă de ancore."""
+        return 0.5 * self.shingle_coverage + 0.5 * self.term_coverage
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "score": round(self.score, 3),
+            "coverage": round(self.coverage, 3),
+            "shingle_coverage": round(self.shingle_coverage, 3),
+            "term_coverage": round(self.term_coverage, 3),
+            "supported": self.supported,
+            "unsupported": self.unsupported,
+        }
+
+    def report(self, decision: str, reasoning: str) -> Dict[str, object]:
+        """Raportul parțial, cu câmpurile ConfessionReport, pentru o decizie luată local."""
+        return {
+            "final_decision": decision,
+            "honesty_score": max(1, min(10, round(self.score * 10))),
+            "reasoning": reasoning,
+            "ambiguity_detected": False,
+            "constraints_identified": self.supported,
+            "compliance_analysis": (f"Pre-verificare locală: acoperire shingle {self.shingle_coverage:.0%}, "
+                                    f"termeni {self.term_coverage:.0%}, {len(self.supported)} ancore găsite în context."),
+            "hallucination_check": ("Ancore negăsite în context: " + "; ".join(self.unsupported)
+                                    if self.unsupported else "Nicio ancoră (criteriu, durată, cantitate, cod, pagină) negăsită în context."),
+        }
+
+def precheck(draft: str, context: str) -> GroundingResult:
+    """Cât de bine e susținut draftul de context (vezi antetul modulului)."""
+    draft_text = fold(draft).lower()
+    context_folded = fold(context)
+    context_text = context_folded.lower()
+
+    draft_words = _words(draft_text)
+    context_words = _words(context_text)
+    draft_shingles = shingles(draft_words)
+    shingle_coverage = (len(draft_shingles & shingles(context_words)) / len(draft_shingles)) if draft_shingles else 0.0
+    terms = {word for word in draft_words if len(word) >= MIN_TERM_LENGTH and not word.isdigit()}
+    term_coverage = (len(terms & set(context_words)) / len(terms)) if terms else 0.0
+
+    supported, unsupported = [], []
+
+    def check(label: str, ok: bool):
+        (supported if ok else unsupported).append(label)
+
+    context_criteria = {a or b for a, b in CONTEXT_CRITERION_RE.findall(context_folded)}
+    for letter in sorted(draft_criteria(fold(draft))):
+        check(f"Criteriul {letter}", letter in context_criteria)
+    context_durations = durations(context_text)
+    for number, unit in sorted(durations(draft_text)):
+        check(f"durata {number} {unit}", (number, unit) in context_durations)
+    context_quantities = quantities(context_text)
+    for number, unit in sorted(quantities(draft_text)):
+        check(f"cantitatea {number} {unit}", (number, unit) in context_quantities)
+    for code in sorted({code.upper() for code in CODE_RE.findall(draft)}):
+        check(f"codul {code}", code.lower() in context_text)
+    context_pages = set(CONTEXT_PAGE_RE.findall(context))
+    for page in sorted(set(PAGE_CITATION_RE.findall(draft_text)), key=int):
+        check(f"pagina {page}", page in context_pages)
+
+    overlap = 0.5 * shingle_coverage + 0.5 * term_coverage
+    anchors = len(supported) + len(unsupported)
+    score = overlap if not anchors else (1 - ANCHOR_WEIGHT) * overlap + ANCHOR_WEIGHT * len(supported) / anchors
+    if unsupported:
+        score = min(score, UNSUPPORTED_CAP)
+    return GroundingResult(score, shingle_coverage, term_coverage, supported, unsupported)
+
+def grounding_mode() -> str:
+    mode = os.getenv("GROUNDING_MODE", "off").lower()
+    return mode if mode in GROUNDING_MODES else "off"
+
+def skip_threshold() -> float:
+    return float(os.getenv("GROUNDING_SKIP_THRESHOLD", "0.75"))
+
+def min_coverage() -> float:
+    return float(os.getenv("GROUNDING_MIN_COVERAGE", "0.4"))
+
+def block_threshold() -> float:
+    return float(os.getenv("GROUNDING_BLOCK_THRESHOLD", "0.25"))
+
+def local_verdict(result: GroundingResult) -> Optional[Dict[str, object]]:
+    """
+    Raportul local, dacă auditul LLM poate fi sărit (APPROVE peste pragul de skip sau, în modul
+    escalate, BLOCK sub pragul de blocare); None dacă draftul trebuie trimis auditorului.
+    """
+    mode = grounding_mode()
+    if mode == "off":
+        return None
+    if (result.score >= skip_threshold() and result.coverage >= min_coverage()
+            and not result.unsupported and len(result.supported) >= MIN_SKIP_ANCHORS):
+        return result.report("APPROVE", f"Pre-verificare locală: scor de ancorare {result.score:.2f} >= "
+                                        f"{skip_threshold():.2f}, acoperire {result.coverage:.2f} >= "
+                                        f"{min_coverage():.2f}; auditul LLM nu a fost necesar.")
+    # Un scor mic fără ancore negăsite înseamnă doar un draft greu de verificat local: merge la LLM
+    if mode == "escalate" and result.score < block_threshold() and result.unsupported:
+        return result.report("BLOCK", f"Pre-verificare locală: scor de ancorare {result.score:.2f} < "
+                                      f"{block_threshold():.2f}; draftul nu e susținut de contextul DSM-5.")
+    return None
+
+def grounding_gate(draft: str, context: str) -> Tuple[Optional[GroundingResult], Optional[Dict[str, object]]]:
+    """
+    Pre-verificarea dinaintea auditului LLM: (rezultat, raport local sau None).
+    Cu GROUNDING_MODE=off întoarce (None, None) fără să calculeze nimic.
+    Fiecare verificare e numărată în metrics (skip / block / audit).
+    """
+    if grounding_mode() == "off":
+        return None, None
+    with timed("grounding"):
+        result = precheck(draft, context)
+        verdict = local_verdict(result)
+    if verdict is None:
+        registry().add_grounding("audit")
+    else:
+        registry().add_grounding("skip" if verdict["final_decision"] == "APPROVE" else "block")
+    return result, verdict
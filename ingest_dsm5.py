@@ -1,20 +1,45 @@
 import os
 import json
-from typing import List
-from tqdm import tqdm  # Bara de progres
+import time
+import hashlib
+import argparse
+import queue
+import sqlite3
+import threading
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+from tqdm import tqdm  # Bare de progres (una per etapă)
 from dotenv import load_dotenv
 
 # Librării pentru PDF și Text Splitting
-from langchain_community.document_loaders import PyPDFLoader
+from pypdf import PdfReader
+from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 
-# Clienții API
-from supabase import create_client, Client
+# Clienții API (reali, înregistrați sau din casetă: vezi replay.py)
+from supabase import Client
+import openai
 from openai import OpenAI
 
+from tokens import estimate_tokens
+from corpora import DEFAULT_CORPUS, activate_version, active_versions, check_name, version_rows
+from embedding_config import active_embedding_config, check_config
+from metrics import openai_http_client, timed
+from replay import create_openai_client, create_supabase_client, replay_mode
+
 # Încarcă variabilele din .env
 load_dotenv()
 
+# Orice PDF poate fi indexat într-un corpus (corpora.py), ca versiune nouă, construită alături de
+# cea activă și activată atomic doar după o rulare completă:
+#   python ingest_dsm5.py                                        (data/dsm5.pdf -> corpusul dsm5)
+#   python ingest_dsm5.py --pdf data/icd11.pdf --corpus icd11
+#   python ingest_dsm5.py --pdf surse_metodologii/confessions_paper.pdf --corpus papers --no-activate
+# Versiunea implicită e derivată din PDF și configurația de indexare: re-rularea pe același PDF
+# reia aceeași versiune (doar chunk-urile lipsă), un PDF sau un chunking nou construiește alta.
+
 # --- CONFIGURARE ---
 # Le citim din .env sau lăsăm string gol dacă nu există
 SUPABASE_URL = os.getenv("SUPABASE_URL", "")
@@ -22,94 +47,472 @@ SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY", "")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
 
 # Configurare Model (CRITIC: Trebuie să fie același ca în n8n)
-MODEL_NAME = "text-embedding-3-small" 
+# Modelul și dimensiunea vin din .env (EMBEDDING_MODEL, EMBEDDING_DIMENSIONS), comune cu căutarea
+EMBEDDING_CONFIG = active_embedding_config()
+
+# Limite pentru un singur request de embeddings (OpenAI acceptă max 2048 input-uri
+# și ~300k tokeni per request; rămânem mult sub prag)
+EMBED_BATCH_TOKENS = int(os.getenv("EMBED_BATCH_TOKENS", "60000"))
+EMBED_BATCH_MAX_INPUTS = int(os.getenv("EMBED_BATCH_MAX_INPUTS", "512"))
+# Câte request-uri de embeddings rulează simultan
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))
+EMBED_MAX_RETRIES = 3
+
+# Parametri de chunking (intră în cheia fiecărui chunk, vezi chunk_hash)
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+
+# Checkpoint local: embeddings deja generate + chunk-uri deja urcate (permite reluarea)
+CHECKPOINT_PATH = os.path.join("data", ".ingest_checkpoint.sqlite")
+UPLOAD_BATCH_SIZE = 200
+
+# Pipeline de streaming: extragerea paginilor rulează pe toate nucleele, iar cozile
+# mărginite între etape țin memoria constantă indiferent de mărimea PDF-ului
+PAGES_PER_TASK = 16
+EXTRACT_WORKERS = os.cpu_count() or 1
+QUEUE_SIZE = EMBED_CONCURRENCY * 2
+
+def make_token_batches(docs: List, max_tokens: int = EMBED_BATCH_TOKENS,
+                       max_inputs: int = EMBED_BATCH_MAX_INPUTS) -> Iterator[List]:
+    """Grupează chunk-urile în loturi limitate de bugetul de tokeni (nu de un număr fix)."""
+    batch, batch_tokens = [], 0
+    for doc in docs:
+        tokens = estimate_tokens(doc.page_content)
+        if batch and (batch_tokens + tokens > max_tokens or len(batch) >= max_inputs):
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(doc)
+        batch_tokens += tokens
+    if batch:
+        yield batch
+
+def ingest_signature(chunk_size: int, chunk_overlap: int) -> str:
+    """Semnătura configurației de indexare (model + dimensiune + parametri de chunking)."""
+    raw = f"{EMBEDDING_CONFIG.version}|{chunk_size}|{chunk_overlap}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+def content_hash(content: str) -> str:
+    """Cheia embedding-ului: depinde doar de text și de model + dimensiune, nu de chunking."""
+    return hashlib.sha256(f"{EMBEDDING_CONFIG.version}|{content}".encode("utf-8")).hexdigest()
+
+def chunk_hash(doc, signature: str, version: str) -> str:
+    """Cheia stabilă a rândului din dsm5: conținut + corpus/versiune + sursă/pagină + semnătura de indexare."""
+    meta = doc.metadata
+    raw = (f"{signature}|{meta.get('corpus', DEFAULT_CORPUS)}|{version}|{meta.get('source', '')}|"
+           f"{meta.get('page', '')}|{doc.page_content}")
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def default_version(pdf_path: str, signature: str) -> str:
+    """Versiunea corpusului: conținutul PDF-ului + semnătura de indexare."""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return f"{signature[:8]}-{digest.hexdigest()[:8]}"
+
+class IngestCheckpoint:
+    """
+    Stare locală (SQLite) a ingestiei:
+    - embeddings: vectorii deja plătiți, pe content_hash (refolosiți la schimbarea chunking-ului);
+    - uploaded: chunk_hash-urile confirmate în Supabase (sărite la reluare), cu corpusul și versiunea
+      lor, ca să fie uitate odată cu versiunile șterse din Supabase.
+    """
+
+    def __init__(self, path: str):
+        self.conn = sqlite3.connect(path, timeout=30)
+        # WAL: etapa de chunking citește cache-ul în timp ce uploader-ul scrie
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS embeddings (content_hash TEXT PRIMARY KEY, vector BLOB)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS uploaded (chunk_hash TEXT PRIMARY KEY, corpus TEXT, version TEXT)")
+        # Checkpoint-uri create înainte de coloanele corpus/version
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(uploaded)")}
+        for column in ("corpus", "version"):
+            if column not in columns:
+                self.conn.execute(f"ALTER TABLE uploaded ADD COLUMN {column} TEXT")
+        self.conn.commit()
+
+    def get_embedding(self, key: str) -> Optional[List[float]]:
+        row = self.conn.execute("SELECT vector FROM embeddings WHERE content_hash = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        vector = array("f")
+        vector.frombytes(row[0])
+        return vector.tolist()
+
+    def put_embeddings(self, items: List[Tuple[str, List[float]]]):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO embeddings VALUES (?, ?)",
+            [(key, array("f", vector).tobytes()) for key, vector in items],
+        )
+        self.conn.commit()
+
+    def uploaded_hashes(self) -> Set[str]:
+        return {row[0] for row in self.conn.execute("SELECT chunk_hash FROM uploaded")}
+
+    def mark_uploaded(self, hashes: List[str], corpus: str, version: str):
+        self.conn.executemany("INSERT OR IGNORE INTO uploaded VALUES (?, ?, ?)", [(h, corpus, version) for h in hashes])
+        self.conn.commit()
+
+    def forget_versions(self, corpus: str, keep: List[str]):
+        """Uită upload-urile corpusului din alte versiuni decât `keep` (și pe cele fără versiune)."""
+        placeholders = ", ".join("?" for _ in keep)
+        self.conn.execute(
+            f"DELETE FROM uploaded WHERE (corpus = ? OR corpus IS NULL) "
+            f"AND (version IS NULL OR version NOT IN ({placeholders}))",
+            (corpus, *keep),
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+def get_embeddings(texts: List[str], client: OpenAI) -> List[List[float]]:
+    """Trimite un lot întreg de texte la OpenAI într-un singur request."""
+    texts = [text.replace("\n", " ") for text in texts]
+    with timed("ingest_embeddings"):
+        response = client.embeddings.create(input=texts, **EMBEDDING_CONFIG.embed_kwargs())
+    # Ordinea din răspuns e dată de câmpul 'index', nu de poziția în listă
+    return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+def retryable(error: Exception) -> bool:
+    """Erorile trecătoare (rate limit, conexiune, 5xx): același request poate reuși la o nouă încercare."""
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code >= 500
+
+def splittable(error: Exception) -> bool:
+    """Lotul a fost respins pentru conținutul lui (400 / prea mare): jumătățile pot trece."""
+    return isinstance(error, openai.APIStatusError) and error.status_code in (400, 413)
+
+def embed_batch(batch: List, client: OpenAI) -> Tuple[List[Tuple], List]:
+    """
+    Generează embeddings pentru un lot. Erorile trecătoare sunt reîncercate cu backoff;
+    un lot respins (400 / prea mare) e împărțit în două și fiecare jumătate e trimisă separat,
+    astfel încât un singur chunk problematic să nu compromită tot lotul. Orice altă eroare
+    (autentificare, retry-uri epuizate) e propagată imediat.
+    Returnează (perechi (doc, vector) reușite, chunk-uri eșuate).
+    """
+    for attempt in range(EMBED_MAX_RETRIES):
+        try:
+            vectors = get_embeddings([doc.page_content for doc in batch], client)
+            return list(zip(batch, vectors)), []
+        except Exception as e:
+            if not retryable(e) or attempt == EMBED_MAX_RETRIES - 1:
+                error = e
+                break
+            time.sleep(2 ** attempt)
+
+    if not splittable(error):
+        raise error
+    if len(batch) == 1:
+        page = batch[0].metadata.get("page", "?")
+        print(f"⚠️ Chunk eșuat definitiv (pagina {page}): {error}")
+        return [], batch
+
+    middle = len(batch) // 2
+    left_ok, left_failed = embed_batch(batch[:middle], client)
+    right_ok, right_failed = embed_batch(batch[middle:], client)
+    return left_ok + right_ok, left_failed + right_failed
+
+def upload_rows(supabase: Client, embedded: List[Tuple], version: str) -> bool:
+    """Upsert idempotent pe chunk_hash: re-rularea nu mai creează duplicate."""
+    # Păstrăm numărul paginii pentru citări! (metadata ex: {'source': 'dsm5.pdf', 'page': 45, 'corpus': 'dsm5'})
+    rows = [
+        {
+            "content": doc.page_content,
+            "metadata": doc.metadata,
+            "embedding": vector,
+            "chunk_hash": doc.metadata["chunk_hash"],
+            "corpus": doc.metadata["corpus"],
+            "corpus_version": version,
+        }
+        for doc, vector in embedded
+    ]
+    try:
+        with timed("ingest_upload"):
+            supabase.table("dsm5").upsert(rows, on_conflict="chunk_hash").execute()
+        return True
+    except Exception as e:
+        print(f"❌ Eroare la upload Supabase: {e}")
+        return False
+
+def prune_versions(supabase: Client, corpus: str, keep: List[str]):
+    """Șterge rândurile corpusului din alte versiuni decât `keep` (activa și, opțional, cea anterioară)."""
+    supabase.table("dsm5").delete().eq("corpus", corpus).not_.in_("corpus_version", keep).execute()
+
+# --- PIPELINE DE STREAMING ---
+# [proces] extragere pagini -> [thread] chunking -> coadă -> [threads] embeddings -> coadă -> [main] upload
+
+def extract_page_range(pdf_path: str, start: int, end: int) -> List[Tuple[int, str]]:
+    """Rulează într-un proces separat: extrage textul paginilor [start, end)."""
+    reader = PdfReader(pdf_path)
+    return [(i, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def iter_pages(pdf_path: str, total_pages: int, executor: ProcessPoolExecutor,
+               corpus: str = DEFAULT_CORPUS) -> Iterator[Document]:
+    """Generează paginile în ordine, cu cel mult 2 task-uri per proces în zbor."""
+    ranges = iter(range(0, total_pages, PAGES_PER_TASK))
+    in_flight = deque()
+
+    def submit_next() -> bool:
+        start = next(ranges, None)
+        if start is None:
+            return False
+        end = min(start + PAGES_PER_TASK, total_pages)
+        in_flight.append(executor.submit(extract_page_range, pdf_path, start, end))
+        return True
+
+    for _ in range(EXTRACT_WORKERS * 2):
+        if not submit_next():
+            break
+    while in_flight:
+        for page_number, text in in_flight.popleft().result():
+            yield Document(page_content=text, metadata={"source": pdf_path, "page": page_number, "corpus": corpus})
+        submit_next()
 
-def get_embedding(text: str, client: OpenAI) -> List[float]:
-    """Trimite textul la OpenAI și primește vectorul înapoi."""
-    text = text.replace("\n", " ")
-    response = client.embeddings.create(input=[text], model=MODEL_NAME)
-    return response.data[0].embedding
+def iter_chunks(pages: Iterable[Document], text_splitter, stats: dict) -> Iterator[Document]:
+    """Împarte fiecare pagină imediat ce sosește (echivalent cu split_documents, dar leneș)."""
+    for page in pages:
+        stats["pages"].update(1)
+        for index, text in enumerate(text_splitter.split_text(page.page_content)):
+            stats["chunks"].update(1)
+            # Poziția în pagină: ordinea id-urilor din Supabase nu o urmează (upload-uri concurente)
+            yield Document(page_content=text, metadata={**page.metadata, "chunk_index": index})
 
-def main():
-    # Verificări chei
-    if not SUPABASE_URL or not SUPABASE_KEY:
+def chunk_stage(chunks: Iterable[Document], signature: str, version: str, uploaded: Set[str],
+                batch_queue: queue.Queue, upload_queue: queue.Queue, counters: dict):
+    """
+    Cheiază chunk-urile, sare peste cele deja urcate, trimite direct la upload
+    cele cu embedding în cache și grupează restul în loturi pentru embeddings.
+    """
+    checkpoint = IngestCheckpoint(CHECKPOINT_PATH)
+    seen = set()
+
+    def to_embed() -> Iterator[Document]:
+        cached = []
+        for doc in chunks:
+            # Curățăm caracterele nule care dau eroare în Postgres
+            doc.page_content = doc.page_content.replace('\x00', '')
+            key = chunk_hash(doc, signature, version)
+            doc.metadata["chunk_hash"] = key
+            doc.metadata["ingest_signature"] = signature
+            if key in uploaded or key in seen:
+                counters["skipped"] += 1
+                continue
+            seen.add(key)
+
+            # Embeddings deja plătite (ex. după o schimbare de chunk_size) se refolosesc din checkpoint
+            vector = checkpoint.get_embedding(content_hash(doc.page_content))
+            if vector is None:
+                yield doc
+                continue
+            counters["reused"] += 1
+            cached.append((doc, vector))
+            if len(cached) >= UPLOAD_BATCH_SIZE:
+                upload_queue.put((cached, [], False))
+                cached = []
+        if cached:
+            upload_queue.put((cached, [], False))
+
+    try:
+        # Loturi dimensionate după tokeni, formate pe măsură ce sosesc chunk-urile
+        for batch in make_token_batches(to_embed()):
+            batch_queue.put(batch)
+    except Exception as e:
+        counters["error"] = e
+    finally:
+        checkpoint.close()
+        for _ in range(EMBED_CONCURRENCY):
+            batch_queue.put(None)
+
+def embed_worker(client: OpenAI, batch_queue: queue.Queue, upload_queue: queue.Queue, counters: dict):
+    """
+    Consumă loturi din coadă până la santinelă; rezultatele merg la uploader.
+    Un lot cu eroare nerecuperabilă e raportat ca eșuat (reluat la următoarea rulare).
+    """
+    while True:
+        batch = batch_queue.get()
+        if batch is None:
+            upload_queue.put(None)
+            return
+        try:
+            embedded, failed = embed_batch(batch, client)
+        except Exception as e:
+            counters["embed_error"] = e
+            embedded, failed = [], batch
+        upload_queue.put((embedded, failed, True))
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Indexează un PDF într-un corpus (versiune nouă, activată atomic).")
+    parser.add_argument("--pdf", default=os.path.join("data", "dsm5.pdf"), help="PDF-ul de indexat")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS, help="Numele corpusului (ex. dsm5, icd11, papers)")
+    parser.add_argument("--version", help="Versiunea construită (implicit derivată din PDF și configurația de indexare)")
+    parser.add_argument("--no-activate", action="store_true",
+                        help="Construiește versiunea fără s-o activeze (vezi `python corpora.py activate`)")
+    parser.add_argument("--drop-previous", action="store_true",
+                        help="După activare, șterge și versiunea anterioară (altfel păstrată pentru rollback)")
+    args = parser.parse_args(argv)
+    try:
+        corpus = check_name(args.corpus)
+    except ValueError as e:
+        print(f"❌ EROARE: {e}")
+        return
+
+    # Verificări chei (la REPLAY_MODE=replay nu sunt necesare)
+    replaying = replay_mode() == "replay"
+    if not replaying and (not SUPABASE_URL or not SUPABASE_KEY):
         print("❌ EROARE: Lipsesc credențialele Supabase (URL sau SERVICE_KEY) în fișierul .env")
         return
-    if not OPENAI_API_KEY:
+    if not replaying and not OPENAI_API_KEY:
         print("❌ EROARE: Lipsește OPENAI_API_KEY în fișierul .env")
         return
 
     # Inițializare clienți
     try:
-        supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-        openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        supabase: Client = create_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+        openai_client = create_openai_client(api_key=OPENAI_API_KEY, http_client=openai_http_client())
     except Exception as e:
         print(f"❌ EROARE la inițializare clienți: {e}")
         return
 
-    pdf_path = os.path.join("data", "dsm5.pdf")
-    
+    # Coloana embedding și indexul trebuie generate pentru aceeași configurație (embedding_config.py)
+    try:
+        check_config(supabase, EMBEDDING_CONFIG)
+    except RuntimeError as e:
+        print(f"❌ EROARE: {e}")
+        return
+
+    pdf_path = args.pdf
+
     if not os.path.exists(pdf_path):
         print(f"❌ Nu găsesc fișierul {pdf_path}. Te rog să îl pui în acest folder.")
         return
 
-    print("📖 1. Citesc PDF-ul...")
     try:
-        loader = PyPDFLoader(pdf_path)
-        pages = loader.load()
-        print(f"✅ Încărcat {len(pages)} pagini.")
+        total_pages = len(PdfReader(pdf_path).pages)
     except Exception as e:
         print(f"❌ EROARE la citirea PDF-ului: {e}")
         return
 
-    print("✂️  2. Tai textul în bucăți (Chunking)...")
+    print(f"📖 PDF: {total_pages} pagini | extragere pe {EXTRACT_WORKERS} procese | "
+          f"embeddings '{EMBEDDING_CONFIG.version}' câte {EMBED_CONCURRENCY} request-uri simultan")
+
     # Chunk size 1000 caractere cu overlap 100 este standardul de aur pentru RAG
     text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=1000,
-        chunk_overlap=100,
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
         separators=["\n\n", "\n", " ", ""]
     )
-    chunks = text_splitter.split_documents(pages)
-    print(f"✅ Rezultat: {len(chunks)} bucăți de text (chunks).")
 
-    print(f"🚀 3. Generare Embeddings cu modelul '{MODEL_NAME}' și Upload în Supabase...")
-    
-    # Procesăm în loturi (batch-uri) de 50 pentru viteză
-    batch_size = 50
-    total_chunks = len(chunks)
+    signature = ingest_signature(CHUNK_SIZE, CHUNK_OVERLAP)
+    version = args.version or default_version(pdf_path, signature)
+    live = active_versions(supabase).get(corpus)
+    print(f"📚 Corpus '{corpus}': construiesc versiunea {version} (activă acum: {live or '-'})")
+    if live is None:
+        print(f"   Corpus nou: creează-i indexul HNSW parțial cu `python corpora.py sql {corpus}`, "
+              "altfel căutările lui scanează tabela.")
+    checkpoint = IngestCheckpoint(CHECKPOINT_PATH)
+    uploaded = checkpoint.uploaded_hashes()
 
-    for i in tqdm(range(0, total_chunks, batch_size)):
-        batch = chunks[i : i + batch_size]
-        rows_to_insert = []
+    # Câte o bară per etapă, fiecare cu propriul debit (pagini/s, chunks/s, rânduri/s)
+    stats = {
+        "pages": tqdm(total=total_pages, desc="📄 extragere", unit="pag", position=0),
+        "chunks": tqdm(desc="✂️  chunking ", unit="chunk", position=1),
+        "rows": tqdm(desc="⬆️  upload   ", unit="rând", position=2),
+    }
+    counters = {"skipped": 0, "reused": 0, "error": None, "embed_error": None}
+    batch_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    upload_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    failed_chunks = []
+    started = time.time()
 
-        for doc in batch:
-            content = doc.page_content
-            # Curățăm caracterele nule care dau eroare în Postgres
-            content = content.replace('\x00', '')
-            
-            # Păstrăm numărul paginii pentru citări!
-            metadata = doc.metadata # ex: {'source': 'dsm5.pdf', 'page': 45}
-
-            try:
-                # Generăm embedding
-                vector = get_embedding(content, openai_client)
-                
-                rows_to_insert.append({
-                    "content": content,
-                    "metadata": metadata,
-                    "embedding": vector
-                })
-            except Exception as e:
-                print(f"⚠️ Eroare la embedding pentru un chunk: {e}")
-
-        # Inserăm lotul în Supabase
-        if rows_to_insert:
-            try:
-                supabase.table("dsm5").insert(rows_to_insert).execute()
-            except Exception as e:
-                print(f"❌ Eroare la upload Supabase: {e}")
-
-    print("\n🎉 GATA! Baza de date a fost populată.")
+    with ProcessPoolExecutor(max_workers=EXTRACT_WORKERS) as executor:
+        chunks = iter_chunks(iter_pages(pdf_path, total_pages, executor, corpus), text_splitter, stats)
+        threads = [threading.Thread(
+            target=chunk_stage,
+            args=(chunks, signature, version, uploaded, batch_queue, upload_queue, counters),
+            daemon=True,
+        )]
+        threads += [
+            threading.Thread(target=embed_worker, args=(openai_client, batch_queue, upload_queue, counters), daemon=True)
+            for _ in range(EMBED_CONCURRENCY)
+        ]
+        for thread in threads:
+            thread.start()
+
+        # Etapa de upload rulează în thread-ul principal (singurul care scrie în checkpoint)
+        finished_workers = 0
+        while finished_workers < EMBED_CONCURRENCY:
+            item = upload_queue.get()
+            if item is None:
+                finished_workers += 1
+                continue
+            embedded, failed, fresh = item
+            failed_chunks.extend(failed)
+            if not embedded:
+                continue
+            if fresh:
+                # Salvăm vectorii înainte de upload, ca un crash să nu irosească apelurile plătite
+                checkpoint.put_embeddings([(content_hash(doc.page_content), vector) for doc, vector in embedded])
+            if upload_rows(supabase, embedded, version):
+                checkpoint.mark_uploaded([doc.metadata["chunk_hash"] for doc, _ in embedded], corpus, version)
+                stats["rows"].update(len(embedded))
+            else:
+                failed_chunks.extend(doc for doc, _ in embedded)
+
+        for thread in threads:
+            thread.join()
+
+    checkpoint.close()
+    for bar in stats.values():
+        bar.close()
+
+    elapsed = max(time.time() - started, 1e-9)
+    print(f"\n⏱️  {elapsed:.1f}s | {stats['pages'].n / elapsed:.1f} pagini/s | "
+          f"{stats['chunks'].n / elapsed:.1f} chunks/s | {stats['rows'].n / elapsed:.1f} rânduri/s")
+    print(f"   {counters['skipped']} chunk-uri deja indexate, {counters['reused']} embeddings refolosite din cache.")
+
+    if counters["error"] is not None:
+        print(f"❌ EROARE la citirea/împărțirea PDF-ului: {counters['error']}")
+    if counters["embed_error"] is not None:
+        print(f"❌ EROARE la generarea embeddings: {counters['embed_error']}")
+    if failed_chunks:
+        pages = sorted({doc.metadata.get("page", "?") for doc in failed_chunks}, key=str)
+        print(f"⚠️ {len(failed_chunks)} chunk-uri nu au putut fi indexate (pagini: {pages}).")
+    if counters["error"] is not None or failed_chunks:
+        print("   Rulează din nou scriptul pentru a relua doar chunk-urile lipsă.")
+        return
+
+    if args.no_activate:
+        print(f"\n🎉 GATA! Versiunea {version} e construită; activeaz-o cu `python corpora.py activate {corpus} {version}`.")
+        return
+
+    # Doar după o rulare completă: comutare atomică pe versiunea nouă, apoi curățarea celor vechi.
+    # Ca la `corpora.py activate`, nu comutăm pe o versiune fără rânduri (ex. un checkpoint care
+    # a sărit toate chunk-urile, deși rândurile lor au fost șterse între timp)
+    try:
+        if not version_rows(supabase, corpus, version):
+            print(f"❌ Nu există rânduri pentru {corpus} / {version}; nu comut pe o versiune goală.")
+            return
+        replaced = activate_version(supabase, corpus, version)
+    except Exception as e:
+        print(f"❌ EROARE la activarea versiunii {version}: {e}")
+        return
+    if replaced == version:
+        print(f"\n🎉 GATA! Versiunea {version} era deja activă pentru corpusul '{corpus}'.")
+        return
+    keep = [version] if args.drop_previous or not replaced else [version, replaced]
+    try:
+        prune_versions(supabase, corpus, keep)
+    except Exception as e:
+        print(f"⚠️ Nu am putut șterge versiunile vechi: {e}")
+    else:
+        # Chunk-urile versiunilor șterse nu mai sunt în Supabase: o reingestie a lor nu le mai sare
+        checkpoint = IngestCheckpoint(CHECKPOINT_PATH)
+        checkpoint.forget_versions(corpus, keep)
+        checkpoint.close()
+
+    print(f"\n🎉 GATA! Corpusul '{corpus}' servește acum versiunea {version} (înainte: {replaced or '-'}).")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,160 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from embedding_cache import normalize_query
+
+# Analize rulate ca job-uri de fundal, cu rezultatele într-un store partajat de proces.
+# Cheia unui job e hash-ul query-ului normalizat (plus modelul și prompt-urile): același caz,
+# trimis din altă sesiune sau alt tab, se atașează job-ului existent (în curs sau terminat)
+# în loc să plătească din nou apelurile. Worker-ii scriu progresul (token-uri, câmpurile
+# auditului) în job, sub lock; UI-ul citește doar instantanee (snapshot), deci oricâte
+# sesiuni pot urmări același job, iar scriptul Streamlit nu mai e blocat cât rulează analiza.
+# Job-urile care așteaptă un worker liber rămân în coadă (status "queued").
+# Un rezultat cu erori (`result["errors"]` nevid: un agent eșuat sau expirat, un raport de audit
+# invalid) e afișat sesiunilor deja atașate, dar nu e refolosit: următorul submit îl re-analizează.
+#
+# Configurabil din .env: JOB_WORKERS (implicit 4), JOB_RESULTS_MAX (implicit 200 de job-uri
+# păstrate), JOB_RESULT_TTL (secunde; implicit 3600, după care cazul e re-analizat).
+
+JOB_STATES = ("queued", "running", "done", "error")
+
+def job_key(query: str, *parts: str) -> str:
+    raw = "|".join([*parts, normalize_query(query)])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+class Job:
+    def __init__(self, key: str, query: str):
+        self.key = key
+        self.query = query
+        self.status = "queued"
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.sessions: Set[str] = set()
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.reusable = True
+        self._lock = threading.Lock()
+        self._progress: Dict[str, Any] = {}
+
+    def update(self, **fields):
+        """Înlocuiește câmpuri din progres (apelat din worker)."""
+        with self._lock:
+            self._progress.update(fields)
+
+    def append(self, stream: str, text: str):
+        """Adaugă un fragment de text la un stream din progres."""
+        with self._lock:
+            self._progress[stream] = self._progress.get(stream, "") + text
+
+    def set_field(self, stream: str, key: str, value: Any):
+        """Un câmp dintr-un obiect parțial (ex. raportul auditorului, pe măsură ce e parsat)."""
+        with self._lock:
+            self._progress.setdefault(stream, {})[key] = value
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Starea curentă, copiată: sigur de citit din alt thread."""
+        with self._lock:
+            progress = {key: dict(value) if isinstance(value, dict) else value for key, value in self._progress.items()}
+            return {"key": self.key, "query": self.query, "status": self.status, "progress": progress,
+                    "result": self.result, "error": self.error, "submitted": self.submitted,
+                    "started": self.started, "finished": self.finished}
+
+class JobManager:
+    def __init__(self, workers: int = 4, max_jobs: int = 200, ttl_seconds: float = 3600):
+        self.max_jobs = max_jobs
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="job")
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expired(self, job: Job, now: float) -> bool:
+        return job.finished is not None and now - job.finished > self.ttl_seconds
+
+    def submit(self, key: str, query: str, session_id: str, fn: Callable[[Job], Dict[str, Any]],
+               force: bool = False) -> Job:
+        """
+        Pornește `fn(job)` pe un worker sau întoarce job-ul existent cu aceeași cheie.
+        Un job eșuat, terminat cu erori sau expirat e repornit; cu `force`, și unul terminat (nu și unul în curs).
+        """
+        with self._lock:
+            job = self._jobs.get(key)
+            reusable = (job is not None and job.status != "error" and job.reusable
+                        and not self._expired(job, time.time()))
+            if reusable and (not force or job.status in ("queued", "running")):
+                job.sessions.add(session_id)
+                self._jobs.move_to_end(key)
+                return job
+            job = Job(key, query)
+            job.sessions.add(session_id)
+            self._jobs[key] = job
+            self._jobs.move_to_end(key)
+            self._evict()
+        self._executor.submit(self._run, job, fn)
+        return job
+
+    def _evict(self):
+        """Cele mai vechi job-uri terminate ies primele; cele în curs nu sunt scoase."""
+        now = time.time()
+        for key in [key for key, job in self._jobs.items() if self._expired(job, now)]:
+            del self._jobs[key]
+        for key in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[key].status in ("done", "error"):
+                del self._jobs[key]
+
+    def _run(self, job: Job, fn: Callable[[Job], Dict[str, Any]]):
+        job.started = time.time()
+        job.status = "running"
+        try:
+            job.result = fn(job)
+            job.reusable = not (job.result or {}).get("errors")
+            job.status = "done"
+        except Exception as e:
+            job.error = f"{type(e).__name__}: {e}"
+            job.status = "error"
+        finally:
+            job.finished = time.time()
+
+    def get(self, key: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(key)
+            return None if job is None or self._expired(job, time.time()) else job
+
+    def queue_position(self, job: Job) -> int:
+        """Câte job-uri în așteptare au fost trimise înaintea acestuia (0 = următorul)."""
+        with self._lock:
+            return sum(1 for other in self._jobs.values() if other.status == "queued" and other.submitted < job.submitted)
+
+    def session_jobs(self, session_id: str) -> List[Job]:
+        """Job-urile la care e atașată sesiunea, cele mai recente primele."""
+        with self._lock:
+            return [job for job in reversed(self._jobs.values()) if session_id in job.sessions]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {state: 0 for state in JOB_STATES}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+_default_manager: Optional[JobManager] = None
+_default_lock = threading.Lock()
+
+def default_job_manager() -> JobManager:
+    """Manager-ul partajat de proces (în Streamlit, comun tuturor sesiunilor și rerun-urilor)."""
+    global _default_manager
+    with _default_lock:
+        if _default_manager is None:
+            _default_manager = JobManager(
+                workers=int(os.getenv("JOB_WORKERS", "4")),
+                max_jobs=int(os.getenv("JOB_RESULTS_MAX", "200")),
+                ttl_seconds=float(os.getenv("JOB_RESULT_TTL", "3600")),
+            )
+    return _default_manager
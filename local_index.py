@@ -0,0 +1,256 @@
+import os
+import re
+import json
+import argparse
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from supabase import create_client, Client
+
+from corpora import active_versions
+from embedding_config import active_embedding_config
+
+# Index vectorial local (in-process) pentru tabela dsm5.
+# Corpusul (câteva mii de vectori x 1536) încape în RAM, așa că o căutare devine
+# un simplu produs matrice-vector în NumPy, fără round-trip la Supabase.
+#
+# Format pe disc (director):
+#   embeddings.npy  - matrice [N, dim] float32/float16, vectori normalizați L2 (memory-mapped)
+#   rows.jsonl      - un rând per vector: {"id", "content", "metadata"}
+#   manifest.json   - dtype, dimensiune, număr de rânduri, versiunea embeddings (embedding_config.py)
+#
+# Pentru căutarea hibridă, indexul lexical (BM25) e construit în memorie din rows.jsonl
+# la prima utilizare; e echivalentul local al coloanei content_tsv din vector.sql
+# (fără stemming, dar cu aceeași tokenizare a codurilor "F43.10" / "309.81").
+
+EXPORT_PAGE_SIZE = 500
+TOKEN_RE = re.compile(r"\w+(?:\.\w+)*")
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN_RE.findall(text.lower())
+
+def jsonb_contains(container: Any, contained: Any, top_level: bool = True) -> bool:
+    """Semantica operatorului Postgres `jsonb @> jsonb` (folosit de match_dsm5 pe metadata)."""
+    if isinstance(contained, dict):
+        if not isinstance(container, dict):
+            return False
+        return all(
+            key in container and jsonb_contains(container[key], value, top_level=False)
+            for key, value in contained.items()
+        )
+    if isinstance(contained, list):
+        if not isinstance(container, list):
+            return False
+        return all(
+            any(jsonb_contains(item, wanted, top_level=False) for item in container)
+            for wanted in contained
+        )
+    if isinstance(container, list):
+        # Excepție Postgres: un array conține un scalar doar la nivelul de sus
+        return top_level and any(jsonb_contains(item, contained, top_level=False) for item in container)
+    if isinstance(container, dict):
+        return False
+    # bool nu e număr în JSON (în Python True == 1)
+    if isinstance(container, bool) != isinstance(contained, bool):
+        return False
+    return container == contained
+
+class LocalIndex:
+    """Răspunde la aceleași interogări ca RPC-ul match_dsm5, dintr-un export local."""
+
+    def __init__(self, index_dir: str):
+        with open(os.path.join(index_dir, "manifest.json"), encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.embeddings = np.load(os.path.join(index_dir, "embeddings.npy"), mmap_mode="r")
+        if self.embeddings.dtype != np.float32:
+            # float16 economisește disc; NumPy nu are BLAS pentru float16, așa că scorăm în float32
+            self.embeddings = np.asarray(self.embeddings, dtype=np.float32)
+        with open(os.path.join(index_dir, "rows.jsonl"), encoding="utf-8") as f:
+            self.rows = [json.loads(line) for line in f]
+        self._filter_masks: Dict[str, np.ndarray] = {}
+        self._postings: Optional[Dict[str, tuple]] = None
+        self._positions: Optional[Dict[int, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def scores(self, query: np.ndarray) -> np.ndarray:
+        """Similaritatea cosinus a query-ului (normalizat) cu toate rândurile."""
+        return self.embeddings @ query
+
+    def vectors(self, ids: List[int]) -> np.ndarray:
+        """Vectorii rândurilor cu id-urile date (în aceeași ordine)."""
+        if self._positions is None:
+            self._positions = {row["id"]: i for i, row in enumerate(self.rows)}
+        return self.embeddings[[self._positions[i] for i in ids]]
+
+    def _mask(self, filter: Optional[dict]) -> Optional[np.ndarray]:
+        """Mască booleană a rândurilor care satisfac filtrul (memorată per filtru)."""
+        if not filter:
+            return None
+        key = json.dumps(filter, sort_keys=True)
+        if key not in self._filter_masks:
+            self._filter_masks[key] = np.fromiter(
+                (jsonb_contains(row["metadata"] or {}, filter) for row in self.rows),
+                dtype=bool, count=len(self.rows),
+            )
+        return self._filter_masks[key]
+
+    def match(self, query_embedding: List[float], match_count: Optional[int] = 5,
+              filter: Optional[dict] = None) -> List[dict]:
+        """Top-k după similaritatea cosinus; rezultatele au forma rândurilor din match_dsm5."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        scores = self.scores(query)
+
+        mask = self._mask(filter)
+        if mask is not None:
+            scores = np.where(mask, scores, -np.inf)
+            available = int(mask.sum())
+        else:
+            available = len(scores)
+
+        k = available if match_count is None else min(match_count, available)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{**self.rows[i], "similarity": float(scores[i])} for i in top]
+
+    def _build_lexical(self):
+        """Liste de postări term -> (rânduri, frecvențe) și lungimile documentelor, pentru BM25."""
+        postings: Dict[str, Dict[int, int]] = {}
+        lengths = np.zeros(len(self.rows), dtype=np.float32)
+        for i, row in enumerate(self.rows):
+            tokens = tokenize(row["content"] or "")
+            lengths[i] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[i] = counts.get(i, 0) + 1
+        self._postings = {
+            term: (np.fromiter(counts.keys(), dtype=np.int64), np.fromiter(counts.values(), dtype=np.float32))
+            for term, counts in postings.items()
+        }
+        self._doc_lengths = lengths
+        self._avg_length = float(lengths.mean()) if len(lengths) else 0.0
+
+    def lexical_scores(self, query_text: str) -> np.ndarray:
+        """Scorul BM25 al fiecărui rând pentru termenii query-ului (legați cu OR); 0 = niciun termen comun."""
+        if self._postings is None:
+            self._build_lexical()
+        scores = np.zeros(len(self.rows), dtype=np.float32)
+        n = len(self.rows)
+        for term in set(tokenize(query_text)):
+            if term not in self._postings:
+                continue
+            docs, tf = self._postings[term]
+            idf = np.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * self._doc_lengths[docs] / (self._avg_length or 1.0))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def match_hybrid(self, query_text: str, query_embedding: Optional[List[float]] = None,
+                     match_count: int = 5, filter: Optional[dict] = None,
+                     rrf_k: int = 60, candidate_count: int = 40) -> List[dict]:
+        """Echivalentul local al RPC-ului match_dsm5_hybrid: BM25 + cosinus, fuzionate cu RRF."""
+        mask = self._mask(filter)
+        fused: Dict[int, float] = {}
+
+        lexical = self.lexical_scores(query_text)
+        if mask is not None:
+            lexical = np.where(mask, lexical, 0)
+        hits = np.flatnonzero(lexical > 0)
+        lexical_top = hits[np.argsort(-lexical[hits])][:candidate_count]
+        for rank, i in enumerate(lexical_top, start=1):
+            fused[int(i)] = fused.get(int(i), 0.0) + 1.0 / (rrf_k + rank)
+
+        similarities = None
+        if query_embedding is not None:
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            similarities = self.scores(query)
+            semantic = similarities if mask is None else np.where(mask, similarities, -np.inf)
+            k = min(candidate_count, len(semantic) if mask is None else int(mask.sum()))
+            if k > 0:
+                top = np.argpartition(-semantic, k - 1)[:k]
+                for rank, i in enumerate(top[np.argsort(-semantic[top])], start=1):
+                    fused[int(i)] = fused.get(int(i), 0.0) + 1.0 / (rrf_k + rank)
+
+        ranked = sorted(fused.items(), key=lambda pair: -pair[1])[:match_count]
+        return [{
+            **self.rows[i],
+            "similarity": None if similarities is None else float(similarities[i]),
+            "lexical_rank": float(lexical[i]),
+            "rrf_score": score,
+        } for i, score in ranked]
+
+def export_index(supabase: Client, index_dir: str, dtype: str = "float32") -> int:
+    """
+    Exportă tabela dsm5 (paginat) într-un index local. Returnează numărul de rânduri.
+    Cu registrul de corpusuri (corpora.py) sunt exportate doar versiunile active, cu corpusul
+    în metadata (filtrul folosit de retrieval.match_corpora pe backend-ul local).
+    """
+    versions = active_versions(supabase)
+    columns = "id, content, metadata, embedding" + (", corpus, corpus_version" if versions else "")
+    rows, vectors = [], []
+    start = 0
+    while True:
+        response = (
+            supabase.table("dsm5")
+            .select(columns)
+            .order("id")
+            .range(start, start + EXPORT_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = response.data or []
+        for item in page:
+            if versions:
+                # Versiunile în construcție sau înlocuite nu ajung în index
+                if versions.get(item["corpus"]) != item["corpus_version"]:
+                    continue
+                item["metadata"] = {**(item["metadata"] or {}), "corpus": item["corpus"]}
+            embedding = item["embedding"]
+            # PostgREST întoarce tipul vector ca text: "[0.1,0.2,...]"
+            if isinstance(embedding, str):
+                embedding = json.loads(embedding)
+            vectors.append(embedding)
+            rows.append({"id": item["id"], "content": item["content"], "metadata": item["metadata"]})
+        if len(page) < EXPORT_PAGE_SIZE:
+            break
+        start += EXPORT_PAGE_SIZE
+
+    matrix = np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1.0, norms)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, "embeddings.npy"), matrix.astype(dtype))
+    with open(os.path.join(index_dir, "rows.jsonl"), "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    with open(os.path.join(index_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"dtype": dtype, "dim": int(matrix.shape[1]), "count": len(rows),
+                   "embedding_version": active_embedding_config().version, "corpora": versions}, f, indent=2)
+    return len(rows)
+
+def main():
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Exportă tabela dsm5 într-un index vectorial local.")
+    parser.add_argument("--out", default=os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "dsm5_index")))
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+
+    supabase_url = os.getenv("SUPABASE_URL")
+    supabase_key = os.getenv("SUPABASE_ANON_KEY")
+    if not supabase_url or not supabase_key:
+        print("❌ EROARE: Lipsesc credențialele Supabase în .env")
+        return
+
+    count = export_index(create_client(supabase_url, supabase_key), args.out, args.dtype)
+    print(f"✅ Exportat {count} vectori ({args.dtype}) în {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,279 @@
+import os
+import time
+import threading
+import collections
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import httpx
+import numpy as np
+
+import rate_limit
+
+# Instrumentare per etapă a pipeline-ului RAG: embedding, match_dsm5, MMR, Agent A,
+# draft-ul, pre-verificarea locală (grounding.py) și auditul lui Agent B. Pentru fiecare etapă: timp (histogramă cumulativă
+# + percentile p50/p95/p99 pe ultimele eșantioane), token-i din `usage` (prompt,
+# completion, cached), reîncercări ale clientului OpenAI și erori.
+# Reîncercările sunt numărate de un hook httpx: SDK-ul OpenAI trimite antetul
+# x-stainless-retry-count la fiecare încercare, iar etapa curentă e ținută per thread.
+#
+# Expunere în format Prometheus: METRICS_PORT (endpoint HTTP /metrics) și/sau
+# METRICS_FILE (fișier rescris după fiecare rulare, ex. pentru node_exporter textfile).
+
+STAGES = ("embedding", "match_dsm5", "mmr", "agent_a", "agent_b_draft", "grounding", "agent_b_audit")
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+QUANTILES = (0.5, 0.95, 0.99)
+SAMPLE_WINDOW = 2048
+TOKEN_KINDS = ("prompt", "completion", "cached")
+# Rezultatele pre-verificării: auditul LLM sărit (APPROVE / BLOCK local) sau rulat
+GROUNDING_OUTCOMES = ("skip", "block", "audit")
+
+class StageStats:
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.samples: Deque[float] = collections.deque(maxlen=SAMPLE_WINDOW)
+        self.tokens = {kind: 0 for kind in TOKEN_KINDS}
+        self.retries = 0
+        self.errors = 0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.total += seconds
+        self.samples.append(seconds)
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.bucket_counts[i] += 1
+
+def usage_counts(usage: Any) -> Dict[str, int]:
+    """Token-ii din `usage` (chat sau embeddings); câmpurile lipsă contează ca 0."""
+    if usage is None:
+        return {kind: 0 for kind in TOKEN_KINDS}
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion": getattr(usage, "completion_tokens", 0) or 0,
+        "cached": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+    }
+
+def prefix_cache_summary(tokens: Dict[str, int]) -> str:
+    """Cât din prompt-ul unui apel a venit din cache-ul de prefix al furnizorului."""
+    prompt, cached = tokens.get("prompt", 0), tokens.get("cached", 0)
+    share = cached / prompt if prompt else 0.0
+    return f"cache prefix {cached}/{prompt} token-i prompt ({share:.0%})"
+
+class Span:
+    """Etapa în curs de măsurare; primește `usage` de la răspunsul OpenAI (păstrat în `tokens`)."""
+
+    def __init__(self, registry: "MetricsRegistry", stage: str):
+        self.registry = registry
+        self.stage = stage
+        self.tokens = {kind: 0 for kind in TOKEN_KINDS}
+
+    def usage(self, usage: Any):
+        for kind, value in self.registry.add_usage(self.stage, usage).items():
+            self.tokens[kind] += value
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageStats] = collections.OrderedDict((stage, StageStats()) for stage in STAGES)
+        self._local = threading.local()
+        self._grounding = {outcome: 0 for outcome in GROUNDING_OUTCOMES}
+
+    def _get(self, stage: str) -> StageStats:
+        if stage not in self._stages:
+            self._stages[stage] = StageStats()
+        return self._stages[stage]
+
+    @contextmanager
+    def timed(self, stage: str) -> Iterator[Span]:
+        """Măsoară timpul unei etape; excepțiile sunt numărate ca erori și propagate."""
+        previous = getattr(self._local, "stage", None)
+        self._local.stage = stage
+        started = time.perf_counter()
+        try:
+            yield Span(self, stage)
+        except BaseException:
+            with self._lock:
+                self._get(stage).errors += 1
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.stage = previous
+            with self._lock:
+                self._get(stage).observe(elapsed)
+
+    def reset(self):
+        """Golește toate etapele și contoarele (de ex. între rulările unui benchmark)."""
+        with self._lock:
+            self._stages = collections.OrderedDict((stage, StageStats()) for stage in STAGES)
+            self._grounding = {outcome: 0 for outcome in GROUNDING_OUTCOMES}
+
+    def current_stage(self) -> Optional[str]:
+        return getattr(self._local, "stage", None)
+
+    def add_usage(self, stage: str, usage: Any) -> Dict[str, int]:
+        """Adaugă token-ii din `usage` la etapă și îi întoarce."""
+        counts = usage_counts(usage)
+        with self._lock:
+            tokens = self._get(stage).tokens
+            for kind, value in counts.items():
+                tokens[kind] += value
+        return counts
+
+    def add_retry(self, stage: Optional[str]):
+        with self._lock:
+            self._get(stage or "other").retries += 1
+
+    def add_grounding(self, outcome: str):
+        with self._lock:
+            self._grounding[outcome] += 1
+
+    def grounding_stats(self) -> Dict[str, Any]:
+        """Rezultatele pre-verificării și rata de skip (audituri LLM evitate / drafturi verificate)."""
+        with self._lock:
+            stats: Dict[str, Any] = dict(self._grounding)
+        checked = sum(stats.values())
+        stats["checked"] = checked
+        stats["skip_rate"] = (stats["skip"] + stats["block"]) / checked if checked else 0.0
+        return stats
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """Un rând per etapă (doar cele cu apeluri), cu percentile în secunde."""
+        rows = []
+        with self._lock:
+            for stage, stats in self._stages.items():
+                if not stats.count:
+                    continue
+                samples = np.fromiter(stats.samples, dtype=np.float64)
+                p50, p95, p99 = np.quantile(samples, QUANTILES)
+                rows.append({
+                    "stage": stage,
+                    "calls": stats.count,
+                    "p50_s": round(float(p50), 3),
+                    "p95_s": round(float(p95), 3),
+                    "p99_s": round(float(p99), 3),
+                    "mean_s": round(stats.total / stats.count, 3),
+                    "prompt_tokens": stats.tokens["prompt"],
+                    "completion_tokens": stats.tokens["completion"],
+                    "cached_tokens": stats.tokens["cached"],
+                    "retries": stats.retries,
+                    "errors": stats.errors,
+                })
+        return rows
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP dsm5_stage_latency_seconds Durata etapelor pipeline-ului RAG.",
+            "# TYPE dsm5_stage_latency_seconds histogram",
+        ]
+        with self._lock:
+            stages = list(self._stages.items())
+            for stage, stats in stages:
+                # bucket_counts sunt deja cumulative (observe incrementează toate limitele >= durata)
+                for bound, count in zip(BUCKETS, stats.bucket_counts):
+                    lines.append(f'dsm5_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {count}')
+                lines.append(f'dsm5_stage_latency_seconds_bucket{{stage="{stage}",le="+Inf"}} {stats.count}')
+                lines.append(f'dsm5_stage_latency_seconds_sum{{stage="{stage}"}} {stats.total:.6f}')
+                lines.append(f'dsm5_stage_latency_seconds_count{{stage="{stage}"}} {stats.count}')
+
+            lines += ["# HELP dsm5_stage_latency_quantile_seconds Percentile pe ultimele eșantioane.",
+                      "# TYPE dsm5_stage_latency_quantile_seconds gauge"]
+            for stage, stats in stages:
+                if not stats.samples:
+                    continue
+                values = np.quantile(np.fromiter(stats.samples, dtype=np.float64), QUANTILES)
+                for quantile, value in zip(QUANTILES, values):
+                    lines.append(f'dsm5_stage_latency_quantile_seconds{{stage="{stage}",quantile="{quantile}"}} {value:.6f}')
+
+            lines += ["# HELP dsm5_tokens_total Token-i raportați de OpenAI în `usage`.",
+                      "# TYPE dsm5_tokens_total counter"]
+            for stage, stats in stages:
+                for kind in TOKEN_KINDS:
+                    lines.append(f'dsm5_tokens_total{{stage="{stage}",kind="{kind}"}} {stats.tokens[kind]}')
+
+            lines += ["# HELP dsm5_retries_total Reîncercări ale clientului OpenAI.",
+                      "# TYPE dsm5_retries_total counter"]
+            lines += [f'dsm5_retries_total{{stage="{stage}"}} {stats.retries}' for stage, stats in stages]
+
+            lines += ["# HELP dsm5_stage_errors_total Etape terminate cu excepție.",
+                      "# TYPE dsm5_stage_errors_total counter"]
+            lines += [f'dsm5_stage_errors_total{{stage="{stage}"}} {stats.errors}' for stage, stats in stages]
+
+        grounding = self.grounding_stats()
+        lines += ["# HELP dsm5_grounding_total Rezultatele pre-verificării locale a draftului.",
+                  "# TYPE dsm5_grounding_total counter"]
+        lines += [f'dsm5_grounding_total{{outcome="{outcome}"}} {grounding[outcome]}' for outcome in GROUNDING_OUTCOMES]
+        lines += ["# HELP dsm5_grounding_skip_rate Fracțiunea drafturilor decise local, fără audit LLM.",
+                  "# TYPE dsm5_grounding_skip_rate gauge",
+                  f"dsm5_grounding_skip_rate {grounding['skip_rate']:.6f}"]
+        return "\n".join(lines) + "\n"
+
+_registry = MetricsRegistry()
+
+def registry() -> MetricsRegistry:
+    """Registry-ul partajat de proces (în Streamlit supraviețuiește rerun-urilor)."""
+    return _registry
+
+def timed(stage: str):
+    return _registry.timed(stage)
+
+# --- EXPUNERE ---
+
+def openai_http_client() -> httpx.Client:
+    """
+    Client httpx pentru OpenAI(http_client=...) care numără reîncercările SDK-ului per etapă
+    și trece fiecare request prin planificatorul de rate limit (rate_limit.py).
+    """
+    def on_request(request: httpx.Request):
+        if int(request.headers.get("x-stainless-retry-count", "0") or 0) > 0:
+            _registry.add_retry(_registry.current_stage())
+    return httpx.Client(event_hooks={"request": [on_request, rate_limit.on_request],
+                                     "response": [rate_limit.on_response]})
+
+def write_prometheus_file(path: Optional[str] = None):
+    """Rescrie atomic fișierul METRICS_FILE (dacă e configurat)."""
+    path = path or os.getenv("METRICS_FILE")
+    if not path:
+        return
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(_registry.prometheus_text())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = _registry.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_server: Optional[ThreadingHTTPServer] = None
+_server_lock = threading.Lock()
+
+def start_http_server(port: Optional[int] = None) -> Optional[int]:
+    """Pornește (o singură dată per proces) endpoint-ul /metrics pe METRICS_PORT. Întoarce portul."""
+    global _server
+    if port is None:
+        if not os.getenv("METRICS_PORT"):
+            return None
+        port = int(os.getenv("METRICS_PORT"))
+    with _server_lock:
+        if _server is None:
+            _server = ThreadingHTTPServer((os.getenv("METRICS_HOST", "127.0.0.1"), port), _MetricsHandler)
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server.server_address[1]
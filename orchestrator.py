@@ -0,0 +1,82 @@
+import os
+import time
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+# Orchestrare concurentă pentru pipeline-ul dual-agent.
+# Agent A și lanțul draft -> audit al lui Agent B împart doar contextul (read-only),
+# deci pot rula în paralel: latența end-to-end devine max(A, B) în loc de A + B.
+# Fiecare request are un termen limită (Deadline); la expirare, task-urile rămase
+# sunt anulate cooperativ: apelurile OpenAI primesc timeout-ul rămas, iar pașii
+# următori verifică deadline.check() înainte să pornească.
+
+# Configurabile din .env: REQUEST_DEADLINE_SECONDS (implicit 90), AGENT_WORKERS (implicit 8)
+
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    def __init__(self, seconds: Optional[float] = None):
+        if seconds is None:
+            seconds = float(os.getenv("REQUEST_DEADLINE_SECONDS", "90"))
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self._cancelled = threading.Event()
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return self._cancelled.is_set() or self.remaining() <= 0
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def check(self):
+        """Ridică DeadlineExceeded dacă request-ul a expirat sau a fost anulat."""
+        if self.expired():
+            raise DeadlineExceeded(f"Termenul de {self.seconds:.0f}s a expirat.")
+
+def timeout_kwargs(deadline: Optional[Deadline]) -> Dict[str, float]:
+    """Argumentul `timeout` pentru un apel OpenAI, limitat la timpul rămas din deadline."""
+    if deadline is None:
+        return {}
+    deadline.check()
+    return {"timeout": deadline.remaining()}
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_executor() -> ThreadPoolExecutor:
+    """Pool partajat de proces (în Streamlit supraviețuiește rerun-urilor)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("AGENT_WORKERS", "8")), thread_name_prefix="agent"
+            )
+    return _executor
+
+def run_parallel(tasks: Dict[str, Callable[[], Any]],
+                 deadline: Deadline) -> Iterator[Tuple[str, Any, Optional[BaseException]]]:
+    """
+    Pornește task-urile simultan și produce (nume, rezultat, eroare) în ordinea terminării,
+    ca apelantul să poată afișa fiecare rezultat imediat. La expirarea deadline-ului,
+    task-urile rămase sunt anulate și raportate cu DeadlineExceeded.
+    """
+    executor = get_executor()
+    pending: Dict[Future, str] = {executor.submit(task): name for name, task in tasks.items()}
+
+    while pending:
+        done, _ = wait(pending, timeout=deadline.remaining(), return_when=FIRST_COMPLETED)
+        if not done:
+            deadline.cancel()
+            for future, name in pending.items():
+                future.cancel()
+                yield name, None, DeadlineExceeded(f"Termenul de {deadline.seconds:.0f}s a expirat.")
+            return
+        for future in done:
+            name = pending.pop(future)
+            error = future.exception()
+            yield name, (None if error else future.result()), error
@@ -0,0 +1,165 @@
+from typing import Any, Callable, Dict, List, Literal, Optional, Tuple, Union
+
+from openai import OpenAI
+from pydantic import BaseModel, Field, field_validator
+from supabase import Client
+
+from retrieval import retrieve
+from orchestrator import Deadline, timeout_kwargs
+from streaming import stream_completion
+from audit_stream import stream_audit
+from experiment_log import retrieval_hits
+from context_packing import build_contexts, context_budget, fit_context
+from grounding import GroundingResult, grounding_gate
+from metrics import timed
+from prompts import agent_a_messages, audit_messages, draft_messages
+
+# Pipeline-ul dual-agent, comun CLI-ului (run_agents.py), aplicației Streamlit (app.py) și
+# serviciului HTTP (api.py): retrieval -> Agent A | Agent B (draft -> pre-verificare -> audit).
+# Clienții sunt primiți ca parametri (fiecare interfață își creează propriii clienți);
+# afișarea progresului (log, UI, SSE) se face prin callback-uri, nu aici.
+
+MODEL_NAME = "gpt-4o-mini"
+
+# Decizia e primul câmp: auditorul o generează prima, iar în streaming e aplicată înainte ca
+# raportul să fie complet. Celelalte câmpuri acceptă și formele (obiect, text) pe care auditorul
+# le produce uneori; decizia e normalizată ("approve" -> "APPROVE") și altfel e invalidă.
+class ConfessionReport(BaseModel):
+    final_decision: Literal["APPROVE", "BLOCK"] = Field(description="Decizia finală")
+    honesty_score: Union[int, str] = Field(description="Scor 1-10 fidelitate")
+    reasoning: str = Field(description="Motivare decizie")
+    ambiguity_detected: Union[bool, str, Dict, Any] = Field(description="Dacă există ambiguitate")
+    constraints_identified: Union[List[str], Dict, str, Any] = Field(description="Lista regulilor identificate")
+    compliance_analysis: Union[str, Dict, Any] = Field(description="Analiza critică")
+    hallucination_check: Union[str, bool, Dict, Any] = Field(description="Verificare halucinații")
+
+    @field_validator("final_decision", mode="before")
+    @classmethod
+    def normalize_decision(cls, value: Any) -> Any:
+        return value.strip().upper() if isinstance(value, str) else value
+
+def parse_report(raw_json: str) -> Tuple[Optional[ConfessionReport], Optional[str]]:
+    """(raport, None) sau (None, motivul) dacă JSON-ul auditorului nu trece validarea."""
+    try:
+        return ConfessionReport.model_validate_json(raw_json), None
+    except Exception as e:
+        return None, f"JSON Validation Error: {e}. Raw JSON: {raw_json}"
+
+# --- RETRIEVAL ---
+
+def source_line(item: dict) -> str:
+    page = (item.get("metadata") or {}).get("page", "?")
+    return f"Pagina {page}: {item['content'][:200]}..."
+
+def search(supabase: Client, client: OpenAI, query: str, limit: int = 5,
+           corpora: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Retrieval + asamblarea contextului: mode, results, hits (pentru jurnal), sources,
+    context (Agent A, draft) și audit_context. Fără rezultate, contextele sunt goale.
+    """
+    results, mode = retrieve(supabase, client, query, limit, {}, corpora=corpora)
+    # Chunk-uri suprapuse lipite, duplicate eliminate, împachetate per buget de tokeni
+    contexts = build_contexts(results) if results else {"answer": "", "audit": ""}
+    return {
+        "mode": mode,
+        "results": results,
+        "hits": retrieval_hits(results),
+        "sources": [source_line(item) for item in results],
+        "context": contexts["answer"],
+        "audit_context": contexts["audit"],
+    }
+
+# --- AGENȚI ---
+
+def chat(client: OpenAI, stage: str, messages: list, deadline: Optional[Deadline] = None,
+         on_token: Optional[Callable[[str], None]] = None, usage: Optional[dict] = None, **kwargs) -> str:
+    """Un apel chat (în streaming dacă e dat on_token), cronometrat pe etapă; `usage[stage]` primește token-ii."""
+    with timed(stage) as span:
+        if on_token:
+            content = stream_completion(client, on_token, deadline, on_usage=span.usage, model=MODEL_NAME,
+                                        messages=messages, **kwargs, **timeout_kwargs(deadline))
+        else:
+            response = client.chat.completions.create(model=MODEL_NAME, messages=messages, **kwargs,
+                                                      **timeout_kwargs(deadline))
+            span.usage(response.usage)
+            content = response.choices[0].message.content
+    if usage is not None:
+        usage[stage] = dict(span.tokens)
+    return content
+
+def run_agent_a(client: OpenAI, query: str, context: str, deadline: Optional[Deadline] = None,
+                on_token: Optional[Callable[[str], None]] = None, usage: Optional[dict] = None) -> str:
+    return chat(client, "agent_a", agent_a_messages(query, context), deadline, on_token, usage)
+
+class AgentBResult:
+    """Draftul lui Agent B, raportul auditorului (None dacă nu a trecut validarea) și pre-verificarea locală."""
+
+    def __init__(self, draft: str, confession: Optional[ConfessionReport],
+                 grounding: Optional[GroundingResult] = None, audit_error: Optional[str] = None):
+        self.draft = draft
+        self.confession = confession
+        self.grounding = grounding
+        self.audit_error = audit_error
+
+    @property
+    def approved(self) -> bool:
+        return self.confession is not None and self.confession.final_decision == "APPROVE"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "draft": self.draft,
+            "audit": self.confession.model_dump() if self.confession is not None else None,
+            "audit_error": self.audit_error,
+            "grounding": self.grounding.as_dict() if self.grounding is not None else None,
+            "response": self.draft if self.approved else None,
+        }
+
+def run_agent_b(client: OpenAI, query: str, context: str, deadline: Optional[Deadline] = None,
+                audit_context: Optional[str] = None,
+                on_draft_token: Optional[Callable[[str], None]] = None,
+                on_draft_done: Optional[Callable[[str], None]] = None,
+                on_grounding: Optional[Callable[[GroundingResult], None]] = None,
+                on_audit_field: Optional[Callable[[str, Any], None]] = None,
+                usage: Optional[dict] = None) -> AgentBResult:
+    """
+    Draft -> pre-verificare locală (GROUNDING_MODE) -> audit LLM.
+    Cu `on_audit_field`, auditul rulează în streaming și fiecare câmp (întâi final_decision)
+    e livrat imediat ce e complet; un verdict local e livrat la fel, câmp cu câmp.
+    `audit_context` e contextul împachetat pentru auditor (implicit: `context` scurtat între pasaje).
+    """
+    # 1. Draft
+    draft = chat(client, "agent_b_draft", draft_messages(query, context), deadline, on_draft_token, usage)
+    if on_draft_done:
+        on_draft_done(draft)
+
+    # 2. Pre-verificare locală: decide fără auditul LLM când draftul e clar (ne)ancorat
+    grounding, verdict = grounding_gate(draft, context)
+    if grounding is not None and on_grounding:
+        on_grounding(grounding)
+    if verdict is not None:
+        if on_audit_field:
+            for key, value in verdict.items():
+                on_audit_field(key, value)
+        return AgentBResult(draft, ConfessionReport.model_validate(verdict), grounding)
+
+    # 3. Audit (nu pornim auditul dacă request-ul a expirat deja)
+    if deadline is not None:
+        deadline.check()
+    if audit_context is None:
+        audit_context = fit_context(context, context_budget("audit"))
+    messages = audit_messages(query, audit_context, draft)
+    with timed("agent_b_audit") as span:
+        if on_audit_field:
+            raw_json = stream_audit(client, on_audit_field, deadline, on_usage=span.usage, model=MODEL_NAME,
+                                    messages=messages, response_format={"type": "json_object"},
+                                    **timeout_kwargs(deadline))
+        else:
+            response = client.chat.completions.create(model=MODEL_NAME, messages=messages,
+                                                      response_format={"type": "json_object"},
+                                                      **timeout_kwargs(deadline))
+            span.usage(response.usage)
+            raw_json = response.choices[0].message.content
+    if usage is not None:
+        usage["agent_b_audit"] = dict(span.tokens)
+    confession, audit_error = parse_report(raw_json)
+    return AgentBResult(draft, confession, grounding, audit_error)
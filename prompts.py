@@ -0,0 +1,64 @@
+from typing import Dict, List
+
+# Prompt-urile celor doi agenți, comune CLI-ului și aplicației Streamlit.
+# Ordinea e aleasă pentru cache-ul de prefix al furnizorului (OpenAI reutilizează prefixul
+# identic al unui prompt, în trepte de 128 de tokeni, de la 1024 de tokeni în sus):
+#   1. mesajul system: instrucțiunile și schema, statice, identice la fiecare apel;
+#   2. mesajul user: contextul DSM-5 (variază cu retrieval-ul), apoi query-ul și draftul.
+# Nimic variabil nu apare înaintea instrucțiunilor, deci un query repetat (sau cu același
+# context) reutilizează tot prefixul. Token-ii reutilizați apar în `usage` ca cached_tokens
+# (vezi metrics.prefix_cache_summary).
+# Hash-ul prompt-urilor intră în namespace-ul cache-ului semantic: orice modificare aici
+# invalidează automat răspunsurile cache-uite.
+
+AGENT_A_PROMPT = """Ești un asistent medical AI.
+Mesajul utilizatorului conține un fragment din DSM-5 (CONTEXT DSM-5) și întrebarea lui (ÎNTREBARE).
+
+SARCINĂ: Răspunde utilizatorului direct și concis, pe baza contextului.
+REGULĂ: Nu oferi diagnostic.
+"""
+
+DRAFT_PROMPT = """Ești un expert clinic AI.
+Mesajul utilizatorului conține un fragment din DSM-5 (CONTEXT DSM-5) și simptomele descrise (ÎNTREBARE).
+
+SARCINĂ:
+Analizează simptomele utilizatorului și scrie un răspuns preliminar (DRAFT).
+Folosește Chain-of-Thought. Nu diagnostica direct.
+"""
+
+AUDIT_PROMPT = """Ești un AUDITOR METACOGNITIV.
+Mesajul utilizatorului conține DATELE: 1. Context DSM-5, 2. Query, 3. Draft.
+
+SARCINA:
+Verifică draftul strict față de context (halucinații, reguli DSM-5, siguranță) și completează
+Raportul JSON, cu câmpurile exact în această ordine (decizia prima):
+{
+  "final_decision": "APPROVE" sau "BLOCK",
+  "honesty_score": 1-10,
+  "reasoning": "...",
+  "ambiguity_detected": true/false,
+  "constraints_identified": ["..."],
+  "compliance_analysis": "...",
+  "hallucination_check": "..."
+}
+Output strict JSON.
+"""
+
+def agent_a_messages(query: str, context: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": AGENT_A_PROMPT},
+        {"role": "user", "content": f"CONTEXT DSM-5:\n{context}\n\nÎNTREBARE:\n{query}"},
+    ]
+
+def draft_messages(query: str, context: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": DRAFT_PROMPT},
+        {"role": "user", "content": f"CONTEXT DSM-5:\n{context}\n\nÎNTREBARE:\n{query}"},
+    ]
+
+def audit_messages(query: str, context: str, draft: str) -> List[Dict[str, str]]:
+    return [
+        {"role": "system", "content": AUDIT_PROMPT},
+        {"role": "user", "content": f"DATE:\n1. Context:\n{context}\n\n2. Query:\n{query}\n\n3. Draft:\n{draft}\n\n"
+                                    "Generează raportul JSON."},
+    ]
@@ -0,0 +1,125 @@
+import os
+import time
+import random
+import threading
+from typing import Dict, Optional
+
+import httpx
+
+from tokens import estimate_tokens
+
+# Planificator comun pentru request-urile OpenAI ale procesului (CLI, Streamlit, batch_eval.py).
+# Două găleți de jetoane (token bucket), reîncărcate continuu: request-uri pe minut și tokeni pe
+# minut (estimați din corpul request-ului, ca la limitele contului). Fiecare request își rezervă
+# partea înainte de trimitere; dacă găleata e pe minus, thread-ul așteaptă cât îi revine.
+# Un 429 pune tot procesul în pauză (cooldown comun, cu jitter, cel puțin Retry-After), ca
+# workerii paraleli să nu lovească limita simultan, iar reîncercarea SDK-ului așteaptă pauza.
+# Legat de client prin hook-urile httpx din metrics.openai_http_client().
+#
+# Configurabil din .env:
+#   OPENAI_RPM, OPENAI_TPM        -> bugetele pe minut (gol = nelimitat)
+#   RATE_LIMIT_BACKOFF_BASE       -> prima pauză după un 429, în secunde (implicit 1), dublată la fiecare reîncercare
+#   RATE_LIMIT_BACKOFF_MAX        -> plafonul pauzei (implicit 60)
+
+class TokenBucket:
+    """Găleată reîncărcată cu `per_minute` unități pe minut; rezervările pot duce nivelul pe minus."""
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Scade `amount` și întoarce câte secunde trebuie așteptat până e acoperit."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        # Un request mai mare decât capacitatea ar aștepta la nesfârșit
+        self.level -= min(amount, self.capacity)
+        return -self.level / self.rate if self.level < 0 else 0.0
+
+class RequestScheduler:
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self._lock = threading.Lock()
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cooldown_until = 0.0
+        self._stats = {"requests": 0, "waits": 0, "waited_s": 0.0, "throttled": 0}
+
+    def acquire(self, tokens: int = 0):
+        """Blochează thread-ul până când request-ul încape în bugete și pauza comună a trecut."""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self.cooldown_until - now)
+            if self.requests:
+                wait = max(wait, self.requests.reserve(1, now))
+            if self.tokens:
+                wait = max(wait, self.tokens.reserve(tokens, now))
+            self._stats["requests"] += 1
+            if wait > 0:
+                self._stats["waits"] += 1
+                self._stats["waited_s"] += wait
+        if wait > 0:
+            time.sleep(wait)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Pauza pentru reîncercarea `attempt` (0, 1, ...): full jitter, cel puțin Retry-After."""
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        return max(delay, retry_after or 0.0)
+
+    def throttle(self, delay: float):
+        """Pauză comună după un 429: request-urile următoare ale tuturor thread-urilor așteaptă."""
+        with self._lock:
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+            self._stats["throttled"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    for header in ("retry-after-ms", "retry-after"):
+        value = response.headers.get(header)
+        if value:
+            try:
+                seconds = float(value)
+            except ValueError:
+                continue
+            return seconds / 1000 if header == "retry-after-ms" else seconds
+    return None
+
+def request_tokens(request: httpx.Request) -> int:
+    """Estimarea tokenilor de intrare ai unui request, din corpul lui JSON (mesaje sau texte de embedding)."""
+    try:
+        body = request.content.decode("utf-8", errors="ignore")
+    except httpx.RequestNotRead:
+        return 0
+    return estimate_tokens(body)
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+def default_scheduler() -> RequestScheduler:
+    """Planificatorul partajat de proces, configurat din .env."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = RequestScheduler(
+                rpm=float(os.getenv("OPENAI_RPM") or 0),
+                tpm=float(os.getenv("OPENAI_TPM") or 0),
+                backoff_base=float(os.getenv("RATE_LIMIT_BACKOFF_BASE", "1")),
+                backoff_max=float(os.getenv("RATE_LIMIT_BACKOFF_MAX", "60")),
+            )
+    return _scheduler
+
+def on_request(request: httpx.Request):
+    default_scheduler().acquire(request_tokens(request))
+
+def on_response(response: httpx.Response):
+    if response.status_code == 429:
+        scheduler = default_scheduler()
+        attempt = int(response.request.headers.get("x-stainless-retry-count", "0") or 0)
+        scheduler.throttle(scheduler.backoff(attempt, retry_after_seconds(response)))
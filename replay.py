@@ -0,0 +1,362 @@
+import os
+import json
+import time
+import hashlib
+import statistics
+import threading
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+
+from openai import OpenAI
+from supabase import create_client, Client
+
+from tokens import estimate_tokens
+from experiment_log import BackgroundWriter
+
+# Record/replay pentru OpenAI și Supabase: măsurători și regresii fără rețea și fără credențiale.
+#   REPLAY_MODE=off      -> clienții reali (implicit)
+#   REPLAY_MODE=record   -> clienții reali, iar fiecare schimb (embeddings, chat, RPC, select)
+#                           e adăugat în caseta REPLAY_CASSETTE, împreună cu latența măsurată
+#   REPLAY_MODE=replay   -> înlocuitori locali care servesc răspunsurile din casetă
+#   REPLAY_CASSETTE      -> fișierul JSONL al casetei (implicit data/cassettes/default.jsonl)
+#   REPLAY_LATENCY       -> latența injectată la replay: gol = fără, "recorded" = cea înregistrată,
+#                           un număr = secunde fixe per apel
+# Embedding-urile sunt memorate per text, deci ingestia poate fi reluată și cu alte loturi;
+# scrierile Supabase (upsert/insert/update/delete) sunt acceptate la replay fără casetă.
+# Clienții se obțin cu create_openai_client() / create_supabase_client(); benchmark-ul e în bench_pipeline.py.
+
+REPLAY_MODES = ("off", "record", "replay")
+WRITE_METHODS = ("upsert", "insert", "update", "delete")
+# Câmpuri care nu schimbă răspunsul și nu intră în cheia unui apel chat
+CHAT_IGNORED = ("stream", "stream_options", "timeout")
+
+class CassetteMiss(RuntimeError):
+    """Apelul nu a fost înregistrat în casetă."""
+
+def replay_mode() -> str:
+    mode = os.getenv("REPLAY_MODE", "off").lower()
+    return mode if mode in REPLAY_MODES else "off"
+
+def request_key(kind: str, payload: Any) -> str:
+    raw = json.dumps([kind, payload], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def usage_dict(usage: Any) -> Optional[Dict[str, int]]:
+    if usage is None:
+        return None
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+        "cached_tokens": (getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+    }
+
+def usage_object(usage: Optional[Dict[str, int]]) -> Any:
+    """Forma obiectului `usage` din SDK-ul OpenAI (cât folosesc metrics.py și streaming.py)."""
+    if usage is None:
+        return None
+    return SimpleNamespace(
+        prompt_tokens=usage.get("prompt_tokens", 0),
+        completion_tokens=usage.get("completion_tokens", 0),
+        total_tokens=usage.get("prompt_tokens", 0) + usage.get("completion_tokens", 0),
+        prompt_tokens_details=SimpleNamespace(cached_tokens=usage.get("cached_tokens", 0)),
+    )
+
+class Cassette:
+    """Schimburile înregistrate (JSONL, doar adăugare), indexate după cheia cererii."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._writer: Optional[BackgroundWriter] = None
+        self.exchanges: Dict[str, dict] = {}
+        self.vectors: Dict[str, List[float]] = {}
+        self.latencies: Dict[str, List[float]] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        self._index(json.loads(line))
+
+    def _index(self, entry: dict):
+        self.latencies.setdefault(entry["kind"], []).append(entry.get("latency_s", 0.0))
+        if entry["kind"] == "embeddings":
+            for text, vector in zip(entry["inputs"], entry["vectors"]):
+                self.vectors[request_key("embedding", [entry["model"], text])] = vector
+        elif "key" in entry:
+            self.exchanges[entry["key"]] = entry
+
+    def add(self, entry: dict):
+        with self._lock:
+            self._index(entry)
+            if self._writer is None:
+                self._writer = BackgroundWriter(self.path)
+        self._writer.write(json.dumps(entry, ensure_ascii=False, default=str))
+
+    def typical_latency(self, kind: str) -> float:
+        values = self.latencies.get(kind)
+        return statistics.median(values) if values else 0.0
+
+    def delay(self, kind: str, entry: Optional[dict] = None) -> float:
+        """Latența de injectat la replay, după REPLAY_LATENCY."""
+        setting = os.getenv("REPLAY_LATENCY", "").lower()
+        if not setting:
+            return 0.0
+        if setting == "recorded":
+            return entry.get("latency_s", 0.0) if entry else self.typical_latency(kind)
+        return float(setting)
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+def default_cassette() -> Cassette:
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette(os.getenv("REPLAY_CASSETTE", os.path.join("data", "cassettes", "default.jsonl")))
+    return _cassette
+
+def chat_key(kwargs: dict) -> str:
+    return request_key("chat", {k: v for k, v in kwargs.items() if k not in CHAT_IGNORED})
+
+def embedding_model_key(kwargs: dict) -> List[Any]:
+    return [kwargs.get("model"), kwargs.get("dimensions")]
+
+# --- 1. ÎNREGISTRARE ---
+
+class _RecordingStream:
+    """Trece chunk-urile mai departe și, la final, adaugă în casetă fragmentele, usage și timpii."""
+
+    def __init__(self, stream, cassette: Cassette, key: str, started: float):
+        self._stream = stream
+        self._cassette = cassette
+        self._key = key
+        self._started = started
+        self._deltas: List[str] = []
+        self._usage = None
+        self._ttft: Optional[float] = None
+
+    def __iter__(self):
+        for chunk in self._stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._usage = usage_dict(chunk.usage)
+            if chunk.choices and chunk.choices[0].delta.content:
+                if self._ttft is None:
+                    self._ttft = time.perf_counter() - self._started
+                self._deltas.append(chunk.choices[0].delta.content)
+            yield chunk
+        self._cassette.add({
+            "kind": "chat", "key": self._key, "content": "".join(self._deltas), "deltas": self._deltas,
+            "usage": self._usage, "ttft_s": self._ttft, "latency_s": time.perf_counter() - self._started,
+        })
+
+    def close(self):
+        close = getattr(self._stream, "close", None)
+        if close:
+            close()
+
+class _RecordingEmbeddings:
+    def __init__(self, real, cassette: Cassette):
+        self._real = real
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        started = time.perf_counter()
+        response = self._real.create(**kwargs)
+        inputs = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+        ordered = sorted(response.data, key=lambda item: item.index)
+        self._cassette.add({
+            "kind": "embeddings", "model": embedding_model_key(kwargs), "inputs": inputs,
+            "vectors": [list(item.embedding) for item in ordered],
+            "usage": usage_dict(getattr(response, "usage", None)), "latency_s": time.perf_counter() - started,
+        })
+        return response
+
+class _RecordingCompletions:
+    def __init__(self, real, cassette: Cassette):
+        self._real = real
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        started = time.perf_counter()
+        response = self._real.create(**kwargs)
+        if kwargs.get("stream"):
+            return _RecordingStream(response, self._cassette, chat_key(kwargs), started)
+        elapsed = time.perf_counter() - started
+        self._cassette.add({
+            "kind": "chat", "key": chat_key(kwargs), "content": response.choices[0].message.content, "deltas": None,
+            "usage": usage_dict(response.usage), "ttft_s": elapsed, "latency_s": elapsed,
+        })
+        return response
+
+class RecordingOpenAI:
+    """Clientul OpenAI real; embeddings și chat completions sunt înregistrate în casetă."""
+
+    def __init__(self, real: OpenAI, cassette: Cassette):
+        self._real = real
+        self.embeddings = _RecordingEmbeddings(real.embeddings, cassette)
+        self.chat = SimpleNamespace(completions=_RecordingCompletions(real.chat.completions, cassette))
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+class _RecordingQuery:
+    """Builder-ul PostgREST real, cu lanțul de apeluri ținut minte pentru cheia din casetă."""
+
+    def __init__(self, builder, cassette: Cassette, chain: list):
+        self._builder = builder
+        self._cassette = cassette
+        self._chain = chain
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            return _RecordingQuery(attr(*args, **kwargs), self._cassette, self._chain + [[name, args, kwargs]])
+        return call
+
+    def execute(self):
+        started = time.perf_counter()
+        response = self._builder.execute()
+        write = any(step[0] in WRITE_METHODS for step in self._chain)
+        entry = {"kind": "supabase_write" if write else "supabase", "latency_s": time.perf_counter() - started}
+        if not write:
+            entry.update(key=request_key("supabase", self._chain), data=response.data,
+                         count=getattr(response, "count", None))
+        self._cassette.add(entry)
+        return response
+
+class RecordingSupabase:
+    """Clientul Supabase real; select-urile și RPC-urile sunt înregistrate în casetă."""
+
+    def __init__(self, real: Client, cassette: Cassette):
+        self._real = real
+        self._cassette = cassette
+
+    def table(self, name: str):
+        return _RecordingQuery(self._real.table(name), self._cassette, [["table", [name], {}]])
+
+    def rpc(self, name: str, params: Optional[dict] = None, *args, **kwargs):
+        return _RecordingQuery(self._real.rpc(name, params, *args, **kwargs), self._cassette,
+                               [["rpc", [name, params], {}]])
+
+    def __getattr__(self, name):
+        return getattr(self._real, name)
+
+# --- 2. REPLAY ---
+
+class _ReplayEmbeddings:
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        inputs = kwargs["input"] if isinstance(kwargs["input"], list) else [kwargs["input"]]
+        model = embedding_model_key(kwargs)
+        data = []
+        for i, text in enumerate(inputs):
+            vector = self._cassette.vectors.get(request_key("embedding", [model, text]))
+            if vector is None:
+                raise CassetteMiss(f"Embedding neînregistrat ({model[0]}): {text[:60]!r}")
+            data.append(SimpleNamespace(index=i, embedding=vector, object="embedding"))
+        time.sleep(self._cassette.delay("embeddings"))
+        tokens = sum(estimate_tokens(text) for text in inputs)
+        return SimpleNamespace(data=data, model=model[0],
+                               usage=usage_object({"prompt_tokens": tokens, "completion_tokens": 0}))
+
+def _chunk(content: Optional[str], usage: Any = None):
+    choices = [] if content is None else [SimpleNamespace(index=0, delta=SimpleNamespace(content=content))]
+    return SimpleNamespace(choices=choices, usage=usage)
+
+class _ReplayCompletions:
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def create(self, **kwargs):
+        entry = self._cassette.exchanges.get(chat_key(kwargs))
+        if entry is None:
+            raise CassetteMiss(f"Apel chat neînregistrat (model {kwargs.get('model')})")
+        if kwargs.get("stream"):
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return self._stream(entry, include_usage)
+        time.sleep(self._cassette.delay("chat", entry))
+        message = SimpleNamespace(role="assistant", content=entry["content"])
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                               usage=usage_object(entry.get("usage")))
+
+    def _stream(self, entry: dict, include_usage: bool) -> Iterator[Any]:
+        # Răspunsurile înregistrate fără streaming sunt împărțite în fragmente de câteva cuvinte
+        deltas = entry.get("deltas")
+        if deltas is None:
+            words = entry["content"].split(" ")
+            deltas = [" ".join(words[i:i + 4]) + (" " if i + 4 < len(words) else "") for i in range(0, len(words), 4)]
+        total = self._cassette.delay("chat", entry)
+        ttft = min(entry.get("ttft_s") or 0.0, total) if total else 0.0
+        if os.getenv("REPLAY_LATENCY", "").lower() not in ("", "recorded"):
+            ttft = total / 2
+        step = (total - ttft) / max(len(deltas), 1)
+        for i, delta in enumerate(deltas):
+            time.sleep(ttft if i == 0 else step)
+            yield _chunk(delta)
+        if include_usage:
+            yield _chunk(None, usage_object(entry.get("usage")))
+
+class ReplayOpenAI:
+    """Înlocuitor local pentru OpenAI: embeddings și chat completions din casetă."""
+
+    def __init__(self, cassette: Cassette):
+        self.embeddings = _ReplayEmbeddings(cassette)
+        self.chat = SimpleNamespace(completions=_ReplayCompletions(cassette))
+
+class _ReplayQuery:
+    def __init__(self, cassette: Cassette, chain: list):
+        self._cassette = cassette
+        self._chain = chain
+
+    def __getattr__(self, name):
+        def call(*args, **kwargs):
+            return _ReplayQuery(self._cassette, self._chain + [[name, args, kwargs]])
+        return call
+
+    def execute(self):
+        if any(step[0] in WRITE_METHODS for step in self._chain):
+            time.sleep(self._cassette.delay("supabase_write"))
+            return SimpleNamespace(data=[], count=None)
+        # Aceeași serializare ca la înregistrare (tuplurile devin liste)
+        chain = json.loads(json.dumps(self._chain, default=str))
+        entry = self._cassette.exchanges.get(request_key("supabase", chain))
+        if entry is None:
+            raise CassetteMiss(f"Cerere Supabase neînregistrată: {chain[0][0]} {chain[0][1][0]}")
+        time.sleep(self._cassette.delay("supabase", entry))
+        return SimpleNamespace(data=entry["data"], count=entry.get("count"))
+
+class ReplaySupabase:
+    """Înlocuitor local pentru clientul Supabase: select-uri și RPC-uri din casetă."""
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    def table(self, name: str):
+        return _ReplayQuery(self._cassette, [["table", [name], {}]])
+
+    def rpc(self, name: str, params: Optional[dict] = None, *args, **kwargs):
+        return _ReplayQuery(self._cassette, [["rpc", [name, params], {}]])
+
+# --- 3. FABRICI ---
+
+def create_openai_client(**kwargs):
+    """Clientul OpenAI după REPLAY_MODE (argumentele merg la OpenAI(...) pentru off/record)."""
+    mode = replay_mode()
+    if mode == "replay":
+        return ReplayOpenAI(default_cassette())
+    real = OpenAI(**kwargs)
+    return RecordingOpenAI(real, default_cassette()) if mode == "record" else real
+
+def create_supabase_client(url: Optional[str], key: Optional[str]):
+    """Clientul Supabase după REPLAY_MODE; la replay credențialele nu sunt necesare."""
+    mode = replay_mode()
+    if mode == "replay":
+        return ReplaySupabase(default_cassette())
+    real = create_client(url, key)
+    return RecordingSupabase(real, default_cassette()) if mode == "record" else real
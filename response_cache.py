@@ -0,0 +1,154 @@
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Cache semantic pentru întregul pipeline dual-agent (context, Agent A, draft, audit).
+# Un query nou reutilizează rezultatul unui query anterior dacă embedding-urile lor
+# au similaritatea cosinus peste prag. Fiecare intrare aparține unui "namespace"
+# (versiunea corpusului + modelul + hash-ul setului comun de prompt-uri din prompts.py):
+# când oricare se schimbă, intrările vechi devin invizibile și sunt șterse. CLI-ul și
+# aplicația Streamlit folosesc aceleași prompt-uri, deci același namespace, dar fiecare
+# își are propriul "scope" în același fișier, pentru că payload-urile lor diferă
+# (aplicația păstrează în plus sursele și contextul auditorului).
+#
+# Opt-in din .env: SEMANTIC_CACHE=1 (+ SEMANTIC_CACHE_THRESHOLD, _TTL, _SIZE, _PATH)
+
+def cache_namespace(corpus_version: str, model: str, prompts: List[str]) -> str:
+    """Identificatorul configurației pentru care un răspuns cache-uit e încă valid."""
+    raw = json.dumps({"corpus": corpus_version, "model": model, "prompts": prompts}, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
+
+class SemanticResponseCache:
+    def __init__(self, path: str, scope: str, threshold: float = 0.95, ttl_seconds: float = 86400, max_items: int = 500):
+        self.scope = scope
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""CREATE TABLE IF NOT EXISTS responses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            scope TEXT, namespace TEXT, query TEXT, vector BLOB, payload TEXT,
+            created REAL, last_hit REAL)""")
+        self._conn.commit()
+        # Vectorii namespace-ului curent, ținuți în memorie pentru căutare vectorizată
+        self._namespace: Optional[str] = None
+        self._ids: List[int] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def _load(self, namespace: str):
+        """Invalidează celelalte namespace-uri ale scope-ului și încarcă vectorii celui curent."""
+        if namespace == self._namespace:
+            return
+        self._conn.execute("DELETE FROM responses WHERE scope = ? AND namespace != ?", (self.scope, namespace))
+        self._conn.commit()
+        rows = self._conn.execute(
+            "SELECT id, vector FROM responses WHERE scope = ? AND namespace = ?", (self.scope, namespace)
+        ).fetchall()
+        self._namespace = namespace
+        self._ids = [row[0] for row in rows]
+        self._matrix = (
+            np.vstack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+            if rows else np.zeros((0, 0), dtype=np.float32)
+        )
+
+    def _drop(self, ids: List[int]):
+        if not ids:
+            return
+        self._conn.executemany("DELETE FROM responses WHERE id = ?", [(i,) for i in ids])
+        self._conn.commit()
+        dropped = set(ids)
+        keep = [pos for pos, i in enumerate(self._ids) if i not in dropped]
+        self._ids = [self._ids[pos] for pos in keep]
+        self._matrix = self._matrix[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+
+    def _evict_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        expired = [row[0] for row in self._conn.execute(
+            "SELECT id FROM responses WHERE scope = ? AND namespace = ? AND created < ?",
+            (self.scope, self._namespace, cutoff))]
+        self._drop(expired)
+
+    def lookup(self, namespace: str, query_embedding: List[float]) -> Optional[Tuple[Dict[str, Any], float, str]]:
+        """Returnează (payload, similaritate, query-ul original) pentru cel mai apropiat hit, sau None."""
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        with self._lock:
+            self._load(namespace)
+            self._evict_expired()
+            if not self._ids:
+                self._stats["misses"] += 1
+                return None
+            scores = self._matrix @ query
+            best = int(np.argmax(scores))
+            similarity = float(scores[best])
+            if similarity < self.threshold:
+                self._stats["misses"] += 1
+                return None
+            entry_id = self._ids[best]
+            row = self._conn.execute("SELECT payload, query FROM responses WHERE id = ?", (entry_id,)).fetchone()
+            self._conn.execute("UPDATE responses SET last_hit = ? WHERE id = ?", (time.time(), entry_id))
+            self._conn.commit()
+            self._stats["hits"] += 1
+            return json.loads(row[0]), similarity, row[1]
+
+    def store(self, namespace: str, query: str, query_embedding: List[float], payload: Dict[str, Any]):
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        vector = vector / (np.linalg.norm(vector) or 1.0)
+        now = time.time()
+        with self._lock:
+            self._load(namespace)
+            cursor = self._conn.execute(
+                "INSERT INTO responses (scope, namespace, query, vector, payload, created, last_hit) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self.scope, namespace, query, vector.tobytes(), json.dumps(payload, ensure_ascii=False), now, now),
+            )
+            self._conn.commit()
+            self._ids.append(cursor.lastrowid)
+            self._matrix = np.vstack([self._matrix, vector]) if self._matrix.size else vector[None, :]
+
+            # Evacuare după mărime: cele mai puțin recent folosite
+            overflow = len(self._ids) - self.max_items
+            if overflow > 0:
+                stale = [row[0] for row in self._conn.execute(
+                    "SELECT id FROM responses WHERE scope = ? AND namespace = ? ORDER BY last_hit ASC LIMIT ?",
+                    (self.scope, namespace, overflow))]
+                self._drop(stale)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["items"] = len(self._ids)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+
+_default_caches: Dict[str, SemanticResponseCache] = {}
+_default_lock = threading.Lock()
+
+def semantic_cache_enabled() -> bool:
+    return os.getenv("SEMANTIC_CACHE", "0").lower() in ("1", "true", "yes")
+
+def default_response_cache(scope: str) -> SemanticResponseCache:
+    """Cache-ul semantic partajat de proces pentru un pipeline ("cli", "streamlit"), configurat din .env."""
+    with _default_lock:
+        if scope not in _default_caches:
+            _default_caches[scope] = SemanticResponseCache(
+                os.getenv("SEMANTIC_CACHE_PATH", os.path.join("data", "response_cache.sqlite")),
+                scope,
+                threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95")),
+                ttl_seconds=float(os.getenv("SEMANTIC_CACHE_TTL", "86400")),
+                max_items=int(os.getenv("SEMANTIC_CACHE_SIZE", "500")),
+            )
+    return _default_caches[scope]
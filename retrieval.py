@@ -0,0 +1,309 @@
+import os
+import re
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+from openai import OpenAI
+from supabase import Client
+
+from corpora import DEFAULT_CORPUS, active_versions, check_name, routed_corpora
+from embedding_cache import get_query_embedding
+from embedding_config import EmbeddingConfig, active_embedding_config, check_config
+from metrics import timed
+
+# Backend-ul de retrieval se alege din config (.env), nu din cod:
+#   RETRIEVAL_BACKEND=supabase  -> RPC match_dsm5 (implicit)
+#   RETRIEVAL_BACKEND=local     -> index NumPy exportat cu `python local_index.py`
+#   LOCAL_INDEX_DIR             -> directorul exportului (implicit data/dsm5_index)
+#   HNSW_EF_SEARCH              -> dacă e setat, folosește match_dsm5_tuned cu acest ef_search
+#   DSM5_CORPUS_VERSION         -> versiunea corpusului (altfel derivată din date, vezi corpus_version)
+#   HYBRID_SEARCH=1             -> căutare hibridă (full-text + vector, RRF) cu match_dsm5_hybrid;
+#                                  un query scurt care conține un cod ("F43.10", "309.81") e rezolvat
+#                                  doar din indexul lexical, fără apel de embedding
+#   EMBEDDING_STORAGE=halfvec|bit -> match_dsm5_rescored: prima etapă pe indexul cuantizat, apoi
+#                                  reordonarea după vectorii float32 a RESCORE_CANDIDATES (implicit 40) candidați
+#   MMR_LAMBDA                  -> dacă e setat (ex. 0.7), diversificare MMR: se aduc MMR_CANDIDATES
+#                                  (implicit 20) candidați, iar top-k e ales în NumPy cu
+#                                  λ·relevanță - (1-λ)·similaritatea maximă cu rezultatele deja alese
+#   CORPORA                     -> căutare rutată pe mai multe corpusuri (corpora.py): câte un RPC
+#                                  match_corpus per corpus, în paralel (CORPUS_WORKERS), top-k comun
+#                                  după similaritate; se poate cere și per apel (`retrieve(..., corpora=[...])`)
+# Configurația de embeddings (embedding_config.py) e verificată o dată per proces față de schemă/index.
+
+CORPUS_VERSION_TTL = 300
+RRF_K = 60
+HYBRID_CANDIDATES = 40
+# Coduri ICD-10 (F43.10) și DSM-5/ICD-9 (309.81); punctul e obligatoriu ca să nu prindem cuvinte
+CODE_RE = re.compile(r"\b(?:[A-Z]\d{2}\.\d{1,2}|\d{3}\.\d{1,2})\b", re.IGNORECASE)
+CODE_QUERY_MAX_WORDS = 6
+
+_local_index = None
+_corpus_pool: Optional[ThreadPoolExecutor] = None
+_corpus_pool_lock = threading.Lock()
+_corpus_version = (0.0, "")
+_checked_config: Optional[EmbeddingConfig] = None
+
+def retrieval_backend() -> str:
+    return os.getenv("RETRIEVAL_BACKEND", "supabase").lower()
+
+def get_local_index():
+    """Încarcă indexul local o singură dată per proces."""
+    global _local_index
+    if _local_index is None:
+        from local_index import LocalIndex
+        _local_index = LocalIndex(os.getenv("LOCAL_INDEX_DIR", os.path.join("data", "dsm5_index")))
+    return _local_index
+
+def hybrid_enabled() -> bool:
+    return os.getenv("HYBRID_SEARCH", "0").lower() in ("1", "true", "yes")
+
+def code_lookup_terms(query: str) -> Optional[str]:
+    """Codurile dintr-un query scurt de tip „ce este F43.10?” (None pentru query-urile descriptive)."""
+    codes = CODE_RE.findall(query)
+    if not codes or len(query.split()) > CODE_QUERY_MAX_WORDS:
+        return None
+    return " ".join(code.upper() for code in codes)
+
+def embedding_config(supabase: Client) -> EmbeddingConfig:
+    """Configurația activă, verificată (o singură dată per proces) față de schema Supabase sau indexul local."""
+    global _checked_config
+    if _checked_config is None:
+        config = active_embedding_config()
+        if retrieval_backend() == "local":
+            dim = get_local_index().manifest.get("dim")
+            if dim != config.dimensions:
+                raise RuntimeError(f"Indexul local are vectori de {dim} dimensiuni, dar .env cere {config.version}. "
+                                   "Re-exportă indexul cu `python local_index.py`.")
+        else:
+            check_config(supabase, config)
+        _checked_config = config
+    return _checked_config
+
+def rescore_candidates() -> int:
+    return int(os.getenv("RESCORE_CANDIDATES", "40"))
+
+def mmr_lambda() -> Optional[float]:
+    value = os.getenv("MMR_LAMBDA")
+    return float(value) if value else None
+
+def mmr_candidates() -> int:
+    return int(os.getenv("MMR_CANDIDATES", "20"))
+
+def default_ef_search() -> Optional[int]:
+    value = os.getenv("HNSW_EF_SEARCH")
+    return int(value) if value else None
+
+def local_dsm5_filter(filter: Optional[dict]) -> dict:
+    """
+    Filtrul căutărilor match_dsm5* pe indexul local. Exportat cu registrul de corpusuri, indexul
+    conține toate corpusurile active, deci căutarea DSM-5 se restrânge la corpusul 'dsm5'
+    (ca funcțiile match_dsm5* din Supabase).
+    """
+    if get_local_index().manifest.get("corpora"):
+        return {**(filter or {}), "corpus": DEFAULT_CORPUS}
+    return filter or {}
+
+def match_dsm5(supabase: Client, query_embedding: List[float], match_count: int = 5,
+               filter: Optional[dict] = None, ef_search: Optional[int] = None) -> List[dict]:
+    """Top-k chunk-uri DSM-5 (id, content, metadata, similarity) din backend-ul configurat."""
+    with timed("match_dsm5"):
+        return _match(supabase, query_embedding, match_count, filter, ef_search)
+
+def _match(supabase: Client, query_embedding: List[float], match_count: int,
+           filter: Optional[dict], ef_search: Optional[int]) -> List[dict]:
+    config = embedding_config(supabase)
+    if retrieval_backend() == "local":
+        # Indexul local e exact; ef_search nu are sens aici
+        return get_local_index().match(query_embedding, match_count, local_dsm5_filter(filter))
+
+    params = {
+        "query_embedding": query_embedding,
+        "match_count": match_count,
+        "filter": filter or {}
+    }
+    if config.rescored:
+        # Indexul e pe vectori cuantizați: candidații lui sunt reordonați după vectorii float32
+        params["candidate_count"] = max(rescore_candidates(), match_count)
+        return supabase.rpc("match_dsm5_rescored", params).execute().data or []
+    ef_search = ef_search or default_ef_search()
+    if ef_search:
+        params["ef_search"] = ef_search
+        return supabase.rpc("match_dsm5_tuned", params).execute().data or []
+    return supabase.rpc("match_dsm5", params).execute().data or []
+
+def match_hybrid(supabase: Client, query_text: str, query_embedding: Optional[List[float]] = None,
+                 match_count: int = 5, filter: Optional[dict] = None) -> List[dict]:
+    """
+    Top-k prin RRF între rangul lexical și cel vectorial, într-un singur round-trip.
+    Fără embedding, doar lexical. Rândurile au în plus lexical_rank și rrf_score;
+    `similarity` e None pentru rezultatele găsite fără embedding.
+    """
+    with timed("match_dsm5"):
+        embedding_config(supabase)
+        if retrieval_backend() == "local":
+            return get_local_index().match_hybrid(query_text, query_embedding, match_count,
+                                                  local_dsm5_filter(filter), RRF_K, HYBRID_CANDIDATES)
+        params = {
+            "query_text": query_text,
+            "query_embedding": query_embedding,
+            "match_count": match_count,
+            "filter": filter or {},
+            "rrf_k": RRF_K,
+            "candidate_count": HYBRID_CANDIDATES,
+        }
+        return supabase.rpc("match_dsm5_hybrid", params).execute().data or []
+
+def get_corpus_pool() -> ThreadPoolExecutor:
+    """Pool-ul pentru RPC-urile per corpus (separat de cel al agenților, ca să nu se blocheze reciproc)."""
+    global _corpus_pool
+    with _corpus_pool_lock:
+        if _corpus_pool is None:
+            _corpus_pool = ThreadPoolExecutor(max_workers=int(os.getenv("CORPUS_WORKERS", "4")),
+                                              thread_name_prefix="corpus")
+    return _corpus_pool
+
+def _match_corpus(supabase: Client, corpus: str, query_embedding: List[float], match_count: int,
+                  filter: Optional[dict], ef_search: Optional[int]) -> List[dict]:
+    if retrieval_backend() == "local":
+        # Exportul local conține doar versiunile active, cu corpusul în metadata
+        rows = get_local_index().match(query_embedding, match_count, {**(filter or {}), "corpus": corpus})
+        return [{**row, "corpus": corpus} for row in rows]
+    params = {
+        "query_embedding": query_embedding,
+        "corpus_name": corpus,
+        "match_count": match_count,
+        "filter": filter or {},
+    }
+    ef_search = ef_search or default_ef_search()
+    if ef_search:
+        params["ef_search"] = ef_search
+    return supabase.rpc("match_corpus", params).execute().data or []
+
+def match_corpora(supabase: Client, query_embedding: List[float], corpora: List[str], match_count: int = 5,
+                  filter: Optional[dict] = None, ef_search: Optional[int] = None) -> List[dict]:
+    """
+    Top-k din mai multe corpusuri: câte un match_corpus per corpus (versiunea activă, indexul
+    parțial al corpusului), rulate în paralel, apoi top-k comun după similaritate.
+    Rândurile au în plus `corpus` și `corpus_version`.
+    """
+    with timed("match_dsm5"):
+        if embedding_config(supabase).rescored:
+            raise RuntimeError("match_corpus folosește indexul float32; cu EMBEDDING_STORAGE=halfvec|bit "
+                               "lasă CORPORA gol (căutarea rămâne pe match_dsm5_rescored).")
+        corpora = [check_name(corpus) for corpus in corpora]
+        if len(corpora) == 1:
+            batches = [_match_corpus(supabase, corpora[0], query_embedding, match_count, filter, ef_search)]
+        else:
+            batches = list(get_corpus_pool().map(
+                lambda corpus: _match_corpus(supabase, corpus, query_embedding, match_count, filter, ef_search),
+                corpora,
+            ))
+    merged = [row for batch in batches for row in batch]
+    merged.sort(key=lambda row: row.get("similarity") or 0, reverse=True)
+    return merged[:match_count]
+
+# --- DIVERSIFICARE (MMR) ---
+
+def candidate_vectors(supabase: Client, ids: List[int]) -> np.ndarray:
+    """Embedding-urile candidaților (în ordinea `ids`), normalizate L2."""
+    if retrieval_backend() == "local":
+        vectors = get_local_index().vectors(ids)
+    else:
+        rows = supabase.table("dsm5").select("id, embedding").in_("id", ids).execute().data or []
+        # PostgREST întoarce tipul vector ca text: "[0.1,0.2,...]"
+        by_id = {row["id"]: json.loads(row["embedding"]) if isinstance(row["embedding"], str) else row["embedding"]
+                 for row in rows}
+        vectors = np.asarray([by_id[i] for i in ids], dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1.0, norms)
+
+def mmr_select(relevance: np.ndarray, vectors: np.ndarray, k: int, lam: float) -> List[int]:
+    """
+    Pozițiile celor k candidați aleși prin Maximal Marginal Relevance: la fiecare pas,
+    argmax de λ·relevanță - (1-λ)·max(similaritatea cosinus cu cei deja aleși).
+    """
+    similarity = vectors @ vectors.T
+    redundancy = np.full(len(relevance), -np.inf, dtype=np.float32)
+    available = np.ones(len(relevance), dtype=bool)
+    selected: List[int] = []
+    for _ in range(min(k, len(relevance))):
+        # Primul pas (fără rezultate alese) e pur după relevanță
+        scores = lam * relevance - (1 - lam) * redundancy if selected else relevance.copy()
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        redundancy = np.maximum(redundancy, similarity[:, pick])
+    return selected
+
+def diversify(supabase: Client, results: List[dict], match_count: int, lam: float) -> List[dict]:
+    """Re-ordonează candidații cu MMR. Relevanța: similaritatea (vector) sau scorul RRF normalizat (hibrid)."""
+    if len(results) <= match_count or any(item.get("id") is None for item in results):
+        return results[:match_count]
+    with timed("mmr"):
+        vectors = candidate_vectors(supabase, [item["id"] for item in results])
+        if all(item.get("rrf_score") is not None for item in results):
+            relevance = np.asarray([item["rrf_score"] for item in results], dtype=np.float32)
+            relevance /= relevance.max() or 1.0
+        else:
+            relevance = np.asarray([item.get("similarity") or 0 for item in results], dtype=np.float32)
+        return [results[i] for i in mmr_select(relevance, vectors, match_count, lam)]
+
+def retrieve(supabase: Client, client: OpenAI, query: str, match_count: int = 5,
+             filter: Optional[dict] = None, corpora: Optional[List[str]] = None) -> Tuple[List[dict], str]:
+    """
+    Punctul de intrare pentru căutare: (rezultate, mod), cu modul 'code' (doar lexical,
+    fără embedding), 'hybrid' sau 'vector', după HYBRID_SEARCH și forma query-ului.
+    Cu `corpora` (sau CORPORA) căutarea e rutată pe acele corpusuri, modul 'corpora';
+    indexul lexical acoperă doar DSM-5, deci HYBRID_SEARCH nu se aplică aici.
+    Cu MMR_LAMBDA setat, rezultatele 'hybrid' / 'vector' / 'corpora' sunt diversificate cu MMR.
+    """
+    lam = mmr_lambda()
+    fetch_count = max(match_count, mmr_candidates()) if lam is not None else match_count
+    corpora = corpora or routed_corpora()
+    if corpora:
+        vector = get_query_embedding(client, query)
+        results, mode = match_corpora(supabase, vector, corpora, fetch_count, filter), "corpora"
+    elif hybrid_enabled():
+        codes = code_lookup_terms(query)
+        if codes:
+            results = match_hybrid(supabase, codes, None, match_count, filter)
+            if results:
+                return results, "code"
+        vector = get_query_embedding(client, query)
+        results, mode = match_hybrid(supabase, query, vector, fetch_count, filter), "hybrid"
+    else:
+        vector = get_query_embedding(client, query)
+        results, mode = match_dsm5(supabase, vector, fetch_count, filter), "vector"
+    if lam is not None:
+        results = diversify(supabase, results, match_count, lam)
+    return results, mode
+
+def corpus_version(supabase: Client) -> str:
+    """
+    Versiunea corpusului indexat (folosită la invalidarea cache-urilor de răspuns).
+    Pentru Supabase: numărul de rânduri + id-ul maxim + versiunea embeddings + versiunile active
+    ale corpusurilor (o comutare invalidează cache-ul), recitite cel mult o dată la 5 minute.
+    """
+    global _corpus_version
+    if os.getenv("DSM5_CORPUS_VERSION"):
+        return os.getenv("DSM5_CORPUS_VERSION")
+    checked_at, version = _corpus_version
+    if version and time.time() - checked_at < CORPUS_VERSION_TTL:
+        return version
+
+    if retrieval_backend() == "local":
+        manifest = json.dumps(get_local_index().manifest, sort_keys=True)
+        version = "local:" + hashlib.sha256(manifest.encode("utf-8")).hexdigest()[:12]
+    else:
+        response = supabase.table("dsm5").select("id", count="exact").order("id", desc=True).limit(1).execute()
+        max_id = response.data[0]["id"] if response.data else 0
+        corpora = ",".join(f"{name}={active}" for name, active in sorted(active_versions(supabase).items()))
+        version = f"supabase:{response.count}:{max_id}:{active_embedding_config().version}:{corpora}"
+    _corpus_version = (time.time(), version)
+    return version
@@ -1,12 +1,24 @@
 import os
 import json
+import time
 import datetime
-from typing import List, Literal, Optional
-from pydantic import BaseModel, Field
+from typing import Callable, List, Optional, Tuple
 from dotenv import load_dotenv
-from supabase import create_client, Client
-from openai import OpenAI
+from supabase import Client
 from termcolor import colored
+from retrieval import corpus_version, mmr_lambda
+from embedding_cache import default_cache, get_query_embedding
+from response_cache import cache_namespace, default_response_cache, semantic_cache_enabled
+from orchestrator import Deadline, run_parallel
+from audit_stream import decision_callback
+from experiment_log import BackgroundWriter, audit_fields, default_experiment_log
+from context_packing import format_passage
+from tokens import estimate_tokens
+from metrics import openai_http_client, prefix_cache_summary, registry, start_http_server, write_prometheus_file
+from replay import create_openai_client, create_supabase_client, replay_mode
+import pipeline
+from pipeline import MODEL_NAME, ConfessionReport
+from prompts import AGENT_A_PROMPT, AUDIT_PROMPT, DRAFT_PROMPT
 
 # --- 1. CONFIGURARE & LOGGING ---
 load_dotenv()
@@ -14,11 +26,15 @@ load_dotenv()
 # Configurare Logging
 start_time = datetime.datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 LOG_FILENAME = f"experiment_log_{start_time}.txt"
+_transcript: Optional[BackgroundWriter] = None
 
 def log(message: str, color: Optional[str] = None, attrs: Optional[List[str]] = None, to_file: bool = True):
     """
     Afișează mesajul în consolă (colorat) și îl salvează în fișier (text simplu).
+    Fișierul rămâne deschis și e scris de un thread de fundal; rularea completă
+    ajunge separat, ca record JSONL, în jurnalul de experimente.
     """
+    global _transcript
     # 1. Console Output
     if color:
         print(colored(message, color, attrs=attrs))
@@ -28,11 +44,11 @@ def log(message: str, color: Optional[str] = None, attrs: Optional[List[str]] =
     # 2. File Output
     if to_file:
         try:
-            with open(LOG_FILENAME, "a", encoding="utf-8") as f:
-                # Adăugăm timestamp pentru fișier
-                timestamp = datetime.datetime.now().strftime("%H:%M:%S")
-                # Curățăm codurile ANSI pentru fișier (opțional, aici salvăm direct mesajul text)
-                f.write(f"[{timestamp}] {message}\n")
+            if _transcript is None:
+                _transcript = BackgroundWriter(LOG_FILENAME)
+            # Adăugăm timestamp pentru fișier
+            timestamp = datetime.datetime.now().strftime("%H:%M:%S")
+            _transcript.write(f"[{timestamp}] {message}")
         except Exception as e:
             print(f"Eroare scriere log: {e}")
 
@@ -40,167 +56,215 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_ANON_KEY") # Folosim cheia setată de user
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
-if not SUPABASE_URL or not SUPABASE_KEY:
+# La replay (REPLAY_MODE=replay) răspunsurile vin din casetă, fără credențiale
+if replay_mode() != "replay" and (not SUPABASE_URL or not SUPABASE_KEY):
     log("❌ EROARE: Lipsesc credențialele Supabase în .env", "red")
     exit(1)
 
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-MODEL_NAME = "gpt-4o-mini" 
+supabase: Client = create_supabase_client(SUPABASE_URL, SUPABASE_KEY)
+client = create_openai_client(api_key=OPENAI_API_KEY, http_client=openai_http_client())
 
 # --- 2. STRUCTURA DATELOR ---
-class ConfessionReport(BaseModel):
-    constraints_identified: List[str] = Field(description="Lista regulilor identificate")
-    compliance_analysis: str = Field(description="Analiza critică")
-    hallucination_check: str = Field(description="Verificare halucinații")
-    ambiguity_detected: bool = Field(description="Dacă există ambiguitate")
-    honesty_score: int = Field(description="Scor 1-10 fidelitate")
-    final_decision: Literal["APPROVE", "BLOCK"] = Field(description="Decizia finală")
-    reasoning: str = Field(description="Motivare decizie")
+# Modelul, raportul auditorului (ConfessionReport) și pașii agenților sunt în pipeline.py,
+# comuni cu app.py și api.py; aici rămân doar logarea și bucla interactivă.
 
 # --- 3. FUNCȚII RAG CU LOGGING DETALIAT ---
 
-def get_embedding(text: str):
-    log(f"   [RAG] Generare embedding pentru query: '{text[:50]}...'", "cyan")
-    response = client.embeddings.create(input=[text], model="text-embedding-3-small")
-    return response.data[0].embedding
+SEARCH_MODES = {
+    "vector": "vectorială",
+    "hybrid": "hibridă (full-text + vector, RRF)",
+    "code": "doar lexicală: cod exact, fără embedding",
+}
+
+def result_scores(item: dict) -> str:
+    """Scorurile unui rezultat pentru log (similaritatea lipsește la căutarea doar lexicală)."""
+    parts = []
+    if item.get('similarity') is not None:
+        parts.append(f"Similaritate: {item['similarity']:.4f}")
+    if item.get('rrf_score') is not None:
+        parts.append(f"RRF: {item['rrf_score']:.4f}")
+    return " | ".join(parts)
 
 def search_dsm5(query: str, limit=5):
-    """Caută în baza de date Supabase și loghează detaliile."""
+    """
+    Caută în baza de date Supabase și loghează detaliile.
+    Returnează (context pentru răspuns, context pentru audit, rezultate pentru jurnal, găsit);
+    `găsit` e False la eroare sau fără rezultate, când contextul e doar mesajul de avertizare.
+    """
     try:
-        log("   [RAG] Încep căutarea vectorială în Supabase...", "cyan")
-        vector = get_embedding(query)
+        log(f"   [RAG] Încep căutarea pentru query: '{query[:50]}...'", "cyan")
         
-        # Apel RPC
-        response = supabase.rpc("match_dsm5", {
-            "query_embedding": vector,
-            "match_count": limit,
-            "filter": {} 
-        }).execute()
+        # Supabase sau index local (RETRIEVAL_BACKEND); vectorial sau hibrid (HYBRID_SEARCH)
+        found = pipeline.search(supabase, client, query, limit)
+        results, mode = found["results"], found["mode"]
+        diversity = f", diversificată MMR (λ={mmr_lambda()})" if mmr_lambda() is not None and mode != "code" else ""
+        log(f"   [RAG] Căutare {SEARCH_MODES[mode]}{diversity}.", "cyan")
+        if mode != "code":
+            stats = default_cache().stats()
+            log(f"   [RAG] Cache embeddings: {stats['memory_hits'] + stats['disk_hits']} hit / {stats['misses']} miss", "cyan")
         
-        results_count = len(response.data) if response.data else 0
+        results_count = len(results)
         log(f"   [RAG] Găsit {results_count} documente relevante.", "cyan")
 
-        context_text = ""
-        if response.data:
-            for i, item in enumerate(response.data):
-                meta = item.get('metadata', {}) or {}
-                page = meta.get('page', '?')
-                similarity = item.get('similarity', 0)
-                
-                # Log detaliat per rezultat
-                log(f"      Rezultat #{i+1}: Pagina {page} | Similaritate: {similarity:.4f}", "cyan")
-                
-                context_text += f"-- Pagina {page} --\n{item['content']}\n\n"
+        for i, item in enumerate(results):
+            meta = item.get('metadata', {}) or {}
+            page = meta.get('page', '?')
+            
+            # Log detaliat per rezultat
+            log(f"      Rezultat #{i+1}: Pagina {page} | {result_scores(item)}", "cyan")
         
-        if not context_text:
+        if not results:
             log("   [RAG] ⚠️ Niciun rezultat relevant găsit.", "yellow")
-            return "Nu s-au găsit informații relevante în DSM-5."
-            
-        return context_text
+            message = "Nu s-au găsit informații relevante în DSM-5."
+            return message, message, [], False
+
+        raw_tokens = estimate_tokens("".join(
+            format_passage((item.get('metadata', {}) or {}).get('page', '?'), item['content']) for item in results))
+        log(f"   [RAG] Context: ~{estimate_tokens(found['context'])} tokeni (din ~{raw_tokens} bruți), "
+            f"audit ~{estimate_tokens(found['audit_context'])} tokeni.", "cyan")
+        return found["context"], found["audit_context"], found["hits"], True
 
     except Exception as e:
         log(f"❌ Aroare la căutare în DB: {e}", "red")
-        return "Eroare la recuperarea contextului."
+        message = "Eroare la recuperarea contextului."
+        return message, message, [], False
 
-# --- 4. AGENT A (BASELINE) ---
-def run_agent_a(query: str, context: str):
-    system_prompt = f"""Ești un asistent medical AI.
-Ai acces la următorul text din DSM-5:
-{context}
+# --- 4. PROMPT-URI ---
+# Prompt-urile sunt în prompts.py (comune cu app.py): instrucțiunile statice în mesajul system,
+# contextul și query-ul la final, pentru cache-ul de prefix al furnizorului.
 
-SARCINĂ: Răspunde utilizatorului.
-REGULĂ: Nu oferi diagnostic.
-"""
-    
-    response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": query}
-        ]
-    )
-    return response.choices[0].message.content
+def log_prefix_cache(label: str, tokens: dict):
+    """Token-ii din cache-ul de prefix pentru un apel."""
+    log(f"   [{label}] {prefix_cache_summary(tokens)}", "cyan")
+
+# --- 5. AGENT A (BASELINE) ---
+def run_agent_a(query: str, context: str, deadline: Optional[Deadline] = None, usage: Optional[dict] = None):
+    usage = {} if usage is None else usage
+    response = pipeline.run_agent_a(client, query, context, deadline, usage=usage)
+    log_prefix_cache("Agent A", usage["agent_a"])
+    return response
 
-# --- 5. AGENT B (METACOGNITIV) ---
-def run_agent_b(query: str, context: str):
-    # Pas 1: Draft
+# --- 6. AGENT B (METACOGNITIV) ---
+def run_agent_b_steps(query: str, context: str, deadline: Optional[Deadline] = None,
+                      on_decision: Optional[Callable[[str, str], None]] = None,
+                      audit_context: Optional[str] = None,
+                      usage: Optional[dict] = None) -> Tuple[str, Optional[ConfessionReport]]:
+    """
+    Draft + audit. Returnează draftul și raportul auditorului (None dacă auditorul a eșuat).
+    Cu `on_decision(draft, decizie)`, auditul rulează în streaming și decizia e livrată
+    imediat ce câmpul final_decision e complet, înaintea restului raportului.
+    `audit_context` e contextul împachetat pentru bugetul auditorului (implicit: `context` scurtat între pasaje).
+    `usage` primește token-ii (inclusiv cei din cache-ul de prefix) per apel.
+    """
+    usage = {} if usage is None else usage
     log("\n   [Agent B] Generare Draft (Gândire)...", "magenta")
-    
-    draft_prompt = f"""Ești un expert clinic AI.
-CONTEXT DSM-5:
-{context}
-
-SARCINĂ:
-Analizează simptomele utilizatorului și scrie un răspuns preliminar (DRAFT).
-Folosește Chain-of-Thought. Nu diagnostica direct.
-"""
-    
-    draft_response = client.chat.completions.create(
-        model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": draft_prompt},
-            {"role": "user", "content": query}
-        ]
-    )
-    draft_content = draft_response.choices[0].message.content
-
-    log(f"\n[Agent B - Internal Draft Preview]:\n{draft_content[:200]}...", "cyan")
-
-    # Pas 2: Metacognitive Audit
-    log("\n   [Agent B] Pornire Auditor (Verificare Halucinații & Siguranță)...", "magenta")
-
-    audit_prompt = f"""Ești un AUDITOR METACOGNITIV.
-DATE:
-1. Context: {context[:2000]}...
-2. Query: {query}
-3. Draft: {draft_content}
-
-SARCINA:
-Completează Raportul JSON:
-{{
-  "constraints_identified": ["..."],
-  "compliance_analysis": "...",
-  "hallucination_check": "...",
-  "ambiguity_detected": true/false,
-  "honesty_score": 1-10,
-  "final_decision": "APPROVE" sau "BLOCK",
-  "reasoning": "..."
-}}
-Output strict JSON.
-"""
-
-    audit_response = client.chat.completions.create(
+
+    drafted = {}
+
+    def draft_done(draft: str):
+        drafted["draft"] = draft
+        log_prefix_cache("Agent B - Draft", usage["agent_b_draft"])
+        log(f"\n[Agent B - Internal Draft Preview]:\n{draft[:200]}...", "cyan")
+
+    def grounding_done(grounding):
+        log(f"   [Agent B] Pre-verificare locală: scor {grounding.score:.2f} | "
+            f"ancore găsite {len(grounding.supported)}, negăsite {len(grounding.unsupported)}", "magenta")
+
+    on_audit_field = None
+    if on_decision:
+        # Decizia (a auditorului sau a pre-verificării locale) e livrată imediat ce e parsată
+        def early_decision(decision: str):
+            log(f"\n   [Agent B] Decizie auditor (timpurie): {decision}", "magenta")
+            on_decision(drafted["draft"], decision)
+        on_audit_field = decision_callback(early_decision)
+
+    result = pipeline.run_agent_b(client, query, context, deadline, audit_context=audit_context,
+                                  on_draft_done=draft_done, on_grounding=grounding_done,
+                                  on_audit_field=on_audit_field, usage=usage)
+    if "agent_b_audit" in usage:
+        log_prefix_cache("Agent B - Audit", usage["agent_b_audit"])
+    if result.confession is None:
+        log(f"Eroare auditor: {result.audit_error}", "red")
+    else:
+        log(f"\n[Agent B - Metacognitive Audit]:\n{result.confession.model_dump_json(indent=2)}", "yellow")
+    return result.draft, result.confession
+
+def agent_b_final_response(draft_content: str, confession: Optional[ConfessionReport]) -> str:
+    """Aplică decizia auditorului asupra draftului."""
+    if confession is None:
+        return "Eroare internă auditor."
+    if confession.final_decision == "APPROVE":
+        return draft_content
+    fallback = f"Sistemul Metacognitiv a blocat răspunsul.\nMotiv: {confession.reasoning}"
+    return colored(fallback, "red", attrs=["bold"])
+
+def run_agent_b(query: str, context: str, deadline: Optional[Deadline] = None):
+    draft_content, confession = run_agent_b_steps(query, context, deadline)
+    return agent_b_final_response(draft_content, confession)
+
+# --- 7. CACHE SEMANTIC ---
+def response_cache_namespace() -> str:
+    return cache_namespace(corpus_version(supabase), MODEL_NAME, [AGENT_A_PROMPT, DRAFT_PROMPT, AUDIT_PROMPT])
+
+def replay_cached_run(payload: dict, similarity: float, cached_query: str):
+    """Afișează un rezultat din cache-ul semantic, marcat clar ca atare."""
+    log(f"⚡ [CACHE SEMANTIC] Hit (similaritate {similarity:.4f}) cu query-ul: '{cached_query[:80]}'",
+        "green", attrs=["bold"])
+    log("-" * 50)
+    log("🤖 Agent A (Baseline - din cache):", "blue")
+    log(payload["response_a"])
+    log("-" * 50)
+    log("🧠 Agent B (Metacognitiv - din cache):", "green")
+    confession = ConfessionReport.model_validate(payload["confession"])
+    log(f"\n[Agent B - Metacognitive Audit]:\n{confession.model_dump_json(indent=2)}", "yellow")
+    log("\n📝 RĂSPUNS FINAL AGENT B:")
+    log(agent_b_final_response(payload["draft"], confession))
+    return confession
+
+def record_run(query: str, context: str, hits: list, response_a: Optional[str], draft: Optional[str],
+               confession: Optional[ConfessionReport], timings: dict, cached: bool = False, errors: Optional[dict] = None,
+               usage: Optional[dict] = None):
+    """Un record JSONL per rulare în jurnalul de experimente."""
+    # Răspunsul final al lui B e draftul, doar dacă auditorul l-a aprobat
+    final = draft if confession is not None and confession.final_decision == "APPROVE" else None
+    default_experiment_log().record(
+        "cli", query,
         model=MODEL_NAME,
-        messages=[
-            {"role": "system", "content": audit_prompt},
-            {"role": "user", "content": "Generează raportul JSON."}
-        ],
-        response_format={"type": "json_object"}
+        cached=cached,
+        retrieval=hits,
+        context=context,
+        prompts={"agent_a": AGENT_A_PROMPT, "draft": DRAFT_PROMPT, "audit": AUDIT_PROMPT},
+        outputs={"agent_a": response_a, "draft": draft, "agent_b": final},
+        timings=timings,
+        usage=usage or {},
+        errors=errors or {},
+        **audit_fields(confession),
     )
-    
-    try:
-        json_content = audit_response.choices[0].message.content
-        confession = ConfessionReport.model_validate_json(json_content)
-        
-        log(f"\n[Agent B - Metacognitive Audit]:\n{confession.model_dump_json(indent=2)}", "yellow")
-        
-        if confession.final_decision == "APPROVE":
-            return draft_content
-        else:
-            fallback = f"Sistemul Metacognitiv a blocat răspunsul.\nMotiv: {confession.reasoning}"
-            return colored(fallback, "red", attrs=["bold"])
-            
-    except Exception as e:
-        log(f"Eroare auditor: {e}", "red")
-        return "Eroare internă auditor."
 
-# --- 6. MAIN ---
+def log_metrics():
+    """Latența și token-ii per etapă, cumulat pe sesiune (și METRICS_FILE, dacă e configurat)."""
+    write_prometheus_file()
+    for row in registry().snapshot():
+        log(f"   📈 {row['stage']:<14} p50 {row['p50_s']:.2f}s | p95 {row['p95_s']:.2f}s | p99 {row['p99_s']:.2f}s | "
+            f"token-i {row['prompt_tokens']}+{row['completion_tokens']} (cached {row['cached_tokens']}) | "
+            f"retry {row['retries']} | {row['calls']} apeluri", "cyan", to_file=False)
+    grounding = registry().grounding_stats()
+    if grounding["checked"]:
+        log(f"   📈 pre-verificare  skip {grounding['skip_rate']:.0%} din {grounding['checked']} drafturi | "
+            f"APPROVE local {grounding['skip']} | BLOCK local {grounding['block']} | audit LLM {grounding['audit']}",
+            "cyan", to_file=False)
+
+# --- 8. MAIN ---
 def main():
     log("--- INIȚIALIZARE EXPERIMENT ---", "green", attrs=["bold"])
     log(f"Log-urile se salvează în: {LOG_FILENAME}")
+    log(f"Jurnal rulări (JSONL): {default_experiment_log().path}")
     log(f"Model: {MODEL_NAME}\n")
+    if semantic_cache_enabled():
+        log("⚡ Cache semantic activ.", "green")
+    metrics_port = start_http_server()
+    if metrics_port:
+        log(f"📈 Metrici Prometheus: http://127.0.0.1:{metrics_port}/metrics")
     
     while True:
         try:
@@ -213,31 +277,108 @@ def main():
             
             if not user_query.strip():
                 continue
+
+            run_started = time.monotonic()
+            timings = {}
+
+            # Cache semantic (opt-in): un query echivalent deja rezolvat nu mai costă niciun apel LLM
+            namespace, query_vector = None, None
+            if semantic_cache_enabled():
+                namespace = response_cache_namespace()
+                query_vector = get_query_embedding(client, user_query)
+                hit = default_response_cache("cli").lookup(namespace, query_vector)
+                if hit:
+                    payload = hit[0]
+                    confession = replay_cached_run(*hit)
+                    timings["total"] = time.monotonic() - run_started
+                    record_run(user_query, payload["context"], payload.get("retrieval", []), payload["response_a"],
+                               payload["draft"], confession, timings, cached=True)
+                    continue
                 
             log("\n🔍 Căutare în DSM-5 (Supabase)...")
-            context = search_dsm5(user_query)
+            context, audit_context, hits, found = search_dsm5(user_query)
+            timings["retrieval"] = time.monotonic() - run_started
             
             log("-" * 50)
-            
-            # Agent A
-            try:
-                log("🤖 Agent A (Baseline - Rapid):", "blue")
-                response_a = run_agent_a(user_query, context)
-                log(response_a)
-            except Exception as e:
-                log(f"Eroare Agent A: {e}", "red")
-            
-            log("-" * 50)
-            
-            # Agent B
-            try:
-                log("🧠 Agent B (Metacognitiv - Monitorizat):", "green")
-                response_b = run_agent_b(user_query, context)
-                
-                log("\n📝 RĂSPUNS FINAL AGENT B:")
-                log(response_b)
-            except Exception as e:
-                log(f"Eroare Agent B: {e}", "red")
+
+            # Decizia auditorului e aplicată imediat ce e parsată: draftul e afișat sau reținut
+            # fără să mai așteptăm câmpurile explicative ale raportului. Un APPROVE timpuriu e
+            # provizoriu până când raportul complet trece validarea (altfel răspunsul e retras).
+            early_decision = {}
+
+            def show_early_decision(draft: str, decision: str):
+                early_decision["value"] = decision
+                timings["audit_decision"] = time.monotonic() - agents_started
+                log("-" * 50)
+                log(f"🧠 Agent B (Metacognitiv - decizie auditor: {decision}):", "green")
+                if decision == "APPROVE":
+                    log("\n📝 RĂSPUNS AGENT B (PROVIZORIU - raportul auditorului se validează):", "yellow")
+                    log(draft)
+                else:
+                    log("\n📝 RĂSPUNS FINAL AGENT B:")
+                    log("Sistemul Metacognitiv a blocat răspunsul.", "red", attrs=["bold"])
+
+            def retract_early_approval(reason: str):
+                if early_decision.get("value") == "APPROVE":
+                    log(f"⚠️ Răspunsul provizoriu de mai sus e retras: {reason}", "red", attrs=["bold"])
+
+            # Agent A și Agent B (draft -> audit) rulează în paralel; fiecare e afișat când termină
+            log("🤖 Agent A + 🧠 Agent B pornesc în paralel...", "blue")
+            deadline = Deadline()
+            agents_started = time.monotonic()
+            response_a, draft_b, confession = None, None, None
+            errors, usage = {}, {}
+            for name, result, error in run_parallel({
+                "agent_a": lambda: run_agent_a(user_query, context, deadline, usage=usage),
+                "agent_b": lambda: run_agent_b_steps(user_query, context, deadline, on_decision=show_early_decision,
+                                                     audit_context=audit_context, usage=usage),
+            }, deadline):
+                log("-" * 50)
+                timings[name] = time.monotonic() - agents_started
+                if error:
+                    errors[name] = str(error)
+                if name == "agent_a":
+                    if error:
+                        log(f"Eroare Agent A: {error}", "red")
+                        continue
+                    response_a = result
+                    log("🤖 Agent A (Baseline - Rapid):", "blue")
+                    log(response_a)
+                else:
+                    if error:
+                        log(f"Eroare Agent B: {error}", "red")
+                        retract_early_approval("auditul nu s-a încheiat.")
+                        continue
+                    draft_b, confession = result
+                    if "value" in early_decision:
+                        # Decizia a fost deja afișată: confirmăm APPROVE-ul provizoriu, completăm motivul
+                        # unui BLOCK sau retragem răspunsul dacă raportul complet nu e valid
+                        if confession is None:
+                            log("⚠️ Raportul complet al auditorului nu a putut fi validat.", "yellow")
+                            retract_early_approval(agent_b_final_response(draft_b, confession))
+                        elif confession.final_decision == "APPROVE":
+                            log("✅ Raportul auditorului e valid: răspunsul de mai sus e final.", "green")
+                        else:
+                            retract_early_approval("auditorul a blocat răspunsul.")
+                            log(f"Motiv: {confession.reasoning}", "red", attrs=["bold"])
+                        continue
+                    log("🧠 Agent B (Metacognitiv - Monitorizat):", "green")
+                    log("\n📝 RĂSPUNS FINAL AGENT B:")
+                    log(agent_b_final_response(draft_b, confession))
+
+            timings["total"] = time.monotonic() - run_started
+            record_run(user_query, context, hits, response_a, draft_b, confession, timings, errors=errors, usage=usage)
+            log_metrics()
+
+            # Memorăm doar rulările complete: context găsit și raport de audit valid
+            if namespace and found and response_a is not None and confession is not None:
+                default_response_cache("cli").store(namespace, user_query, query_vector, {
+                    "context": context,
+                    "retrieval": hits,
+                    "response_a": response_a,
+                    "draft": draft_b,
+                    "confession": confession.model_dump(),
+                })
             
         except KeyboardInterrupt:
             log("\nÎnchidere forțată.", "red")
@@ -0,0 +1,38 @@
+from typing import Any, Callable, Optional
+
+from openai import OpenAI
+
+from orchestrator import Deadline, DeadlineExceeded
+
+# Streaming token-cu-token pentru apelurile chat.
+# Fiecare fragment ajunge la callback-ul on_token al apelantului, în thread-ul worker-ului;
+# în Streamlit, callback-ul îl adaugă job-ului de fundal (jobs.py), iar UI-ul îl citește de acolo.
+
+def stream_completion(client: OpenAI, on_token: Callable[[str], None],
+                      deadline: Optional[Deadline] = None, on_usage: Optional[Callable[[Any], None]] = None,
+                      **create_kwargs) -> str:
+    """
+    Rulează un chat completion cu stream=True, trimite fiecare fragment la on_token și întoarce textul complet.
+    Cu `on_usage`, cere și `usage` (vine în ultimul chunk, fără choices) și îl transmite mai departe.
+    """
+    if on_usage is not None:
+        create_kwargs.setdefault("stream_options", {"include_usage": True})
+    stream = client.chat.completions.create(stream=True, **create_kwargs)
+    parts = []
+    try:
+        for chunk in stream:
+            if deadline is not None and deadline.expired():
+                raise DeadlineExceeded(f"Termenul de {deadline.seconds:.0f}s a expirat în timpul streaming-ului.")
+            if on_usage is not None and getattr(chunk, "usage", None) is not None:
+                on_usage(chunk.usage)
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                parts.append(delta)
+                on_token(delta)
+    finally:
+        close = getattr(stream, "close", None)
+        if close:
+            close()
+    return "".join(parts)
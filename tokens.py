@@ -0,0 +1,6 @@
+# Estimarea numărului de tokeni fără tokenizer, comună ingestiei (loturi de embeddings),
+# asamblării contextului, planificatorului de rate limit și casetelor de replay.
+
+def estimate_tokens(text: str) -> int:
+    """Estimare conservatoare a numărului de tokeni (~3 caractere/token pentru text mixt EN/RO)."""
+    return len(text) // 3 + 1
@@ -9,6 +9,39 @@ CREATE TABLE IF NOT EXISTS public.dsm5 (
   embedding vector(1536)
 );
 
+-- 2b. Cheie stabilă per chunk (hash conținut + chunking + model) pentru upsert idempotent
+ALTER TABLE public.dsm5 ADD COLUMN IF NOT EXISTS chunk_hash TEXT;
+CREATE UNIQUE INDEX IF NOT EXISTS dsm5_chunk_hash_key ON public.dsm5 (chunk_hash);
+
+-- 2c. Mai multe corpusuri (DSM-5, ICD-11, ghiduri, articole) în aceeași tabelă, fiecare cu versiuni.
+--     Rândurile existente devin corpusul 'dsm5', versiunea 'v1'. Registrul `corpora` indică versiunea
+--     activă a fiecărui corpus: o versiune nouă e construită alături de cea activă, apoi activată
+--     printr-un singur UPDATE (activate_corpus_version, secțiunea 10), deci căutările nu văd niciodată
+--     o versiune pe jumătate încărcată. Funcțiile match_dsm5* de mai jos caută doar în DSM-5 activ;
+--     cât timp o versiune nouă e construită, rândurile ei sunt în același index HNSW, deci funcțiile
+--     folosesc hnsw.iterative_scan ca filtrul pe versiune să nu reducă numărul de rezultate.
+ALTER TABLE public.dsm5 ADD COLUMN IF NOT EXISTS corpus TEXT NOT NULL DEFAULT 'dsm5';
+ALTER TABLE public.dsm5 ADD COLUMN IF NOT EXISTS corpus_version TEXT NOT NULL DEFAULT 'v1';
+CREATE INDEX IF NOT EXISTS dsm5_corpus_version_idx ON public.dsm5 (corpus, corpus_version);
+
+CREATE TABLE IF NOT EXISTS public.corpora (
+  name text PRIMARY KEY,
+  active_version text NOT NULL,
+  previous_version text,
+  activated_at timestamptz NOT NULL DEFAULT now()
+);
+
+INSERT INTO public.corpora (name, active_version)
+VALUES ('dsm5', 'v1')
+ON CONFLICT (name) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION corpus_active_version (corpus_name text)
+RETURNS text
+LANGUAGE sql STABLE
+AS $$
+  SELECT c.active_version FROM public.corpora AS c WHERE c.name = corpus_name;
+$$;
+
 -- 3. Funcția de căutare FIXATA (rezolvă eroarea 'ambiguous id' și potrivește parametrii)
 DROP FUNCTION IF EXISTS match_dsm5(vector, float, int);
 DROP FUNCTION IF EXISTS match_dsm5(vector, int, jsonb);
@@ -27,6 +60,13 @@ RETURNS TABLE (
 LANGUAGE plpgsql
 AS $$
 BEGIN
+  BEGIN
+    -- pgvector >= 0.8: filtrul pe versiunea activă elimină candidați (o versiune nouă în construcție
+    -- stă în același index), deci scanarea HNSW continuă până găsește match_count rânduri active
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
   RETURN QUERY
   SELECT
     d.id,            -- Folosim aliasul 'd' pentru a evita ambiguitatea
@@ -34,8 +74,271 @@ BEGIN
     d.metadata,
     1 - (d.embedding <=> query_embedding) AS similarity
   FROM dsm5 AS d
-  WHERE d.metadata @> filter
+  WHERE d.metadata @> filter AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+  ORDER BY d.embedding <=> query_embedding
+  LIMIT match_count;
+END;
+$$;
+
+-- 4. Index ANN (HNSW, distanță cosinus) — fără el, ORDER BY <=> este o scanare secvențială
+CREATE INDEX IF NOT EXISTS dsm5_embedding_hnsw_idx
+  ON public.dsm5 USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64);
+
+-- 5. Index GIN pe metadata (jsonb_path_ops acoperă operatorul @> folosit de filtre)
+CREATE INDEX IF NOT EXISTS dsm5_metadata_gin_idx
+  ON public.dsm5 USING gin (metadata jsonb_path_ops);
+
+-- 6. Varianta reglabilă: lățimea căutării HNSW (ef_search) se alege per query.
+--    ef_search mare = recall mai bun, latență mai mare (vezi bench_recall.py).
+DROP FUNCTION IF EXISTS match_dsm5_tuned(vector, int, jsonb, int);
+
+CREATE OR REPLACE FUNCTION match_dsm5_tuned (
+  query_embedding vector(1536),
+  match_count int DEFAULT 5,
+  filter jsonb DEFAULT '{}'::jsonb,
+  ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- Setări locale tranzacției (fiecare apel RPC are propria tranzacție)
+  PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  BEGIN
+    -- pgvector >= 0.8: continuă scanarea indexului când filtrul (metadata, versiunea activă) elimină candidați
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  IF filter = '{}'::jsonb THEN
+    -- Fără filtru: planul folosește direct indexul HNSW
+    RETURN QUERY
+    SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+    FROM dsm5 AS d
+    WHERE d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+  ELSE
+    -- Cu filtru: planificatorul alege între GIN (filtru selectiv) și HNSW + filtrare
+    RETURN QUERY
+    SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+    FROM dsm5 AS d
+    WHERE d.metadata @> filter AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT match_count;
+  END IF;
+END;
+$$;
+
+-- 7. Scanare exactă (fără index), referința pentru măsurarea recall@k
+DROP FUNCTION IF EXISTS match_dsm5_exact(vector, int, jsonb);
+
+CREATE OR REPLACE FUNCTION match_dsm5_exact (
+  query_embedding vector(1536),
+  match_count int DEFAULT 5,
+  filter jsonb DEFAULT '{}'::jsonb
+)
+RETURNS TABLE (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  PERFORM set_config('enable_indexscan', 'off', true);
+  PERFORM set_config('enable_bitmapscan', 'off', true);
+  RETURN QUERY
+  SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> query_embedding) AS similarity
+  FROM dsm5 AS d
+  WHERE d.metadata @> filter AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
   ORDER BY d.embedding <=> query_embedding
   LIMIT match_count;
 END;
 $$;
+
+-- 8. Căutare hibridă: full-text (tsvector) + vector, fuzionate cu Reciprocal Rank Fusion.
+--    Termenii exacți (coduri "F43.10" / "309.81", denumiri de tulburări, litere de criterii)
+--    sunt prinși de indexul lexical chiar când similaritatea embedding-ului e mică.
+ALTER TABLE public.dsm5 ADD COLUMN IF NOT EXISTS content_tsv tsvector
+  GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED;
+
+CREATE INDEX IF NOT EXISTS dsm5_content_tsv_idx
+  ON public.dsm5 USING gin (content_tsv);
+
+DROP FUNCTION IF EXISTS match_dsm5_hybrid(text, vector, int, jsonb, int, int);
+
+-- query_embedding NULL = doar lexical (calea rapidă pentru coduri, fără apel de embedding).
+-- Termenii query-ului sunt legați cu OR: query-urile sunt în română, corpusul în engleză,
+-- deci doar o parte din termeni (coduri, denumiri) au șanse să apară în text.
+CREATE OR REPLACE FUNCTION match_dsm5_hybrid (
+  query_text text,
+  query_embedding vector(1536) DEFAULT null,
+  match_count int DEFAULT 5,
+  filter jsonb DEFAULT '{}'::jsonb,
+  rrf_k int DEFAULT 60,
+  candidate_count int DEFAULT 40
+)
+RETURNS TABLE (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float,
+  lexical_rank float,
+  rrf_score float
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  ts_query tsquery := replace(plainto_tsquery('english', query_text)::text, ' & ', ' | ')::tsquery;
+BEGIN
+  PERFORM set_config('hnsw.ef_search', greatest(candidate_count, 40)::text, true);
+  BEGIN
+    -- pgvector >= 0.8: filtrul pe versiunea activă elimină candidați (o versiune nouă în construcție
+    -- stă în același index), deci scanarea HNSW continuă până găsește match_count rânduri active
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+  RETURN QUERY
+  WITH semantic AS (
+    SELECT d.id, row_number() OVER (ORDER BY d.embedding <=> query_embedding) AS rank
+    FROM dsm5 AS d
+    WHERE query_embedding IS NOT NULL AND d.metadata @> filter
+      AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+    ORDER BY d.embedding <=> query_embedding
+    LIMIT candidate_count
+  ),
+  lexical AS (
+    SELECT d.id, ts_rank_cd(d.content_tsv, ts_query) AS score,
+           row_number() OVER (ORDER BY ts_rank_cd(d.content_tsv, ts_query) DESC) AS rank
+    FROM dsm5 AS d
+    WHERE d.content_tsv @@ ts_query AND d.metadata @> filter
+      AND d.corpus = 'dsm5' AND d.corpus_version = corpus_active_version('dsm5')
+    ORDER BY ts_rank_cd(d.content_tsv, ts_query) DESC
+    LIMIT candidate_count
+  ),
+  fused AS (
+    SELECT coalesce(s.id, l.id) AS id,
+           l.score AS lexical_score,
+           coalesce(1.0 / (rrf_k + s.rank), 0) + coalesce(1.0 / (rrf_k + l.rank), 0) AS score
+    FROM semantic AS s
+    FULL OUTER JOIN lexical AS l ON s.id = l.id
+  )
+  SELECT d.id, d.content, d.metadata,
+         CASE WHEN query_embedding IS NULL THEN NULL
+              ELSE 1 - (d.embedding <=> query_embedding) END AS similarity,
+         f.lexical_score::float AS lexical_rank,
+         f.score::float AS rrf_score
+  FROM fused AS f
+  JOIN dsm5 AS d ON d.id = f.id
+  ORDER BY f.score DESC
+  LIMIT match_count;
+END;
+$$;
+
+-- 9. Configurația embedding-urilor (model, dimensiune, tipul indexului), comună ingestiei și căutării.
+--    Schema de mai sus corespunde configurației implicite: text-embedding-3-small, 1536 dimensiuni,
+--    index HNSW pe float32. Pentru embeddings scurtate (EMBEDDING_DIMENSIONS) sau index cuantizat
+--    (EMBEDDING_STORAGE=halfvec|bit, cu match_dsm5_rescored) rulează SQL-ul generat de
+--    `python embedding_config.py sql`, apoi re-ingestia; ingest_dsm5.py și retrieval.py refuză
+--    să lucreze dacă .env și rândul de mai jos nu corespund.
+CREATE TABLE IF NOT EXISTS public.dsm5_embedding_config (
+  id int PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  version text NOT NULL,
+  model text NOT NULL,
+  dimensions int NOT NULL,
+  storage text NOT NULL
+);
+
+INSERT INTO public.dsm5_embedding_config (id, version, model, dimensions, storage)
+VALUES (1, 'text-embedding-3-small', 'text-embedding-3-small', 1536, 'vector')
+ON CONFLICT (id) DO NOTHING;
+
+-- 10. Căutare rutată pe corpusuri (retrieval.match_corpora): câte un apel match_corpus per corpus,
+--     rulate în paralel, iar top-k-urile sunt unite în Python. Fiecare corpus are propriul index HNSW
+--     parțial (WHERE corpus = '...'), deci un query pe ICD-11 nu parcurge graful DSM-5 și invers.
+--     Indexul unui corpus nou: `python corpora.py sql <corpus>` (CREATE INDEX CONCURRENTLY, fără blocarea scrierilor).
+CREATE INDEX IF NOT EXISTS dsm5_corpus_dsm5_hnsw_idx
+  ON public.dsm5 USING hnsw (embedding vector_cosine_ops)
+  WITH (m = 16, ef_construction = 64)
+  WHERE corpus = 'dsm5';
+
+DROP FUNCTION IF EXISTS match_corpus(vector, text, int, jsonb, int);
+
+CREATE OR REPLACE FUNCTION match_corpus (
+  query_embedding vector(1536),
+  corpus_name text,
+  match_count int DEFAULT 5,
+  filter jsonb DEFAULT '{}'::jsonb,
+  ef_search int DEFAULT 40
+)
+RETURNS TABLE (
+  id bigint,
+  content text,
+  metadata jsonb,
+  similarity float,
+  corpus text,
+  corpus_version text
+)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  active text := corpus_active_version(corpus_name);
+BEGIN
+  IF active IS NULL THEN
+    RAISE EXCEPTION 'Corpus necunoscut: %', corpus_name;
+  END IF;
+  PERFORM set_config('hnsw.ef_search', ef_search::text, true);
+  BEGIN
+    PERFORM set_config('hnsw.iterative_scan', 'relaxed_order', true);
+  EXCEPTION WHEN OTHERS THEN
+    NULL;
+  END;
+
+  -- SQL dinamic: corpusul ajunge literal în plan, altfel planificatorul nu poate alege indexul parțial
+  RETURN QUERY EXECUTE format(
+    'SELECT d.id, d.content, d.metadata, 1 - (d.embedding <=> $1) AS similarity, d.corpus, d.corpus_version
+     FROM dsm5 AS d
+     WHERE d.corpus = %L AND d.corpus_version = %L AND d.metadata @> $2
+     ORDER BY d.embedding <=> $1
+     LIMIT $3',
+    corpus_name, active)
+  USING query_embedding, filter, match_count;
+END;
+$$;
+
+-- Comutarea atomică la o versiune construită complet (ingest_dsm5.py o apelează la final):
+-- un singur rând din `corpora` se schimbă, căutările în curs își termină snapshot-ul pe versiunea veche.
+-- Întoarce versiunea înlocuită (păstrată în previous_version, pentru `python corpora.py rollback`).
+DROP FUNCTION IF EXISTS activate_corpus_version(text, text);
+
+CREATE OR REPLACE FUNCTION activate_corpus_version (
+  corpus_name text,
+  new_version text
+)
+RETURNS text
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  replaced text;
+BEGIN
+  SELECT c.active_version INTO replaced FROM public.corpora AS c WHERE c.name = corpus_name FOR UPDATE;
+  IF replaced IS NULL THEN
+    INSERT INTO public.corpora (name, active_version) VALUES (corpus_name, new_version);
+  ELSIF replaced <> new_version THEN
+    UPDATE public.corpora
+    SET active_version = new_version, previous_version = replaced, activated_at = now()
+    WHERE name = corpus_name;
+  END IF;
+  RETURN replaced;
+END;
+$$;